@@ -0,0 +1,95 @@
+"""
+Per-instance admission control for lecturer streams.
+
+Each stream holds a Speech stream, a thread and a few hundred kilobytes of
+buffers; past a point more of them only raise everyone's caption latency.
+New sessions beyond MAX_CONCURRENT_STREAMS are turned away immediately (with
+a retry hint, and an overflow URL when one is configured) rather than
+queued, and `/health/ready` reports the instance unavailable while it is
+full or draining so the load balancer sends new lectures elsewhere.
+"""
+import logging
+from typing import Any, Dict
+from app.config import settings
+from app.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+REJECT_CAPACITY = "capacity"
+REJECT_DRAINING = "draining"
+
+
+class AdmissionController:
+    def __init__(self, max_streams: int = 60):
+        """
+        Args:
+            max_streams: Streams admitted at once (0 = unlimited)
+        """
+        self.max_streams = max_streams
+        self.active = 0
+        self.draining = False
+        self.admitted = 0
+        self.rejected: Dict[str, int] = {REJECT_CAPACITY: 0, REJECT_DRAINING: 0}
+
+    @property
+    def available(self) -> int:
+        """Streams that can still be admitted (-1 = unlimited)"""
+        if self.draining:
+            return 0
+        if self.max_streams <= 0:
+            return -1
+        return max(0, self.max_streams - self.active)
+
+    @property
+    def accepting(self) -> bool:
+        return self.available != 0
+
+    def try_admit(self) -> str:
+        """
+        Reserve a slot for a new stream; pair with release().
+
+        Returns:
+            "" when admitted, otherwise the reason for turning it away
+        """
+        if self.draining:
+            reason = REJECT_DRAINING
+        elif self.max_streams > 0 and self.active >= self.max_streams:
+            reason = REJECT_CAPACITY
+        else:
+            self.active += 1
+            self.admitted += 1
+            return ""
+        self.rejected[reason] += 1
+        admission_rejections.inc(1, reason)
+        return reason
+
+    def release(self) -> None:
+        self.active = max(0, self.active - 1)
+
+    def start_drain(self) -> None:
+        """Stop admitting new streams for good"""
+        if not self.draining:
+            self.draining = True
+            logger.info(f"🚰 Draining: no new streams, {self.active} still active")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "activeStreams": self.active,
+            "maxStreams": self.max_streams,
+            "available": self.available,
+            "draining": self.draining,
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+        }
+
+
+# Process-wide admission state
+admission = AdmissionController(max_streams=settings.MAX_CONCURRENT_STREAMS)
+
+admission_rejections = registry.counter(
+    "sauti_admission_rejections_total", "Lecturer streams turned away", ("reason",)
+)
+registry.gauge(
+    "sauti_admission_available", "Streams this instance can still admit (-1 = unlimited)",
+    function=lambda: admission.available,
+)
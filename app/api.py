@@ -0,0 +1,129 @@
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import PlainTextResponse
+from app.audio_spool import get_audio_spool, read_info, spool_name, stream_session
+from app.batch import BatchTranscriber, get_batch_executor
+from app.caption_cues import CueTrack, cue_tracks
+from app.config import settings
+from app.models import TranscribeRequest, TranscribeResponse
+from app.transcription import transcribe_audio
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/api")
+
+
+def _batch_transcriber(language_code: str) -> BatchTranscriber:
+    return BatchTranscriber(
+        executor=get_batch_executor(),
+        max_concurrency=settings.BATCH_MAX_CONCURRENCY,
+        language_code=language_code,
+        model=settings.BATCH_MODEL,
+        target_sample_rate=settings.SPEECH_TARGET_SAMPLE_RATE,
+        max_segment_seconds=settings.BATCH_MAX_SEGMENT_SECONDS,
+    )
+
+
+@router.post("/transcribe", response_model=TranscribeResponse)
+async def transcribe(
+    request: TranscribeRequest,
+    sessionId: str = Query(..., min_length=1),
+    languageCode: str = "en-US",
+    sampleRate: int = 48000,
+):
+    """
+    Transcribe a single base64-encoded LINEAR16 chunk (HTTP fallback for
+    clients that can't hold a WebSocket open).
+    """
+    try:
+        transcript = await transcribe_audio(request.audioChunk, languageCode, sampleRate)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"❌ Transcription failed for session {sessionId}: {str(e)}")
+        return TranscribeResponse(success=False, transcript="", sessionId=sessionId, error=str(e))
+    return TranscribeResponse(success=True, transcript=transcript, sessionId=sessionId)
+
+
+@router.post("/transcribe/batch")
+async def transcribe_batch(
+    request: Request,
+    sessionId: str = Query(..., min_length=1),
+    languageCode: str = "en-US",
+    sampleRate: int | None = None,
+    channels: int = 1,
+):
+    """
+    Transcribe a recorded lecture.
+    
+    The request body is the recording itself, streamed (not base64 JSON):
+    a 16-bit PCM WAV file, or raw LINEAR16 with `sampleRate` (and `channels`)
+    given in the query string. It is split at pauses and the pieces are
+    recognized concurrently while the upload is still arriving.
+    
+    Returns:
+        { sessionId, durationSeconds, processingSeconds, transcript,
+          segments: [{ startMs, endMs, transcript, confidence }] }
+    """
+    transcriber = _batch_transcriber(languageCode)
+    logger.info(f"📼 Batch upload started for session {sessionId}")
+    try:
+        result = await transcriber.transcribe(request.stream(), sample_rate=sampleRate, channels=channels)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"sessionId": sessionId, **result}
+
+
+@router.post("/sessions/{session_id}/retranscribe")
+async def retranscribe_session(session_id: str, languageCode: str = "en-US"):
+    """
+    Transcribe a lecture again from its spooled audio (AUDIO_SPOOL_ENABLED),
+    e.g. after the live upstream stream failed part-way through.
+    
+    Returns:
+        Same shape as /api/transcribe/batch
+    """
+    spool = get_audio_spool()
+    if spool is None:
+        raise HTTPException(status_code=404, detail="Audio spool is disabled")
+    info = await asyncio.to_thread(read_info, spool.directory, spool_name(session_id))
+    if info is None:
+        raise HTTPException(status_code=404, detail=f"No spooled audio for session {session_id}")
+    # Include audio still sitting in the writer's queue
+    await asyncio.to_thread(spool.flush, 5.0)
+    
+    logger.info(f"📼 Re-transcribing spooled session {session_id}")
+    try:
+        result = await _batch_transcriber(languageCode).transcribe(
+            stream_session(spool.directory, session_id), sample_rate=info["sampleRate"],
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"sessionId": session_id, **result}
+
+
+def _cue_track(session_id: str) -> CueTrack:
+    track = cue_tracks.get(session_id)
+    if track is None:
+        raise HTTPException(status_code=404, detail=f"No captions for session {session_id} on this instance")
+    return track
+
+
+@router.get("/sessions/{session_id}/captions.vtt", response_class=PlainTextResponse)
+async def session_captions_vtt(session_id: str, interim: bool = True):
+    """
+    Timed captions of a live (or recently ended) lecture as WebVTT.
+    
+    While the lecture is live the last cues may still change: pass
+    `interim=false` to leave out words not yet final.
+    """
+    track = _cue_track(session_id)
+    return PlainTextResponse(track.webvtt(include_interim=interim), media_type="text/vtt")
+
+
+@router.get("/sessions/{session_id}/captions.srt", response_class=PlainTextResponse)
+async def session_captions_srt(session_id: str, interim: bool = True):
+    """Timed captions of a live (or recently ended) lecture as SubRip"""
+    track = _cue_track(session_id)
+    return PlainTextResponse(track.srt(include_interim=interim), media_type="application/x-subrip")
@@ -0,0 +1,104 @@
+"""
+Re-chunking of LINEAR16 audio into evenly sized upstream frames.
+
+Browsers send whatever their audio worklet produces: 128 samples (under
+3 ms) per message is common. Forwarded as is, each becomes its own
+StreamingRecognizeRequest, so a lecture costs hundreds of small gRPC
+messages a second. `AudioFramer` assembles them into frames of at least
+a set duration (100 ms by default) in one preallocated buffer: incoming
+chunks are copied into it through memoryviews. Chunks that are already
+frame-sized or larger are forwarded as they are (split only above the
+request size limit), so clients that send large slices don't end up
+with more messages.
+
+A partial frame is never held longer than `max_hold_seconds`: the caller
+checks `due()` (on each chunk and from a timer) and forwards `flush()`
+early, so latency stays bounded when audio pauses.
+"""
+import time
+from typing import Callable, List
+
+
+class AudioFramer:
+    def __init__(
+        self,
+        frame_bytes: int,
+        max_hold_seconds: float = 0.1,
+        max_frame_bytes: int = 15360,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+            frame_bytes: Smallest frame released without a flush (whole samples)
+            max_hold_seconds: Longest a partial frame waits for more audio
+            max_frame_bytes: Largest frame (whole samples, at least frame_bytes)
+            clock: Time source (monotonic seconds)
+        """
+        self.frame_bytes = frame_bytes
+        self.max_frame_bytes = max(frame_bytes, max_frame_bytes)
+        self.max_hold_seconds = max_hold_seconds
+        self._clock = clock
+        self._buffer = bytearray(frame_bytes)
+        self._held = 0  # Bytes of the partial frame in _buffer
+        self._held_since = 0.0  # When the partial frame's oldest byte arrived
+
+        # Messages in (from the client) and out (to the upstream queue)
+        self.chunks_in = 0
+        self.frames_out = 0
+
+    @property
+    def held_bytes(self) -> int:
+        return self._held
+
+    def push(self, chunk: bytes) -> List[bytes]:
+        """
+        Add audio.
+
+        Returns:
+            Complete frames, oldest first (the remainder is held)
+        """
+        self.chunks_in += 1
+        view = memoryview(chunk)
+        frames = []
+        pos = 0
+        if self._held:
+            # Top up the partial frame first
+            take = min(self.frame_bytes - self._held, len(view))
+            self._buffer[self._held:self._held + take] = view[:take]
+            self._held += take
+            pos = take
+            if self._held < self.frame_bytes:
+                return frames
+            frames.append(bytes(self._buffer))
+            self._held = 0
+        while len(view) - pos >= self.frame_bytes:
+            size = min(len(view) - pos, self.max_frame_bytes)
+            if size == len(view):
+                frames.append(chunk)  # Already a frame: forwarded without a copy
+            else:
+                frames.append(view[pos:pos + size].tobytes())
+            pos += size
+        rest = len(view) - pos
+        if rest:
+            self._buffer[:rest] = view[pos:]
+            self._held = rest
+            self._held_since = self._clock()
+        self.frames_out += len(frames)
+        return frames
+
+    def due(self) -> bool:
+        """True once the partial frame has been held for max_hold_seconds"""
+        return self._held > 0 and self._clock() - self._held_since >= self.max_hold_seconds
+
+    def hold_remaining(self) -> float:
+        """Seconds until the partial frame is due"""
+        return max(0.0, self._held_since + self.max_hold_seconds - self._clock())
+
+    def flush(self) -> bytes:
+        """Take the partial frame (empty if nothing is held)"""
+        if not self._held:
+            return b""
+        frame = bytes(self._buffer[:self._held])
+        self._held = 0
+        self.frames_out += 1
+        return frame
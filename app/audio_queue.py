@@ -0,0 +1,160 @@
+"""
+Bounded, event-driven queue for audio chunks.
+
+An unbounded queue lets memory and caption lag grow without limit when the
+Speech API slows down. `AudioQueue` caps the buffered audio in bytes and
+applies an explicit overload policy once the cap is reached:
+
+- block: `put()` waits for space, which stops the WebSocket receive loop
+  and pushes back on the client
+- drop_oldest: the oldest queued audio is shed to make room
+- coalesce: while a backlog exists, new chunks are merged into the queued
+  tail (fewer, larger upstream messages so the upstream can catch up);
+  the oldest audio is shed only once the byte budget is exhausted
+
+Control markers (stop, rollover, ...) bypass the bounds.
+"""
+import asyncio
+import time
+from collections import deque
+from enum import Enum
+from typing import Any, Deque, Optional
+
+
+class OverloadPolicy(str, Enum):
+    BLOCK = "block"
+    DROP_OLDEST = "drop_oldest"
+    COALESCE = "coalesce"
+
+
+class AudioQueue:
+    def __init__(self, max_bytes: int, policy: str = OverloadPolicy.BLOCK, max_chunk_bytes: int = 15360):
+        """
+        Args:
+            max_bytes: Maximum audio buffered (a single larger chunk is still accepted)
+            policy: What to do when full (see OverloadPolicy)
+            max_chunk_bytes: Upper bound for chunks merged by the coalesce policy
+        """
+        self.max_bytes = max_bytes
+        self.policy = OverloadPolicy(policy)
+        self.max_chunk_bytes = max_chunk_bytes
+        self._items: Deque[Any] = deque()
+        self._times: Deque[float] = deque()  # Enqueue time of each item
+        self._bytes = 0
+        self._readable = asyncio.Event()
+        self._writable = asyncio.Event()
+        self._writable.set()
+        self.dropped_bytes = 0
+        self.coalesced_chunks = 0
+        self.last_enqueued_at = 0.0  # When the item last returned by get() was queued
+
+    @property
+    def pending_bytes(self) -> int:
+        return self._bytes
+
+    def qsize(self) -> int:
+        return len(self._items)
+
+    def empty(self) -> bool:
+        return not self._items
+
+    def put_control(self, item: Any) -> None:
+        """Queue a marker regardless of the audio bound"""
+        self._items.append(item)
+        self._times.append(time.monotonic())
+        self._readable.set()
+
+    def _append(self, chunk: bytes, enqueued_at: Optional[float] = None) -> None:
+        self._items.append(chunk)
+        self._times.append(enqueued_at or time.monotonic())
+        self._bytes += len(chunk)
+        self._readable.set()
+
+    def has_room(self, size: int) -> bool:
+        """Whether `size` more bytes fit under the bound"""
+        return self._bytes == 0 or self._bytes + size <= self.max_bytes
+
+    def _shed_oldest(self, size: int) -> int:
+        """Drop the oldest audio (markers are kept) until `size` more bytes fit"""
+        dropped = 0
+        kept: Deque[Any] = deque()
+        kept_times: Deque[float] = deque()
+        while self._items and not self.has_room(size):
+            item = self._items.popleft()
+            enqueued_at = self._times.popleft()
+            if isinstance(item, bytes):
+                self._bytes -= len(item)
+                dropped += len(item)
+            else:
+                kept.append(item)
+                kept_times.append(enqueued_at)
+        self._items.extendleft(reversed(kept))
+        self._times.extendleft(reversed(kept_times))
+        self.dropped_bytes += dropped
+        return dropped
+
+    def put_nowait(self, chunk: bytes, force: bool = False) -> int:
+        """
+        Queue a chunk without waiting.
+
+        Args:
+            chunk: Audio
+            force: Queue it past the bound under the `block` policy (the
+                last audio before the stream ends, which can't wait)
+
+        Returns:
+            Bytes of older audio shed to make room
+
+        Raises:
+            asyncio.QueueFull: Policy is `block` and the queue is full
+        """
+        tail = self._items[-1] if self._items else None
+        if (
+            self.policy is OverloadPolicy.COALESCE
+            and isinstance(tail, bytes)
+            and len(tail) + len(chunk) <= self.max_chunk_bytes
+        ):
+            dropped = 0 if self.has_room(len(chunk)) else self._shed_oldest(len(chunk))
+            if self._items and self._items[-1] is tail:
+                # Backlog: grow the queued tail instead of adding a message
+                self._items.pop()
+                self._bytes -= len(tail)
+                chunk = tail + chunk
+                self.coalesced_chunks += 1
+                # Merged audio is as old as its oldest part
+                self._append(chunk, self._times.pop())
+            else:
+                self._append(chunk)
+            return dropped
+        if self.has_room(len(chunk)):
+            self._append(chunk)
+            return 0
+        if self.policy is OverloadPolicy.BLOCK:
+            if not force:
+                raise asyncio.QueueFull
+            self._append(chunk)
+            return 0
+        dropped = self._shed_oldest(len(chunk))
+        self._append(chunk)
+        return dropped
+
+    async def put(self, chunk: bytes) -> int:
+        """Queue a chunk, waiting for space under the `block` policy"""
+        while True:
+            try:
+                return self.put_nowait(chunk)
+            except asyncio.QueueFull:
+                self._writable.clear()
+                await self._writable.wait()
+
+    async def get(self) -> Any:
+        """Wait for the next chunk or marker"""
+        while not self._items:
+            self._readable.clear()
+            await self._readable.wait()
+        item = self._items.popleft()
+        self.last_enqueued_at = self._times.popleft()
+        if isinstance(item, bytes):
+            self._bytes -= len(item)
+            self._writable.set()
+        return item
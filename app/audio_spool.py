@@ -0,0 +1,476 @@
+"""
+On-disk spool of lecture audio.
+
+Without a copy of the audio, a failed upstream stream loses that part of the
+lecture for good. With AUDIO_SPOOL_ENABLED, the PCM each session sends to
+the recognizer (mono LINEAR16 after resampling, before the VAD gate) is also
+written to per-session segment files:
+
+    {AUDIO_SPOOL_DIR}/{session_id}/session.json
+    {AUDIO_SPOOL_DIR}/{session_id}/000-000000.pcm, 000-000001.pcm, ...
+
+Segment names are {generation}-{index}. Opening a session ID that was
+spooled before starts a new generation rather than appending to the old
+recording, whose timeline (and the transcript timed against it) would no
+longer line up; session.json describes the latest generation.
+
+The audio path only appends to an in-memory buffer; full buffers are handed
+to a single background thread that does large sequential writes, so disk
+latency never reaches the event loop. If the disk falls so far behind that
+AUDIO_SPOOL_MAX_PENDING_BYTES are waiting, new blocks are dropped instead
+of holding up audio: the writer skips over their length, leaving a sparse
+hole that reads back as silence (no disk writes for it), so the recording
+keeps the lecture's timeline. The gaps (byte offset and length) are listed
+in session.json.
+
+Each SessionSpool handle has its own writer state: a lecturer reconnecting
+with a new stream before the old one has ended gets a new generation, and
+closing the old handle never touches the new one.
+
+The same thread enforces retention: closed sessions older than
+AUDIO_SPOOL_RETENTION_HOURS are deleted, and the oldest closed sessions are
+evicted while the spool is over AUDIO_SPOOL_MAX_BYTES. `read_session()`
+streams a spooled session back, e.g. into the batch transcriber
+(POST /api/sessions/{session_id}/retranscribe).
+"""
+import asyncio
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+import itertools
+from collections import Counter, deque
+from typing import AsyncIterator, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+from app.config import settings
+from app.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+SESSION_FILE = "session.json"
+SEGMENT_SUFFIX = ".pcm"
+
+
+def spool_name(session_id: str) -> str:
+    """Directory name for a session (ids come from the URL: no path tricks)"""
+    return re.sub(r"[^A-Za-z0-9_-]", "_", session_id)[:128] or "_"
+
+
+def segment_name(generation: int, index: int) -> str:
+    return f"{generation:03d}-{index:06d}{SEGMENT_SUFFIX}"
+
+
+class SessionSpool:
+    """A session's handle on the spool; write() runs on the event loop"""
+    def __init__(self, spool: "AudioSpool", name: str):
+        self.spool = spool
+        self.name = name
+        self.handle = next(spool._handles)  # Keys the writer thread's state
+        self._buffer = bytearray()
+        self.closed = False
+
+    def write(self, pcm: bytes) -> None:
+        """Buffer audio; a full buffer goes to the writer thread (never blocks)"""
+        if self.closed:
+            return
+        self._buffer += pcm
+        if len(self._buffer) >= self.spool.buffer_bytes:
+            self.flush()
+
+    def flush(self) -> None:
+        """Hand whatever is buffered to the writer thread"""
+        if not self._buffer:
+            return
+        # The bytearray itself changes hands: no copy
+        block, self._buffer = self._buffer, bytearray()
+        self.spool._submit(("write", self.handle, block), len(block))
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        self.flush()
+        self.closed = True
+        self.spool._submit(("close", self.handle, self.name))
+
+
+class _OpenSession:
+    """Writer-thread state of a session being spooled"""
+    def __init__(self, name: str, directory: str, generation: int):
+        self.name = name
+        self.directory = directory
+        self.generation = generation
+        self.index = 0  # Segment being written
+        self.segment_bytes = 0
+        self.total_bytes = 0  # Position in the recording
+        self.gaps: List[List[int]] = []  # [offset, bytes] of dropped audio, silence on disk
+        self.fd: Optional[int] = None
+
+
+class AudioSpool:
+    def __init__(
+        self,
+        directory: str,
+        segment_bytes: int = 9_600_000,
+        buffer_bytes: int = 262144,
+        max_pending_bytes: int = 32 * 1024 * 1024,
+        retention_seconds: float = 86400.0,
+        max_bytes: int = 2 * 1024 ** 3,
+        sweep_interval: float = 60.0,
+        clock: Callable[[], float] = time.time,
+    ):
+        """
+        Args:
+            directory: Root of the spool
+            segment_bytes: Audio per segment file
+            buffer_bytes: Per-session buffer handed to the writer in one piece
+            max_pending_bytes: Unwritten audio beyond which new blocks are
+                dropped (and written as silence)
+            retention_seconds: Age after which a closed session is deleted
+            max_bytes: Spool size beyond which the oldest closed sessions go
+            sweep_interval: Seconds between retention sweeps
+            clock: Wall-clock time source (compared with file mtimes)
+        """
+        self.directory = directory
+        self.segment_bytes = max(2, segment_bytes - segment_bytes % 2)  # Whole samples
+        self.buffer_bytes = buffer_bytes
+        self.max_pending_bytes = max_pending_bytes
+        self.retention_seconds = retention_seconds
+        self.max_bytes = max_bytes
+        self.sweep_interval = sweep_interval
+        self.clock = clock
+        self._ops: Deque[Tuple[str, int, object]] = deque()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._busy = False
+        self._handles = itertools.count()
+        self._sessions: Dict[int, _OpenSession] = {}  # By handle; writer thread only
+        self._active: Counter = Counter()  # Open handles per session (never evicted)
+        self.pending_bytes = 0
+        self.written_bytes = 0
+        self.dropped_bytes = 0
+        self.evicted_sessions = 0
+
+    def start(self) -> None:
+        with self._cond:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="audio-spool", daemon=True)
+            self._thread.start()
+
+    def open(self, session_id: str, sample_rate: int) -> SessionSpool:
+        """Start spooling a session's audio (a new generation if it was spooled before)"""
+        self.start()
+        name = spool_name(session_id)
+        session = SessionSpool(self, name)
+        with self._cond:
+            self._active[name] += 1
+        self._submit(("open", session.handle, {"sessionId": session_id, "sampleRate": sample_rate}))
+        return session
+
+    def _submit(self, op: Tuple[str, int, object], size: int = 0) -> bool:
+        with self._cond:
+            if size and self.pending_bytes + size > self.max_pending_bytes:
+                # Only the length goes to the writer, which skips over it
+                self.dropped_bytes += size
+                self._ops.append(("gap", op[1], size))
+                self._cond.notify()
+                return False
+            self.pending_bytes += size
+            self._ops.append(op)
+            self._cond.notify()
+        return True
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until everything handed over so far is on disk (blocking).
+
+        Returns:
+            False if it timed out
+        """
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._ops and not self._busy, timeout)
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Write what's pending and stop the writer thread (blocking)"""
+        with self._cond:
+            thread = self._thread
+            if thread is None:
+                return
+            self._ops.append(("stop", "", None))
+            self._cond.notify()
+        thread.join(timeout)
+        with self._cond:
+            self._thread = None
+
+    def _run(self) -> None:
+        next_sweep = time.monotonic()
+        while True:
+            with self._cond:
+                while not self._ops:
+                    remaining = next_sweep - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                op = self._ops.popleft() if self._ops else None
+                self._busy = op is not None
+            try:
+                if op is None:
+                    next_sweep = time.monotonic() + self.sweep_interval
+                    self.sweep()
+                elif op[0] == "stop":
+                    for handle, session in list(self._sessions.items()):
+                        self._close(handle, session.name)
+                    return
+                else:
+                    self._apply(op)
+            except Exception as e:
+                logger.error(f"❌ Audio spool {op[0] if op else 'sweep'} failed: {str(e)}")
+            finally:
+                with self._cond:
+                    if op is not None and op[0] == "write":
+                        self.pending_bytes -= len(op[2])
+                    self._busy = False
+                    self._cond.notify_all()
+
+    def _apply(self, op: Tuple[str, int, object]) -> None:
+        kind, handle, payload = op
+        if kind == "open":
+            self._open(handle, payload)
+        elif kind == "write":
+            self._write(handle, payload)
+        elif kind == "gap":
+            self._gap(handle, payload)
+        elif kind == "close":
+            self._close(handle, payload)
+
+    def _open(self, handle: int, info: dict) -> None:
+        name = spool_name(info["sessionId"])
+        directory = os.path.join(self.directory, name)
+        os.makedirs(directory, exist_ok=True)
+        existing = read_info(self.directory, name)
+        # A reused session ID starts a new recording next to the old ones
+        generation = existing.get("generation", 0) + 1 if existing is not None else 0
+        self._sessions[handle] = _OpenSession(name, directory, generation)
+        self._write_info(directory, {
+            **info,
+            "encoding": "linear16",
+            "generation": generation,
+            "startedAt": self.clock(),
+            "closedAt": None,
+            "gaps": [],
+        })
+
+    def _write(self, handle: int, block: bytearray) -> None:
+        session = self._sessions.get(handle)
+        if session is None:
+            return
+        view = memoryview(block)
+        while view:
+            count = self._segment_room(session, len(view))
+            piece = view[:count]
+            while piece:
+                written = os.write(session.fd, piece)
+                piece = piece[written:]
+            self.written_bytes += count
+            view = view[count:]
+            self._advance(session, count)
+
+    def _gap(self, handle: int, size: int) -> None:
+        """Skip over a dropped block: a sparse hole keeps later audio at its position in the lecture"""
+        session = self._sessions.get(handle)
+        if session is None:
+            return
+        if not session.gaps:
+            logger.warning(f"⚠️  Audio spool fell behind, leaving silence for dropped audio of {session.name}")
+        if session.gaps and sum(session.gaps[-1]) == session.total_bytes:
+            session.gaps[-1][1] += size
+        else:
+            session.gaps.append([session.total_bytes, size])
+        while size:
+            count = self._segment_room(session, size)
+            os.lseek(session.fd, count, os.SEEK_CUR)
+            size -= count
+            self._advance(session, count)
+
+    def _segment_room(self, session: _OpenSession, size: int) -> int:
+        """Open the segment being written if needed; bytes of `size` that fit in it"""
+        if session.fd is None:
+            path = os.path.join(session.directory, segment_name(session.generation, session.index))
+            session.fd = os.open(path, os.O_WRONLY | os.O_CREAT, 0o600)
+        return min(self.segment_bytes - session.segment_bytes, size)
+
+    def _advance(self, session: _OpenSession, count: int) -> None:
+        session.segment_bytes += count
+        session.total_bytes += count
+        if session.segment_bytes >= self.segment_bytes:
+            self._close_segment(session)
+            session.index += 1
+            session.segment_bytes = 0
+
+    @staticmethod
+    def _close_segment(session: _OpenSession) -> None:
+        # A hole at the end of the file only exists once the size covers it
+        os.ftruncate(session.fd, session.segment_bytes)
+        os.close(session.fd)
+        session.fd = None
+
+    def _close(self, handle: int, name: str) -> None:
+        session = self._sessions.pop(handle, None)
+        with self._cond:
+            self._active[name] -= 1
+            if self._active[name] <= 0:
+                del self._active[name]
+        if session is None:
+            return
+        if session.fd is not None:
+            self._close_segment(session)
+        info = read_info(self.directory, session.name) or {}
+        if info.get("generation", 0) != session.generation:
+            return  # The session was opened again since: session.json describes the newer recording
+        self._write_info(session.directory, {**info, "closedAt": self.clock(), "gaps": session.gaps})
+
+    @staticmethod
+    def _write_info(directory: str, info: dict) -> None:
+        path = os.path.join(directory, SESSION_FILE)
+        with open(path + ".tmp", "w") as f:
+            json.dump(info, f)
+        os.replace(path + ".tmp", path)
+
+    def sweep(self) -> int:
+        """
+        Apply retention (runs on the writer thread).
+
+        Returns:
+            Sessions deleted
+        """
+        if not os.path.isdir(self.directory):
+            return 0
+        with self._cond:
+            active = set(self._active)
+        closed = []  # (closed at, name, bytes)
+        total = 0
+        for name in os.listdir(self.directory):
+            directory = os.path.join(self.directory, name)
+            if not os.path.isdir(directory):
+                continue
+            size = sum(entry.stat().st_size for entry in os.scandir(directory) if entry.is_file())
+            total += size
+            if name in active:
+                continue
+            info = read_info(self.directory, name) or {}
+            closed_at = info.get("closedAt") or os.path.getmtime(directory)
+            closed.append((closed_at, name, size))
+
+        closed.sort()
+        now = self.clock()
+        deleted = 0
+        for closed_at, name, size in closed:
+            if now - closed_at <= self.retention_seconds and total <= self.max_bytes:
+                break
+            shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+            total -= size
+            deleted += 1
+        if deleted:
+            self.evicted_sessions += deleted
+            logger.info(f"🧹 Audio spool: removed {deleted} old sessions, {total / 1e6:.0f} MB left")
+        if total > self.max_bytes:
+            logger.warning(f"⚠️  Audio spool over its size limit with only live sessions left ({total / 1e6:.0f} MB)")
+        return deleted
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "active": len(self._active),
+            "pendingBytes": self.pending_bytes,
+            "writtenBytes": self.written_bytes,
+            "droppedBytes": self.dropped_bytes,
+            "evictedSessions": self.evicted_sessions,
+        }
+
+
+def read_info(directory: str, name: str) -> Optional[dict]:
+    """A spooled session's metadata, or None if it isn't spooled"""
+    try:
+        with open(os.path.join(directory, name, SESSION_FILE)) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def read_session(
+    directory: str, session_id: str, chunk_bytes: int = 262144, generation: Optional[int] = None,
+) -> Iterator[bytes]:
+    """
+    Yield a spooled session's audio in order, across segment files (blocking).
+
+    Args:
+        directory: Root of the spool
+        session_id: Lecture session
+        chunk_bytes: Largest chunk yielded
+        generation: Recording to read (defaults to the latest)
+    """
+    name = spool_name(session_id)
+    path = os.path.join(directory, name)
+    if generation is None:
+        generation = (read_info(directory, name) or {}).get("generation", 0)
+    prefix = f"{generation:03d}-"
+    segments = sorted(
+        entry for entry in os.listdir(path) if entry.startswith(prefix) and entry.endswith(SEGMENT_SUFFIX)
+    )
+    for segment in segments:
+        with open(os.path.join(path, segment), "rb") as f:
+            while True:
+                chunk = f.read(chunk_bytes)
+                if not chunk:
+                    break
+                yield chunk
+
+
+async def stream_session(directory: str, session_id: str, chunk_bytes: int = 262144) -> AsyncIterator[bytes]:
+    """read_session() with the file reads kept off the event loop"""
+    chunks = read_session(directory, session_id, chunk_bytes)
+    while True:
+        chunk = await asyncio.to_thread(next, chunks, None)
+        if chunk is None:
+            return
+        yield chunk
+
+
+_spool: Optional[AudioSpool] = None
+
+
+def get_audio_spool() -> Optional[AudioSpool]:
+    """Instance-wide spool, or None when AUDIO_SPOOL_ENABLED is off"""
+    global _spool
+    if not settings.AUDIO_SPOOL_ENABLED:
+        return None
+    if _spool is None:
+        _spool = AudioSpool(
+            settings.AUDIO_SPOOL_DIR,
+            segment_bytes=int(settings.AUDIO_SPOOL_SEGMENT_SECONDS * settings.SPEECH_TARGET_SAMPLE_RATE * 2),
+            buffer_bytes=settings.AUDIO_SPOOL_BUFFER_BYTES,
+            max_pending_bytes=settings.AUDIO_SPOOL_MAX_PENDING_BYTES,
+            retention_seconds=settings.AUDIO_SPOOL_RETENTION_HOURS * 3600,
+            max_bytes=settings.AUDIO_SPOOL_MAX_BYTES,
+            sweep_interval=settings.AUDIO_SPOOL_SWEEP_SECONDS,
+        )
+    return _spool
+
+
+def close_audio_spool() -> None:
+    """Flush and stop the writer (blocking)"""
+    global _spool
+    if _spool is not None:
+        _spool.close()
+        _spool = None
+
+
+registry.gauge(
+    "sauti_spool_pending_bytes", "Spooled audio waiting for the disk writer",
+    function=lambda: _spool.pending_bytes if _spool is not None else 0,
+)
+registry.gauge(
+    "sauti_spool_dropped_bytes", "Audio not spooled because the disk writer fell behind (silence in its place)",
+    function=lambda: _spool.dropped_bytes if _spool is not None else 0,
+)
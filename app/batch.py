@@ -0,0 +1,314 @@
+"""
+Batch transcription of recorded lectures.
+
+A recording is streamed in (raw LINEAR16 or WAV), converted to 16 kHz mono,
+and cut at silence into pieces short enough for synchronous Recognize calls.
+Pieces are recognized concurrently on a bounded worker pool while the upload
+is still being read, and the results are reassembled in order with
+timestamps relative to the start of the recording.
+"""
+import asyncio
+import logging
+import struct
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from functools import partial
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+import numpy as np
+from app.config import settings
+from app.resampler import StreamingResampler
+from app.recognizers import GoogleRecognizer, RecognitionOptions, Recognizer, create_recognizer
+from app.vad import frame_levels
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class AudioSegment:
+    """A piece of the recording cut at silence"""
+    index: int
+    start_sample: int
+    audio: bytes
+    silent: bool = False  # Nothing above the speech level: not worth recognizing
+
+
+@dataclass
+class SegmentTranscript:
+    index: int
+    start_ms: int
+    end_ms: int
+    results: List[Dict] = field(default_factory=list)
+
+
+class SilenceSplitter:
+    def __init__(
+        self,
+        sample_rate: int = 16000,
+        max_segment_seconds: float = 50.0,
+        search_seconds: float = 15.0,
+        frame_ms: int = 20,
+        min_speech_db: float = -55.0,
+    ):
+        """
+        Args:
+            sample_rate: Sample rate of the mono int16 input
+            max_segment_seconds: Longest piece produced (Recognize accepts ~1 minute)
+            search_seconds: How far back from the limit to look for a pause
+            frame_ms: Analysis frame length
+            min_speech_db: Level (dBFS) below which a piece counts as silent
+        """
+        self.sample_rate = sample_rate
+        self.frame_len = sample_rate * frame_ms // 1000
+        self.max_samples = int(max_segment_seconds * sample_rate) // self.frame_len * self.frame_len
+        self.search_frames = max(1, int(search_seconds * 1000) // frame_ms)
+        self.smooth_frames = max(1, 200 // frame_ms)  # Pauses are judged over ~200 ms
+        self.min_speech_db = min_speech_db
+        self._buffer = bytearray()
+        self._start = 0  # Sample offset of the first buffered sample
+        self._index = 0
+
+    @property
+    def consumed_samples(self) -> int:
+        """Samples fed so far"""
+        return self._start + len(self._buffer) // 2
+
+    def _cut(self, samples: int) -> AudioSegment:
+        audio = bytes(self._buffer[:samples * 2])
+        del self._buffer[:samples * 2]
+        frames = np.frombuffer(audio, dtype=np.int16)
+        usable = len(frames) // self.frame_len * self.frame_len
+        silent = True
+        if usable:
+            levels = frame_levels(frames[:usable].reshape(-1, self.frame_len))
+            silent = bool(levels.max() < self.min_speech_db)
+        segment = AudioSegment(self._index, self._start, audio, silent)
+        self._index += 1
+        self._start += samples
+        return segment
+
+    def _split_point(self) -> int:
+        """Samples to cut: the quietest stretch near the end of a full window"""
+        window = np.frombuffer(self._buffer, dtype=np.int16, count=self.max_samples)
+        levels = frame_levels(window.reshape(-1, self.frame_len))
+        smoothed = np.convolve(levels, np.ones(self.smooth_frames) / self.smooth_frames, mode="same")
+        first = max(1, len(levels) - self.search_frames)
+        quietest = first + int(np.argmin(smoothed[first:]))
+        return quietest * self.frame_len
+
+    def feed(self, pcm: bytes) -> List[AudioSegment]:
+        """Add audio; returns the pieces completed by it"""
+        self._buffer += pcm
+        segments = []
+        while len(self._buffer) >= self.max_samples * 2:
+            segments.append(self._cut(self._split_point()))
+        return segments
+
+    def finish(self) -> List[AudioSegment]:
+        """Flush the remaining audio"""
+        if len(self._buffer) < 2:
+            return []
+        return [self._cut(len(self._buffer) // 2)]
+
+
+def parse_wav_header(data: bytes) -> Optional[Tuple[int, int, int]]:
+    """
+    Parse a RIFF/WAVE header.
+
+    Returns:
+        (sample_rate, channels, header_length) or None if more data is needed
+
+    Raises:
+        ValueError: Not 16-bit PCM
+    """
+    position = 12
+    sample_rate = channels = None
+    while position + 8 <= len(data):
+        chunk_id, size = data[position:position + 4], struct.unpack("<I", data[position + 4:position + 8])[0]
+        body = position + 8
+        if chunk_id == b"fmt ":
+            if body + 16 > len(data):
+                return None
+            audio_format, channels, sample_rate = struct.unpack("<HHI", data[body:body + 8])
+            bits = struct.unpack("<H", data[body + 14:body + 16])[0]
+            if audio_format != 1 or bits != 16:
+                raise ValueError("Only 16-bit PCM WAV files are supported")
+        elif chunk_id == b"data":
+            if sample_rate is None:
+                raise ValueError("WAV data chunk before fmt chunk")
+            return sample_rate, channels, body
+        position = body + size + (size & 1)
+    return None
+
+
+class BatchTranscriber:
+    def __init__(
+        self,
+        client=None,
+        executor: Optional[ThreadPoolExecutor] = None,
+        max_concurrency: int = 8,
+        language_code: str = "en-US",
+        model: str = "long",
+        target_sample_rate: int = 16000,
+        max_segment_seconds: float = 50.0,
+        recognizer: Optional[Recognizer] = None,
+    ):
+        """
+        Args:
+            client: Speech client (shorthand for a GoogleRecognizer on it)
+            executor: Worker pool for the blocking Recognize calls
+            max_concurrency: Pieces of this upload recognized at the same time
+            language_code: Language code
+            model: Speech model
+            target_sample_rate: Rate audio is converted to before recognition
+            max_segment_seconds: Longest piece sent in one Recognize call
+            recognizer: Recognition backend (settings.RECOGNIZER_BACKEND on the
+                shared global channels by default)
+        """
+        if recognizer is None:
+            recognizer = GoogleRecognizer("global", client) if client is not None else create_recognizer(region="global", lease=False)
+        self.recognizer = recognizer
+        self.executor = executor
+        self.language_code = language_code
+        self.model = model
+        self.target_sample_rate = target_sample_rate
+        self.max_segment_seconds = max_segment_seconds
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self.recognized_seconds = 0.0
+        self.skipped_seconds = 0.0
+
+    def _to_ms(self, samples: int) -> int:
+        return samples * 1000 // self.target_sample_rate
+
+    async def _recognize(self, segment: AudioSegment) -> SegmentTranscript:
+        start_ms = self._to_ms(segment.start_sample)
+        end_ms = self._to_ms(segment.start_sample + len(segment.audio) // 2)
+        transcript = SegmentTranscript(segment.index, start_ms, end_ms)
+        try:
+            options = RecognitionOptions(
+                sample_rate=self.target_sample_rate, language_codes=[self.language_code], model=self.model,
+            )
+            loop = asyncio.get_running_loop()
+            results = await loop.run_in_executor(self.executor, partial(self.recognizer.recognize, segment.audio, options))
+        finally:
+            self._slots.release()
+        self.recognized_seconds += (end_ms - start_ms) / 1000
+
+        result_start = start_ms
+        for result in results:
+            if not result.alternatives:
+                continue
+            result_end = start_ms + int(result.result_end_offset.total_seconds() * 1000) if result.result_end_offset else end_ms
+            alternative = result.alternatives[0]
+            if alternative.transcript.strip():
+                transcript.results.append({
+                    "startMs": result_start,
+                    "endMs": result_end,
+                    "transcript": alternative.transcript.strip(),
+                    "confidence": alternative.confidence,
+                })
+            result_start = result_end
+        return transcript
+
+    async def transcribe(
+        self,
+        body: AsyncIterator[bytes],
+        sample_rate: Optional[int] = None,
+        channels: int = 1,
+    ) -> Dict:
+        """
+        Transcribe a streamed recording.
+
+        Args:
+            body: Upload chunks (raw LINEAR16, or a WAV file when it starts with RIFF)
+            sample_rate: Rate of raw LINEAR16 input (read from the header for WAV)
+            channels: Interleaved channels of raw LINEAR16 input
+
+        Returns:
+            Ordered segments with timestamps and the joined transcript
+        """
+        started = time.monotonic()
+        splitter = SilenceSplitter(self.target_sample_rate, self.max_segment_seconds)
+        resampler: Optional[StreamingResampler] = None
+        header = b""
+        tasks: List[asyncio.Task] = []
+
+        async def dispatch(segments: List[AudioSegment]):
+            for segment in segments:
+                if segment.silent:
+                    self.skipped_seconds += len(segment.audio) / 2 / self.target_sample_rate
+                    continue
+                # Bounded: reading the upload pauses while every slot is busy
+                await self._slots.acquire()
+                tasks.append(asyncio.create_task(self._recognize(segment)))
+
+        def raw_resampler() -> StreamingResampler:
+            if sample_rate is None:
+                raise ValueError("sampleRate is required for raw LINEAR16 uploads")
+            return StreamingResampler(sample_rate, self.target_sample_rate, channels)
+
+        try:
+            async for chunk in body:
+                if resampler is None:
+                    header += chunk
+                    if len(header) < 4:
+                        continue  # Not enough yet to tell a WAV header from raw audio
+                    if header[:4] == b"RIFF":
+                        parsed = parse_wav_header(header)
+                        if parsed is None:
+                            continue
+                        sample_rate, channels, offset = parsed
+                        chunk = header[offset:]
+                        resampler = StreamingResampler(sample_rate, self.target_sample_rate, channels)
+                    else:
+                        chunk = header
+                        resampler = raw_resampler()
+                await dispatch(splitter.feed(resampler.process(chunk)))
+            if resampler is None and header and header[:4] != b"RIFF":
+                # Raw audio shorter than the format check
+                resampler = raw_resampler()
+                await dispatch(splitter.feed(resampler.process(header)))
+            if resampler is None:
+                raise ValueError("Empty upload")
+            await dispatch(splitter.finish())
+            pieces = await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+
+        pieces.sort(key=lambda piece: piece.index)
+        segments = [result for piece in pieces for result in piece.results]
+        duration = splitter.consumed_samples / self.target_sample_rate
+        elapsed = time.monotonic() - started
+        logger.info(
+            f"📼 Batch transcription: {duration:.0f}s of audio in {len(tasks)} pieces, "
+            f"{self.skipped_seconds:.0f}s silent, {elapsed:.1f}s elapsed"
+        )
+        return {
+            "durationSeconds": round(duration, 3),
+            "processingSeconds": round(elapsed, 3),
+            "segments": segments,
+            "transcript": " ".join(segment["transcript"] for segment in segments),
+        }
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def get_batch_executor() -> ThreadPoolExecutor:
+    """Instance-wide worker pool for batch Recognize calls"""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.BATCH_MAX_WORKERS,
+            thread_name_prefix="batch-recognize",
+        )
+    return _executor
+
+
+def shutdown_batch_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
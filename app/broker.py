@@ -0,0 +1,282 @@
+"""
+Caption event brokers.
+
+A lecturer's `/ws/transcribe/{session_id}` stream and the viewers of that
+session can land on different Cloud Run instances. The caption hub publishes
+every serialized result through a broker and only delivers to its own local
+viewers what the broker hands back:
+
+- `InMemoryBroker`: single instance, delivery is a direct call
+- `RedisBroker`: pub/sub over the Redis protocol (RESP) on plain asyncio
+  streams; outgoing messages are batched into pipelined PUBLISH writes and
+  each instance only subscribes to sessions that have local viewers
+
+Publishing never waits on the network: messages are queued and the oldest
+are dropped if the broker falls too far behind.
+"""
+import asyncio
+import logging
+import uuid
+from collections import deque
+from typing import Callable, Deque, List, Optional, Set, Tuple
+from urllib.parse import urlparse
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Called with (session_id, payload, replaceable) for messages to deliver locally
+DeliverCallback = Callable[[str, str, bool], None]
+
+
+class CaptionBroker:
+    """Interface shared by the broker implementations"""
+    def __init__(self):
+        self.deliver: Optional[DeliverCallback] = None
+
+    async def start(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    def publish(self, session_id: str, payload: str, replaceable: bool = False) -> None:
+        raise NotImplementedError
+
+    def subscribe(self, session_id: str) -> None:
+        """First local viewer of a session joined"""
+
+    def unsubscribe(self, session_id: str) -> None:
+        """Last local viewer of a session left"""
+
+    def stats(self) -> dict:
+        return {}
+
+
+class InMemoryBroker(CaptionBroker):
+    """Everything happens in this process"""
+    def publish(self, session_id: str, payload: str, replaceable: bool = False) -> None:
+        if self.deliver is not None:
+            self.deliver(session_id, payload, replaceable)
+
+
+def encode_command(*args) -> bytes:
+    """Encode a command as a RESP array of bulk strings"""
+    parts = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        if isinstance(arg, str):
+            arg = arg.encode()
+        elif isinstance(arg, int):
+            arg = str(arg).encode()
+        parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+    return b"".join(parts)
+
+
+class RedisError(Exception):
+    """Error reply from the server"""
+
+
+async def read_reply(reader: asyncio.StreamReader):
+    """Read one RESP reply (bulk strings are returned as bytes)"""
+    line = await reader.readuntil(b"\r\n")
+    kind, body = line[:1], line[1:-2]
+    if kind == b"+":
+        return body.decode()
+    if kind == b"-":
+        raise RedisError(body.decode())
+    if kind == b":":
+        return int(body)
+    if kind == b"$":
+        length = int(body)
+        if length < 0:
+            return None
+        data = await reader.readexactly(length + 2)
+        return data[:-2]
+    if kind == b"*":
+        length = int(body)
+        if length < 0:
+            return None
+        return [await read_reply(reader) for _ in range(length)]
+    raise RedisError(f"Unexpected reply: {line!r}")
+
+
+class RedisBroker(CaptionBroker):
+    def __init__(
+        self,
+        url: str,
+        channel_prefix: str = "sauti:captions:",
+        max_pending: int = 10000,
+        max_batch: int = 500,
+        reconnect_delay: float = 1.0,
+    ):
+        """
+        Args:
+            url: redis://[[username]:password@]host[:port][/0] (pub/sub
+                channels are shared by all databases, so no other /db is accepted)
+            channel_prefix: Pub/sub channel name prefix, followed by the session ID
+            max_pending: Outgoing messages buffered before the oldest are dropped
+            max_batch: Most PUBLISH commands pipelined in one write
+            reconnect_delay: Seconds between connection attempts
+        """
+        super().__init__()
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.username = parsed.username or None  # ACL user (Redis 6+)
+        self.password = parsed.password
+        if parsed.path.strip("/") not in ("", "0"):
+            raise ValueError(f"Redis URL selects database {parsed.path.strip('/')}: pub/sub ignores databases, leave it out")
+        self.channel_prefix = channel_prefix
+        self.max_pending = max_pending
+        self.max_batch = max_batch
+        self.reconnect_delay = reconnect_delay
+        # Lets an instance skip its own messages (already delivered locally)
+        self.instance_id = uuid.uuid4().hex[:12]
+
+        self._pending: Deque[Tuple[str, str]] = deque()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._channels: Set[str] = set()
+        self._subscriber: Optional[asyncio.StreamWriter] = None
+        self._tasks: List[asyncio.Task] = []
+        self._closing = False
+
+        self.published = 0
+        self.batches = 0
+        self.dropped = 0
+        self.received = 0
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self._pending),
+            "published": self.published,
+            "batches": self.batches,
+            "dropped": self.dropped,
+            "received": self.received,
+        }
+
+    async def start(self) -> None:
+        self._wakeup = asyncio.Event()
+        self._closing = False
+        self._tasks = [
+            asyncio.create_task(self._publish_loop()),
+            asyncio.create_task(self._subscribe_loop()),
+        ]
+
+    async def close(self) -> None:
+        self._closing = True
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _connect(self) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        if self.password:
+            credentials = (self.username, self.password) if self.username else (self.password,)
+            writer.write(encode_command("AUTH", *credentials))
+            await writer.drain()
+            await read_reply(reader)
+        return reader, writer
+
+    def _channel(self, session_id: str) -> str:
+        return self.channel_prefix + session_id
+
+    # Publishing
+
+    def publish(self, session_id: str, payload: str, replaceable: bool = False) -> None:
+        # Local viewers don't wait for the round trip through Redis
+        if self.deliver is not None:
+            self.deliver(session_id, payload, replaceable)
+        envelope = f"{self.instance_id}|{'i' if replaceable else 'f'}|{payload}"
+        self._pending.append((self._channel(session_id), envelope))
+        if len(self._pending) > self.max_pending:
+            self._pending.popleft()
+            self.dropped += 1
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _publish_loop(self) -> None:
+        writer = None
+        while not self._closing:
+            try:
+                if writer is None:
+                    reader, writer = await self._connect()
+                if not self._pending:
+                    self._wakeup.clear()
+                    await self._wakeup.wait()
+                    continue
+                # Everything queued while the last batch was in flight goes out together
+                batch = [self._pending.popleft() for _ in range(min(len(self._pending), self.max_batch))]
+                writer.write(b"".join(encode_command("PUBLISH", channel, message) for channel, message in batch))
+                await writer.drain()
+                for _ in batch:
+                    await read_reply(reader)
+                self.published += len(batch)
+                self.batches += 1
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.warning(f"⚠️  Caption broker publish connection failed: {str(e)}")
+                if writer is not None:
+                    writer.close()
+                    writer = None
+                await asyncio.sleep(self.reconnect_delay)
+        if writer is not None:
+            writer.close()
+
+    # Subscribing
+
+    def subscribe(self, session_id: str) -> None:
+        channel = self._channel(session_id)
+        self._channels.add(channel)
+        if self._subscriber is not None:
+            self._subscriber.write(encode_command("SUBSCRIBE", channel))
+
+    def unsubscribe(self, session_id: str) -> None:
+        channel = self._channel(session_id)
+        self._channels.discard(channel)
+        if self._subscriber is not None:
+            self._subscriber.write(encode_command("UNSUBSCRIBE", channel))
+
+    def _on_message(self, channel: bytes, envelope: bytes) -> None:
+        origin, kind, payload = envelope.decode().split("|", 2)
+        if origin == self.instance_id:
+            return
+        self.received += 1
+        if self.deliver is not None:
+            session_id = channel.decode()[len(self.channel_prefix):]
+            self.deliver(session_id, payload, kind == "i")
+
+    async def _subscribe_loop(self) -> None:
+        while not self._closing:
+            writer = None
+            try:
+                reader, writer = await self._connect()
+                # Pub/sub needs at least one channel; a dummy keeps the connection in that mode
+                channels = sorted(self._channels) + [self.channel_prefix + "_"]
+                writer.write(encode_command("SUBSCRIBE", *channels))
+                self._subscriber = writer
+                await writer.drain()
+                while True:
+                    reply = await read_reply(reader)
+                    if isinstance(reply, list) and reply and reply[0] == b"message":
+                        self._on_message(reply[1], reply[2])
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.warning(f"⚠️  Caption broker subscribe connection failed: {str(e)}")
+            finally:
+                self._subscriber = None
+                if writer is not None:
+                    writer.close()
+            if not self._closing:
+                await asyncio.sleep(self.reconnect_delay)
+
+
+def create_broker() -> CaptionBroker:
+    """Broker selected by CAPTION_BROKER"""
+    if settings.CAPTION_BROKER == "redis":
+        return RedisBroker(
+            settings.REDIS_URL,
+            max_pending=settings.CAPTION_BROKER_MAX_PENDING,
+        )
+    return InMemoryBroker()
@@ -0,0 +1,286 @@
+"""
+Timed caption cues for video players and lecture archives.
+
+Word timings from the recognizer are grouped into cues as results arrive,
+following the usual subtitle rules: at most `max_lines` lines of
+`max_line_chars` characters, at most `max_cue_seconds` on screen, a new cue
+after a pause or (once a cue has been up for `min_cue_seconds`) a sentence
+end, and cues kept up long enough to read at `max_chars_per_second`.
+
+The work per result is bounded by the result and the open cue, never by
+the length of the lecture:
+
+- a final appends its words to the open cue; cues that fill up are closed,
+  rendered to WebVTT and SRT once, and never touched again
+- an interim only rebuilds the provisional tail (the open cue plus the
+  interim words), replacing the previous one
+
+Times are milliseconds into the lecture as received (the audio spool's
+timeline, also used by the Firebase transcript): silence the VAD kept from
+the recognizer is mapped back in, so cues line up with a recording and
+long pauses start new cues.
+"""
+from collections import OrderedDict
+from typing import List, Optional
+from app.config import settings
+
+# A cue may be closed at these once it has been up for min_cue_seconds
+_SENTENCE_END = (".", "?", "!")
+
+
+class Cue:
+    __slots__ = ("start_ms", "end_ms", "words", "chars")
+
+    def __init__(self, start_ms: int):
+        self.start_ms = start_ms
+        self.end_ms = start_ms
+        self.words: List[str] = []
+        self.chars = 0
+
+    @property
+    def text(self) -> str:
+        return " ".join(self.words)
+
+    def add(self, word: str, end_ms: int) -> None:
+        self.chars += len(word) + (1 if self.words else 0)
+        self.words.append(word)
+        self.end_ms = max(self.end_ms, end_ms)
+
+    def copy(self) -> "Cue":
+        cue = Cue(self.start_ms)
+        cue.end_ms = self.end_ms
+        cue.words = list(self.words)
+        cue.chars = self.chars
+        return cue
+
+
+def wrap_lines(words: List[str], max_line_chars: int) -> List[str]:
+    """Break a cue's words into lines of at most max_line_chars (a longer word gets its own line)"""
+    lines: List[str] = []
+    line = ""
+    for word in words:
+        if line and len(line) + 1 + len(word) > max_line_chars:
+            lines.append(line)
+            line = word
+        else:
+            line = f"{line} {word}" if line else word
+    if line:
+        lines.append(line)
+    return lines
+
+
+def _timestamp(ms: int, separator: str) -> str:
+    hours, ms = divmod(max(0, ms), 3_600_000)
+    minutes, ms = divmod(ms, 60_000)
+    seconds, ms = divmod(ms, 1000)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}{separator}{ms:03d}"
+
+
+def _interpolate(text: str, start_ms: int, end_ms: int) -> List[dict]:
+    """Word timings spread by length over [start_ms, end_ms] (results without word offsets)"""
+    words = text.split()
+    total = sum(len(word) for word in words) or 1
+    span = max(0, end_ms - start_ms)
+    timings = []
+    at = 0
+    for word in words:
+        start = start_ms + span * at // total
+        at += len(word)
+        timings.append({'w': word, 's': start, 'e': start_ms + span * at // total})
+    return timings
+
+
+class CueTrack:
+    def __init__(
+        self,
+        session_id: str,
+        max_line_chars: int = 42,
+        max_lines: int = 2,
+        max_cue_seconds: float = 7.0,
+        min_cue_seconds: float = 1.0,
+        max_chars_per_second: float = 17.0,
+        pause_seconds: float = 1.0,
+    ):
+        """
+        Args:
+            session_id: Lecture session
+            max_line_chars: Longest caption line
+            max_lines: Lines per cue
+            max_cue_seconds: Longest a cue covers
+            min_cue_seconds: Shortest a cue stays up (and before a sentence end closes it)
+            max_chars_per_second: Reading speed cues are kept up for
+            pause_seconds: Silence between words that starts a new cue
+        """
+        self.session_id = session_id
+        self.max_line_chars = max_line_chars
+        self.max_lines = max_lines
+        self.max_cue_ms = int(max_cue_seconds * 1000)
+        self.min_cue_ms = int(min_cue_seconds * 1000)
+        self.max_chars_per_second = max_chars_per_second
+        self.pause_ms = int(pause_seconds * 1000)
+
+        self.cues: List[Cue] = []  # Closed, final
+        self._vtt: List[str] = []  # Each closed cue rendered once
+        self._srt: List[str] = []
+        self._open: Optional[Cue] = None  # Final words not yet closed into a cue
+        self._tail: List[Cue] = []  # Open cue plus the latest interim (provisional)
+        self.final_end_ms = 0  # End of the last final word
+        self.finished = False
+
+    # Segmentation
+
+    def _fits(self, cue: Cue, word: str, start_ms: int, end_ms: int) -> bool:
+        if not cue.words:
+            return True
+        if start_ms - cue.end_ms >= self.pause_ms:
+            return False
+        if end_ms - cue.start_ms > self.max_cue_ms:
+            return False
+        if cue.chars + 1 + len(word) > self.max_line_chars * self.max_lines:
+            return False
+        if len(wrap_lines(cue.words + [word], self.max_line_chars)) > self.max_lines:
+            return False
+        # Let the sentence end the cue once it has been up long enough
+        return not (cue.words[-1].endswith(_SENTENCE_END) and cue.end_ms - cue.start_ms >= self.min_cue_ms)
+
+    def _segment(self, cue: Optional[Cue], words: List[dict], closed: List[Cue]) -> Optional[Cue]:
+        """Add timed words to `cue`, appending every cue that fills up to `closed`"""
+        for timing in words:
+            word, start_ms, end_ms = timing['w'], timing['s'], timing['e']
+            if cue is not None and not self._fits(cue, word, start_ms, end_ms):
+                closed.append(cue)
+                cue = None
+            if cue is None:
+                cue = Cue(start_ms)
+            cue.add(word, end_ms)
+        return cue
+
+    def _hold(self, cue: Cue, next_start_ms: Optional[int]) -> None:
+        """Keep a closed cue up long enough to read, up to the next cue"""
+        needed = max(self.min_cue_ms, int(1000 * cue.chars / self.max_chars_per_second))
+        end_ms = max(cue.end_ms, cue.start_ms + needed)
+        if next_start_ms is not None:
+            end_ms = max(cue.end_ms, min(end_ms, next_start_ms))
+        cue.end_ms = end_ms
+
+    def _close(self, closed: List[Cue], next_start_ms: Optional[int]) -> None:
+        for i, cue in enumerate(closed):
+            self._hold(cue, closed[i + 1].start_ms if i + 1 < len(closed) else next_start_ms)
+            self.cues.append(cue)
+            self._vtt.append(self._render(cue, len(self.cues), "."))
+            self._srt.append(self._render(cue, len(self.cues), ","))
+
+    # Results
+
+    def add_final(self, transcript: str, words: List[dict], end_ms: Optional[int] = None) -> None:
+        """
+        Add a final result.
+
+        Args:
+            transcript: Final transcript
+            words: Word timings ({'w', 's', 'e'} in ms, as in the Firebase
+                transcript); interpolated up to `end_ms` if empty
+            end_ms: End of the result's audio
+        """
+        if not words:
+            words = _interpolate(transcript, self.final_end_ms, end_ms if end_ms is not None else self.final_end_ms)
+        if not words:
+            return
+        closed: List[Cue] = []
+        self._open = self._segment(self._open, words, closed)
+        self._close(closed, self._open.start_ms if self._open is not None else None)
+        self.final_end_ms = max(self.final_end_ms, words[-1]['e'])
+        self._tail = [self._open] if self._open is not None else []
+
+    def update_interim(self, transcript: str, end_ms: Optional[int] = None) -> None:
+        """
+        Replace the provisional tail with an interim result.
+
+        Interims carry no word timings: the words are spread from the last
+        final to `end_ms` (or ~300 ms each without it).
+        """
+        words = transcript.split()
+        if end_ms is None or end_ms <= self.final_end_ms:
+            end_ms = self.final_end_ms + 300 * len(words)
+        tail: List[Cue] = []
+        last = self._segment(
+            self._open.copy() if self._open is not None else None,
+            _interpolate(transcript, self.final_end_ms, end_ms),
+            tail,
+        )
+        if last is not None:
+            tail.append(last)
+        self._tail = tail
+
+    def finish(self) -> None:
+        """Close the open cue at the end of the lecture (interims are dropped)"""
+        if self._open is not None:
+            self._close([self._open], None)
+            self._open = None
+        self._tail = []
+        self.finished = True
+
+    # Export
+
+    def _render(self, cue: Cue, number: int, separator: str) -> str:
+        lines = "\n".join(wrap_lines(cue.words, self.max_line_chars))
+        return f"{number}\n{_timestamp(cue.start_ms, separator)} --> {_timestamp(cue.end_ms, separator)}\n{lines}\n"
+
+    def _provisional(self, separator: str, include_interim: bool) -> List[str]:
+        """The cues that may still change, rendered on request"""
+        tail = self._tail if include_interim else [cue for cue in (self._open,) if cue is not None]
+        rendered = []
+        for i, cue in enumerate(tail):
+            cue = cue.copy()
+            self._hold(cue, tail[i + 1].start_ms if i + 1 < len(tail) else None)
+            rendered.append(self._render(cue, len(self.cues) + i + 1, separator))
+        return rendered
+
+    def webvtt(self, include_interim: bool = True) -> str:
+        """The track so far as a WebVTT document"""
+        return "\n".join(["WEBVTT\n", *self._vtt, *self._provisional(".", include_interim)])
+
+    def srt(self, include_interim: bool = True) -> str:
+        """The track so far as SubRip (.srt)"""
+        return "\n".join([*self._srt, *self._provisional(",", include_interim)])
+
+
+class CueTracks:
+    def __init__(self, max_finished: int = 100, **track_options):
+        """
+        Args:
+            max_finished: Ended lectures kept for export (oldest go first)
+            track_options: CueTrack settings
+        """
+        self.max_finished = max_finished
+        self.track_options = track_options
+        self._tracks: "OrderedDict[str, CueTrack]" = OrderedDict()
+
+    def open(self, session_id: str) -> CueTrack:
+        """Start a new track for a lecture (replacing an earlier one with the same ID)"""
+        track = CueTrack(session_id, **self.track_options)
+        self._tracks.pop(session_id, None)
+        self._tracks[session_id] = track
+        return track
+
+    def get(self, session_id: str) -> Optional[CueTrack]:
+        return self._tracks.get(session_id)
+
+    def finish(self, track: CueTrack) -> None:
+        """The lecture ended: close its last cue and keep it for export"""
+        track.finish()
+        finished = [session_id for session_id, kept in self._tracks.items() if kept.finished]
+        for session_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._tracks[session_id]
+
+
+# Tracks of the lectures streaming to (or recently ended on) this instance
+cue_tracks = CueTracks(
+    max_finished=settings.CAPTION_CUE_TRACKS_KEPT,
+    max_line_chars=settings.CAPTION_CUE_MAX_LINE_CHARS,
+    max_lines=settings.CAPTION_CUE_MAX_LINES,
+    max_cue_seconds=settings.CAPTION_CUE_MAX_SECONDS,
+    min_cue_seconds=settings.CAPTION_CUE_MIN_SECONDS,
+    max_chars_per_second=settings.CAPTION_CUE_MAX_CHARS_PER_SECOND,
+    pause_seconds=settings.CAPTION_CUE_PAUSE_SECONDS,
+)
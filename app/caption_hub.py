@@ -0,0 +1,144 @@
+"""
+Caption fan-out for viewers.
+
+Students connected to `/ws/captions/{session_id}` get interim and final
+results from the lecturer's `TranscriptionStream` without a Firebase round
+trip. Results travel through a broker (see app.broker) so viewers on other
+instances receive them too; each instance then delivers to its own viewers.
+Each message is serialized once per session and handed to every
+subscriber's own bounded buffer, so publishing never waits on a viewer: a
+slow phone loses stale interims (and, if it falls far behind, its oldest
+messages) instead of slowing the lecturer's stream or other viewers.
+"""
+import asyncio
+import json
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Set, Tuple
+from app.broker import CaptionBroker, InMemoryBroker, create_broker
+from app.config import settings
+
+
+class Subscriber:
+    def __init__(self, session_id: str, max_messages: int = 100):
+        """
+        Args:
+            session_id: Session being watched
+            max_messages: Messages buffered before the oldest are dropped
+        """
+        self.session_id = session_id
+        self.max_messages = max_messages
+        self._buffer: Deque[Tuple[Any, bool]] = deque()
+        self._ready = asyncio.Event()
+        self.closed = False
+        self.dropped = 0
+
+    def __len__(self) -> int:
+        return len(self._buffer)
+
+    def offer(self, payload: Any, replaceable: bool = False) -> None:
+        """
+        Buffer a message without waiting.
+
+        Args:
+            payload: Serialized message
+            replaceable: Message is superseded by the next replaceable one
+                (interim results), so a queued one can be overwritten
+        """
+        if replaceable and self._buffer and self._buffer[-1][1]:
+            # Viewer hasn't caught up: only the newest interim matters
+            self._buffer[-1] = (payload, replaceable)
+        else:
+            self._buffer.append((payload, replaceable))
+            if len(self._buffer) > self.max_messages:
+                self._buffer.popleft()
+                self.dropped += 1
+        self._ready.set()
+
+    async def get(self) -> Any:
+        """Wait for the next message (None once closed)"""
+        while not self._buffer:
+            if self.closed:
+                return None
+            self._ready.clear()
+            await self._ready.wait()
+        return self._buffer.popleft()[0]
+
+    def close(self) -> None:
+        self.closed = True
+        self._ready.set()
+
+
+class CaptionHub:
+    def __init__(self, max_messages: int = 100, broker: Optional[CaptionBroker] = None):
+        """
+        Args:
+            max_messages: Default per-subscriber buffer size
+            broker: Cross-instance transport (in-process only by default)
+        """
+        self.max_messages = max_messages
+        self.broker = broker or InMemoryBroker()
+        self.broker.deliver = self.deliver
+        self._sessions: Dict[str, Set[Subscriber]] = {}
+        self.published = 0
+
+    async def start(self) -> None:
+        await self.broker.start()
+
+    async def close(self) -> None:
+        await self.broker.close()
+
+    def subscribe(self, session_id: str) -> Subscriber:
+        subscriber = Subscriber(session_id, self.max_messages)
+        if session_id not in self._sessions:
+            self._sessions[session_id] = set()
+            self.broker.subscribe(session_id)
+        self._sessions[session_id].add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        subscriber.close()
+        subscribers = self._sessions.get(subscriber.session_id)
+        if subscribers is None:
+            return
+        subscribers.discard(subscriber)
+        if not subscribers:
+            del self._sessions[subscriber.session_id]
+            self.broker.unsubscribe(subscriber.session_id)
+
+    def subscriber_count(self, session_id: str) -> int:
+        return len(self._sessions.get(session_id, ()))
+
+    def has_subscribers(self, session_id: str) -> bool:
+        return session_id in self._sessions
+
+    def publish(self, session_id: str, message: Dict[str, Any], replaceable: bool = False) -> None:
+        """Broadcast a message to every viewer of a session, on any instance"""
+        payload = json.dumps(message)  # Serialized once for all viewers
+        self.published += 1
+        self.broker.publish(session_id, payload, replaceable)
+
+    def deliver(self, session_id: str, payload: str, replaceable: bool = False) -> int:
+        """
+        Hand a serialized message to this instance's viewers of a session.
+
+        Returns:
+            Number of local subscribers it was delivered to
+        """
+        subscribers = self._sessions.get(session_id)
+        if not subscribers:
+            return 0
+        for subscriber in subscribers:
+            subscriber.offer(payload, replaceable)
+        return len(subscribers)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sessions": len(self._sessions),
+            "viewers": sum(len(s) for s in self._sessions.values()),
+            "published": self.published,
+            "broker": self.broker.stats(),
+        }
+
+
+# Process-wide hub shared by lecturer and viewer connections
+hub = CaptionHub(max_messages=settings.CAPTION_VIEWER_BUFFER_MESSAGES, broker=create_broker())
@@ -1,7 +1,10 @@
 from pydantic_settings import BaseSettings
 from typing import List, Optional
+import logging
 import os
 
+logger = logging.getLogger(__name__)
+
 class Settings(BaseSettings):
     # Google Cloud
     GCP_PROJECT_ID: str
@@ -11,6 +14,11 @@ class Settings(BaseSettings):
     # Firebase
     FIREBASE_DATABASE_URL: str
     FIREBASE_PROJECT_ID: str
+    FIREBASE_INTERIM_ENABLED: bool = True  # Publish live interim captions to captions/{sessionId}/interim
+    FIREBASE_INTERIM_MAX_WRITES_PER_SECOND: float = 2.0  # Per-session interim write cap
+    FIREBASE_INTERIM_DEBOUNCE_MS: int = 150  # Hold interim updates this long to collapse rapid revisions
+    FIREBASE_TRANSCRIPT_ENABLED: bool = True  # Keep the full transcript under captions/{sessionId}/segments
+    FIREBASE_SEGMENT_SIZE: int = 50  # Finals per transcript segment
     
     # API Configuration
     API_HOST: str = "0.0.0.0"
@@ -22,8 +30,103 @@ class Settings(BaseSettings):
     SPEECH_API_REGION: str = "us"  # US region for Speech API
     SPEECH_MODEL: str = "chirp_3"  # Best multilingual accuracy
     SPEECH_LANGUAGES: List[str] = ["en-US", "sw-KE"]  # English + Swahili Kenya
-    SPEECH_SAMPLE_RATE: int = 48000  # Browser standard (48kHz)
-    
+    SPEECH_SAMPLE_RATE: int = 48000  # Browser standard (48kHz), rate clients send
+    SPEECH_TARGET_SAMPLE_RATE: int = 16000  # Rate sent to Speech after resampling
+    AUDIO_INPUT_CHANNELS: int = 1  # Interleaved channels clients send (downmixed to mono)
+
+    # Shared Speech gRPC channel pool (per API region)
+    SPEECH_POOL_SIZE: int = 2  # Channels per region, each multiplexes many streams
+    SPEECH_POOL_WARMUP_TIMEOUT: float = 10.0  # Seconds to wait for channels at startup
+    SPEECH_POOL_HEALTH_INTERVAL: float = 30.0  # Seconds between channel health checks
+    SPEECH_EMULATOR_HOST: Optional[str] = None  # host:port of a plaintext fake Speech server (load tests)
+
+    # Recognition backend (see app.recognizers)
+    RECOGNIZER_BACKEND: str = "google"  # google (Speech V2) | local (in-process Vosk model on CPU workers)
+    RECOGNIZER_FALLBACK: Optional[str] = None  # Backend a live session moves to when Speech turns it away (quota, unavailable)
+    LOCAL_ASR_MODEL_PATH: Optional[str] = None  # Vosk model directory, required by the local backend
+    LOCAL_ASR_WORKERS: int = 2  # CPU threads shared by every local recognition on the instance
+
+    # Upstream stream rollover (Speech streams are capped at ~5 minutes)
+    STREAM_ROLLOVER_SECONDS: float = 270.0  # Open the next stream this long after the last one
+    STREAM_ROLLOVER_OVERLAP_SECONDS: float = 5.0  # Max time both streams receive audio
+    STREAM_REPLAY_BUFFER_SECONDS: float = 30.0  # Recent audio kept for replay
+
+    # Audio buffering and overload handling
+    AUDIO_QUEUE_MAX_SECONDS: float = 2.0  # Audio buffered per session before the overload policy applies
+    AUDIO_OVERLOAD_POLICY: str = "block"  # block (pause reading the WebSocket) | drop_oldest | coalesce
+    AUDIO_MAX_REQUEST_BYTES: int = 15360  # Largest audio message sent upstream
+    AUDIO_FRAME_MS: int = 100  # Smaller client PCM chunks are merged into upstream frames this long (0 = forward chunks as received)
+    AUDIO_FRAME_MAX_HOLD_MS: int = 100  # Longest a partial frame waits for more audio
+    UPSTREAM_MAX_PENDING_SECONDS: float = 0.5  # Audio waiting on the gRPC stream before the pump waits
+
+    # Resumable lecturer sessions (?resume=<token> after a dropped connection)
+    SESSION_RESUME_GRACE_SECONDS: float = 30.0  # Keep a disconnected session alive this long (0 = stop at once)
+    SESSION_ACK_EVERY_CHUNKS: int = 10  # Acknowledge received audio every N chunks
+    SESSION_HELD_MESSAGES: int = 100  # Finals kept for the lecturer while disconnected
+
+    # Admission control and shutdown
+    MAX_CONCURRENT_STREAMS: int = 60  # Lecturer streams per instance (new ones beyond this are turned away)
+    ADMISSION_RETRY_AFTER_MS: int = 2000  # Suggested client back-off when turned away
+    ADMISSION_REDIRECT_URL: Optional[str] = None  # wss://host of an overflow service offered to turned-away clients
+    DRAIN_TIMEOUT_SECONDS: float = 8.0  # SIGTERM: time for live streams to finalize (Cloud Run allows 10 s)
+
+    # On-disk audio spool (lecture audio kept for re-transcription)
+    AUDIO_SPOOL_ENABLED: bool = False
+    AUDIO_SPOOL_DIR: str = "/tmp/sauti-spool"  # Mount a volume here to keep audio across instances
+    AUDIO_SPOOL_SEGMENT_SECONDS: float = 300.0  # Audio per segment file
+    AUDIO_SPOOL_BUFFER_BYTES: int = 262144  # Per-session buffer handed to the disk writer in one write
+    AUDIO_SPOOL_MAX_PENDING_BYTES: int = 33554432  # Unwritten audio before new blocks are dropped
+    AUDIO_SPOOL_RETENTION_HOURS: float = 24.0  # Closed sessions older than this are deleted
+    AUDIO_SPOOL_MAX_BYTES: int = 2147483648  # Oldest closed sessions are evicted above this size
+    AUDIO_SPOOL_SWEEP_SECONDS: float = 60.0  # Seconds between retention sweeps
+
+    # Chunk transcription result cache (/api/transcribe retries)
+    RESULT_CACHE_MAX_ENTRIES: int = 2048
+    RESULT_CACHE_TTL_SECONDS: float = 900.0
+
+    # Batch transcription of recordings (/api/transcribe/batch)
+    BATCH_MODEL: str = "long"  # Model for synchronous Recognize
+    BATCH_MAX_SEGMENT_SECONDS: float = 50.0  # Longest piece per Recognize call (API limit is 60 s)
+    BATCH_MAX_CONCURRENCY: int = 8  # Pieces of one upload recognized at once
+    BATCH_MAX_WORKERS: int = 32  # Instance-wide Recognize worker threads
+
+    # Compact result protocol (?protocol=compact)
+    COMPACT_RESYNC_EVERY: int = 20  # Interim deltas between full-text resyncs
+
+    # Viewer caption fan-out (/ws/captions/{session_id})
+    CAPTION_VIEWER_BUFFER_MESSAGES: int = 100  # Per-viewer backlog before the oldest messages are dropped
+    CAPTION_BROKER: str = "memory"  # memory (single instance) | redis (viewers on any instance)
+    REDIS_URL: str = "redis://localhost:6379/0"
+    CAPTION_BROKER_MAX_PENDING: int = 10000  # Outgoing caption events buffered before the oldest are dropped
+
+    # Timed caption cues (/api/sessions/{sessionId}/captions.vtt|.srt)
+    CAPTION_CUES_ENABLED: bool = True
+    CAPTION_CUE_MAX_LINE_CHARS: int = 42
+    CAPTION_CUE_MAX_LINES: int = 2
+    CAPTION_CUE_MAX_SECONDS: float = 7.0  # Longest stretch of speech per cue
+    CAPTION_CUE_MIN_SECONDS: float = 1.0  # Shortest time a cue stays up
+    CAPTION_CUE_MAX_CHARS_PER_SECOND: float = 17.0  # Reading speed cues are held up for
+    CAPTION_CUE_PAUSE_SECONDS: float = 1.0  # Pause between words that starts a new cue
+    CAPTION_CUE_TRACKS_KEPT: int = 100  # Ended lectures whose cues stay available
+
+    # Logging and tracing
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "json"  # json (structured lines for Cloud Logging) | text
+    LOG_QUEUE_SIZE: int = 10000  # Records waiting for the log writer thread before new ones are dropped
+    LOG_SAMPLE_PER_SECOND: float = 1.0  # Interim results logged per session per second (finals always are)
+    TRACE_SAMPLE_EVERY: int = 100  # Log one audio chunk span in this many (0 = metrics only)
+
+    # Metrics (/metrics)
+    METRICS_LOOP_LAG_INTERVAL: float = 0.5  # Seconds between event loop lag probes
+
+    # Voice activity detection (silence is not sent to Speech)
+    VAD_ENABLED: bool = True
+    VAD_MARGIN_DB: float = 10.0  # Speech must be this far above the noise floor
+    VAD_MIN_SPEECH_DB: float = -55.0  # Absolute speech level floor (dBFS)
+    VAD_PREROLL_MS: int = 300  # Audio kept before speech onset
+    VAD_HANGOVER_MS: int = 500  # Audio kept after speech ends
+    VAD_SUSPEND_AFTER_SECONDS: float = 15.0  # Close the upstream stream after this much silence (0 = never)
+
     @property
     def allowed_origins_list(self) -> List[str]:
         """Convert comma-separated ALLOWED_ORIGINS to list"""
@@ -39,11 +142,23 @@ class Settings(BaseSettings):
         case_sensitive = True
 
 settings = Settings()
+_credentials_applied = False
+
+
+def apply_credentials() -> None:
+    """
+    Export GOOGLE_APPLICATION_CREDENTIALS to the OS environment.
 
-# CRITICAL: Set GOOGLE_APPLICATION_CREDENTIALS in OS environment
-# Google Cloud libraries use os.environ, not Pydantic settings
-if settings.GOOGLE_APPLICATION_CREDENTIALS:
-    os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = settings.GOOGLE_APPLICATION_CREDENTIALS
-    print(f"✅ Credentials set: {settings.GOOGLE_APPLICATION_CREDENTIALS}")
-else:
-    print("⚠️  Warning: GOOGLE_APPLICATION_CREDENTIALS not set in .env file")
+    Google Cloud libraries read os.environ, not Pydantic settings. Called
+    right before the first Speech or Firebase client is built rather than at
+    import, so importing the app has no side effects.
+    """
+    global _credentials_applied
+    if _credentials_applied:
+        return
+    _credentials_applied = True
+    if settings.GOOGLE_APPLICATION_CREDENTIALS:
+        os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = settings.GOOGLE_APPLICATION_CREDENTIALS
+        logger.info(f"✅ Credentials set: {settings.GOOGLE_APPLICATION_CREDENTIALS}")
+    else:
+        logger.warning("⚠️  GOOGLE_APPLICATION_CREDENTIALS not set, using application default credentials")
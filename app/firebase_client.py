@@ -1,16 +1,30 @@
-import firebase_admin
-from firebase_admin import credentials, db
-from app.config import settings
+from app.config import apply_credentials, settings
+from app.logs import EventSampler
+from app.metrics import firebase_dropped_paths, firebase_write_failures, firebase_write_latency
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import asyncio
+import itertools
 import logging
 import os
+import random
+import time
 
 logger = logging.getLogger(__name__)
 
 # Initialize Firebase Admin SDK
 def initialize_firebase():
-    """Initialize Firebase Admin SDK if not already initialized"""
+    """
+    Initialize Firebase Admin SDK if not already initialized.
+
+    Called on the first write (or ahead of time by the app lifespan) rather
+    than at import, so a cold start doesn't wait on the SDK and credentials.
+    """
+    import firebase_admin
+    from firebase_admin import credentials
     if not firebase_admin._apps:
         try:
+            apply_credentials()
             # Use service account key file if provided (local dev)
             # Otherwise use Application Default Credentials (Cloud Run)
             if settings.GOOGLE_APPLICATION_CREDENTIALS and os.path.exists(settings.GOOGLE_APPLICATION_CREDENTIALS):
@@ -28,33 +42,465 @@ def initialize_firebase():
             logger.error(f"Failed to initialize Firebase: {str(e)}")
             raise
 
-# Initialize on module import
-initialize_firebase()
+class FirebasePublisher:
+    """
+    Background Realtime Database writer that keeps Firebase I/O off the
+    event loop and off the audio path.
+    
+    Updates are keyed by database path and coalesced: everything queued
+    while a write is in flight (across all sessions) goes out as a single
+    multi-path update on the next one, latest value per path winning. Writes
+    run on one worker thread reusing the Admin SDK's HTTP session, so
+    connections stay warm (keep-alive) between captions.
+    
+    Failures are handled per session (the captions/{sessionId} subtree): a
+    failed batch puts every session in it on exponential backoff, and each
+    is then retried in a write of its own, so one session's bad path can't
+    take the others' captions down with it. Only the session that keeps
+    failing has its paths dropped. When the queue overflows, the oldest
+    replaceable paths (latest, interim, meta) go first; transcript segment
+    entries are never evicted. Every drop is counted in
+    sauti_firebase_dropped_paths_total and logged.
+    """
+    def __init__(
+        self,
+        write: Optional[Callable[[Dict[str, Any]], None]] = None,
+        max_pending_paths: int = 10000,
+        max_attempts: int = 5,
+        base_backoff: float = 0.2,
+        max_backoff: float = 5.0,
+    ):
+        """
+        Args:
+            write: Blocking function applying a multi-path update (defaults to
+                the Admin SDK); runs on the worker thread
+            max_pending_paths: Oldest replaceable paths are dropped beyond this
+                (transcript entries are kept, even past it)
+            max_attempts: Attempts per session before its paths are dropped
+            base_backoff: First retry delay in seconds (doubles each attempt)
+            max_backoff: Retry delay cap in seconds
+        """
+        self._write = write or _write_updates
+        self.max_pending_paths = max_pending_paths
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self._pending: Dict[str, Any] = {}
+        self._failures: Dict[str, int] = {}  # Session -> failed attempts in a row
+        self._retry_at: Dict[str, float] = {}  # Session -> loop time of its next attempt
+        self._retry_turn = False  # Whether a due retry goes before the healthy batch
+        self._drop_log = EventSampler(rate_per_second=1.0, burst=5)
+        self._wakeup: Optional[asyncio.Event] = None
+        self._idle: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="firebase-publisher")
+        
+        # Stats
+        self.writes = 0
+        self.failed_writes = 0
+        self.retries = 0
+        self.dropped_paths = 0
+        self.last_write_ms = 0.0
+        self.avg_write_ms = 0.0
+        self.max_write_ms = 0.0
+    
+    @property
+    def queue_depth(self) -> int:
+        """Paths waiting for the next write"""
+        return len(self._pending)
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queueDepth": self.queue_depth,
+            "writes": self.writes,
+            "failedWrites": self.failed_writes,
+            "retries": self.retries,
+            "droppedPaths": self.dropped_paths,
+            "lastWriteMs": round(self.last_write_ms, 1),
+            "avgWriteMs": round(self.avg_write_ms, 1),
+            "maxWriteMs": round(self.max_write_ms, 1),
+        }
+    
+    def start(self) -> None:
+        """Start the worker on the running event loop (idempotent)"""
+        if self._worker is not None and not self._worker.done():
+            return
+        self._wakeup = asyncio.Event()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        if self._pending:
+            self._wakeup.set()
+            self._idle.clear()
+        self._worker = asyncio.create_task(self._run())
+    
+    def enqueue(self, updates: Dict[str, Any]) -> None:
+        """Queue path -> value updates; never blocks"""
+        self.start()
+        for path, value in updates.items():
+            self._pending.pop(path, None)  # Re-insert so order tracks recency
+            self._pending[path] = value
+        overflow = len(self._pending) - self.max_pending_paths
+        if overflow > 0:
+            self._evict(overflow)
+        self._idle.clear()
+        self._wakeup.set()
+    
+    async def flush(self, timeout: Optional[float] = None) -> None:
+        """Wait until everything queued so far has been written (or dropped)"""
+        if self._idle is None:
+            return
+        await asyncio.wait_for(self._idle.wait(), timeout)
+    
+    async def stop(self, timeout: float = 10.0) -> None:
+        """Flush pending writes, then stop the worker"""
+        try:
+            await self.flush(timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"⚠️  Firebase publisher stopped with {self.queue_depth} paths unwritten")
+        if self._worker is not None:
+            self._worker.cancel()
+            self._worker = None
+    
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            while self._pending:
+                batch, wait = self._next_batch(loop.time())
+                if not batch:
+                    # Only sessions backing off are left: wait for the first
+                    # of them, or for new paths
+                    self._wakeup.clear()
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), wait)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                for path in batch:
+                    del self._pending[path]
+                started = time.perf_counter()
+                try:
+                    await loop.run_in_executor(self._executor, self._write, batch)
+                except Exception as e:
+                    self._failed(batch, e, loop.time())
+                    continue
+                for session in _by_session(batch):
+                    self._failures.pop(session, None)
+                    self._retry_at.pop(session, None)
+                self._record_latency((time.perf_counter() - started) * 1000)
+            self._idle.set()
+    
+    def _next_batch(self, now: float) -> Tuple[Dict[str, Any], Optional[float]]:
+        """
+        Paths to write next: the healthy sessions' paths in one update, or a
+        failing session's on their own once its backoff is up (taking turns,
+        so neither starves the other).
+        
+        Returns:
+            The batch, and if it is empty, seconds until a retry is due
+        """
+        healthy: Dict[str, Any] = {}
+        due: Dict[str, Dict[str, Any]] = {}
+        wait: Optional[float] = None
+        for path, value in self._pending.items():
+            session = _session_of(path)
+            if session not in self._failures:
+                healthy[path] = value
+            elif self._retry_at[session] <= now:
+                due.setdefault(session, {})[path] = value
+            else:
+                wait = min(wait, self._retry_at[session] - now) if wait is not None else self._retry_at[session] - now
+        if due and (self._retry_turn or not healthy):
+            self._retry_turn = False
+            return due[min(due, key=self._retry_at.__getitem__)], None
+        self._retry_turn = True
+        return healthy, wait
+    
+    def _failed(self, batch: Dict[str, Any], error: Exception, now: float) -> None:
+        """Put each session in a failed batch on backoff, or drop its paths once it is out of attempts"""
+        retry: Dict[str, Any] = {}
+        for session, paths in _by_session(batch).items():
+            attempt = self._failures.get(session, 0) + 1
+            if attempt >= self.max_attempts:
+                self._failures.pop(session, None)
+                self._retry_at.pop(session, None)
+                self.failed_writes += 1
+                firebase_write_failures.inc()
+                logger.error(
+                    f"❌ Firebase write for {session} failed {attempt} times, dropping {len(paths)} paths: {str(error)}"
+                )
+                self._dropped(len(paths), "failed")
+                continue
+            delay = min(self.max_backoff, self.base_backoff * 2 ** (attempt - 1))
+            delay *= 0.5 + random.random() / 2
+            self._failures[session] = attempt
+            self._retry_at[session] = now + delay
+            retry.update(paths)
+        if retry:
+            # Newer values queued meanwhile win over the failed ones
+            self._pending = {**retry, **self._pending}
+            self.retries += 1
+            logger.warning(
+                f"⚠️  Firebase write of {len(batch)} paths failed, retrying "
+                f"{len(retry)} of them per session: {str(error)}"
+            )
+    
+    def _evict(self, count: int) -> None:
+        """Drop the oldest replaceable paths (never transcript entries) to get back under the bound"""
+        evicted = list(itertools.islice((path for path in self._pending if not _is_segment(path)), count))
+        for path in evicted:
+            del self._pending[path]
+        if evicted:
+            self._dropped(len(evicted), "overflow")
+    
+    def _dropped(self, count: int, reason: str) -> None:
+        self.dropped_paths += count
+        firebase_dropped_paths.inc(count, reason)
+        if reason == "overflow" and self._drop_log.allow():
+            suppressed = self._drop_log.take_suppressed()
+            logger.warning(
+                f"⚠️  Firebase queue full ({self.queue_depth} paths), dropped {count} older paths"
+                + (f" (and {suppressed} more drops since the last report)" if suppressed else "")
+            )
+    
+    def _record_latency(self, elapsed_ms: float) -> None:
+        firebase_write_latency.observe(elapsed_ms / 1000)
+        self.writes += 1
+        self.last_write_ms = elapsed_ms
+        self.max_write_ms = max(self.max_write_ms, elapsed_ms)
+        # Exponentially weighted average, reacts within ~10 writes
+        self.avg_write_ms = elapsed_ms if self.writes == 1 else 0.9 * self.avg_write_ms + 0.1 * elapsed_ms
+
+
+def _session_of(path: str) -> str:
+    """The session subtree a path belongs to (captions/{sessionId})"""
+    return "/".join(path.split("/", 2)[:2])
+
+
+def _by_session(updates: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    sessions: Dict[str, Dict[str, Any]] = {}
+    for path, value in updates.items():
+        sessions.setdefault(_session_of(path), {})[path] = value
+    return sessions
+
+
+def _is_segment(path: str) -> bool:
+    """Transcript entries are written once and never superseded, so they are never evicted"""
+    return "/segments/" in path
+
+
+def _write_updates(updates: Dict[str, Any]) -> None:
+    """Apply a multi-path update at the database root (blocking)"""
+    from firebase_admin import db
+    initialize_firebase()
+    db.reference('/').update(updates)
+
+
+# Process-wide publisher, started on first use or by the app lifespan
+publisher = FirebasePublisher()
 
-async def publish_caption(session_id: str, caption_text: str) -> None:
+
+async def publish_caption(session_id: str, caption_text: str, updates: Optional[Dict[str, Any]] = None) -> None:
     """
     Publish caption to Firebase Realtime Database.
     
     Writes to: /captions/{sessionId}/latest
     Structure: { text: string, timestamp: ServerValue.TIMESTAMP }
     
+    The write is queued on the background publisher and coalesced with other
+    pending updates; this returns immediately.
+    
     Args:
         session_id: Classroom session ID
         caption_text: Transcribed text to publish
+        updates: Other paths to write along with it (the blanked interim)
     """
-    try:
-        if not caption_text:
-            logger.debug(f"Skipping empty caption for session: {session_id}")
-            return
-        
-        ref = db.reference(f'captions/{session_id}/latest')
-        ref.set({
+    if not caption_text:
+        logger.debug("Skipping empty caption for session: %s", session_id)
+        return
+    
+    publisher.enqueue({
+        **(updates or {}),
+        f'captions/{session_id}/latest': {
             'text': caption_text,
             'timestamp': {'.sv': 'timestamp'}  # Firebase server timestamp
+        }
+    })
+    
+    logger.debug("Caption queued for session %s: %.30s...", session_id, caption_text)
+
+
+class TranscriptSegmentWriter:
+    """
+    Append-only, segmented transcript for one session.
+    
+    Writes to:
+        /captions/{sessionId}/segments/seg{segment:06d}/seq{seq:06d}
+            { text, seq, startMs, endMs, words: [{ w, s, e }], timestamp }
+        /captions/{sessionId}/meta
+            { lastSeq, segmentCount, segmentSize, updatedAt }
+    
+    Finals are numbered from 0 and grouped `segment_size` to a segment, so no
+    node grows with lecture length: a late joiner reads `meta` and fetches
+    only the segments it is missing (segment = seq // segmentSize), and a live
+    viewer only pays for the segment being appended to. Keys are prefixed so
+    the Realtime DB never turns a segment into an array.
+    
+    Entries go through the background publisher, which batches everything
+    pending (entries plus the latest meta) into one multi-path update.
+    """
+    def __init__(
+        self,
+        session_id: str,
+        segment_size: int = settings.FIREBASE_SEGMENT_SIZE,
+        publisher: Optional[FirebasePublisher] = None,
+    ):
+        self.session_id = session_id
+        self.segment_size = segment_size
+        self._publisher = publisher
+        self.next_seq = 0
+    
+    @property
+    def publisher(self) -> FirebasePublisher:
+        return self._publisher or publisher
+    
+    def entry_path(self, seq: int) -> str:
+        return f'captions/{self.session_id}/segments/seg{seq // self.segment_size:06d}/seq{seq:06d}'
+    
+    def append(
+        self,
+        text: str,
+        start_ms: Optional[int] = None,
+        end_ms: Optional[int] = None,
+        words: Optional[List[Dict[str, Any]]] = None,
+    ) -> int:
+        """
+        Queue one final transcript.
+        
+        Args:
+            text: Final transcript
+            start_ms: Start of the result in the lecture (ms of audio received,
+                silence included, as in the audio spool)
+            end_ms: End of the result in the lecture
+            words: Word timings as {'w': word, 's': startMs, 'e': endMs}
+        
+        Returns:
+            Sequence number assigned to the entry
+        """
+        seq = self.next_seq
+        self.next_seq += 1
+        entry: Dict[str, Any] = {
+            'text': text,
+            'seq': seq,
+            'timestamp': {'.sv': 'timestamp'}
+        }
+        if start_ms is not None:
+            entry['startMs'] = start_ms
+        if end_ms is not None:
+            entry['endMs'] = end_ms
+        if words:
+            entry['words'] = words
+        
+        self.publisher.enqueue({
+            self.entry_path(seq): entry,
+            f'captions/{self.session_id}/meta': {
+                'lastSeq': seq,
+                'segmentCount': seq // self.segment_size + 1,
+                'segmentSize': self.segment_size,
+                'updatedAt': {'.sv': 'timestamp'}
+            }
         })
+        return seq
+
+
+class InterimCaptionThrottle:
+    """
+    Latest-wins interim caption channel for one session.
+    
+    Writes to: /captions/{sessionId}/interim
+    
+    Interim hypotheses arrive several times a second; publishing each one
+    would blow through Realtime DB write quotas. Updates are held for a short
+    debounce window (rapid revisions collapse into one), written at most
+    `max_writes_per_second`, and skipped when the text hasn't changed since
+    the last write. Viewers get sub-second captions at a capped write cost.
+    """
+    def __init__(
+        self,
+        session_id: str,
+        publisher: Optional[FirebasePublisher] = None,
+        max_writes_per_second: float = settings.FIREBASE_INTERIM_MAX_WRITES_PER_SECOND,
+        debounce_ms: int = settings.FIREBASE_INTERIM_DEBOUNCE_MS,
+    ):
+        self.session_id = session_id
+        self.path = f'captions/{session_id}/interim'
+        self._publisher = publisher
+        self.min_interval = 1.0 / max_writes_per_second
+        self.debounce = debounce_ms / 1000
+        self._latest = ""
+        self._last_sent = ""
+        self._next_allowed = 0.0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.writes = 0
+        self.suppressed = 0
+    
+    @property
+    def publisher(self) -> FirebasePublisher:
+        return self._publisher or publisher
+    
+    def update(self, text: str) -> None:
+        """Offer a new interim hypothesis (only the latest one is written)"""
+        self._latest = text
+        if self._timer is not None:
+            self.suppressed += 1  # Superseded before it was written
+            return
+        if text == self._last_sent:
+            self.suppressed += 1
+            return
+        loop = asyncio.get_running_loop()
+        delay = max(self.debounce, self._next_allowed - loop.time())
+        self._timer = loop.call_later(delay, self._flush)
+    
+    def _flush(self) -> None:
+        self._timer = None
+        if self._latest == self._last_sent:
+            return
+        self._write(self._latest)
+        self._next_allowed = asyncio.get_running_loop().time() + self.min_interval
+    
+    def _write(self, text: str) -> None:
+        self.publisher.enqueue(self._update(text))
+    
+    def _update(self, text: str) -> Dict[str, Any]:
+        self._last_sent = text
+        self.writes += 1
+        return {
+            self.path: {
+                'text': text,
+                'timestamp': {'.sv': 'timestamp'}
+            }
+        }
+    
+    def clear(self) -> Dict[str, Any]:
+        """
+        The hypothesis became final: drop any pending write and blank the node.
         
-        logger.info(f"Caption published to session {session_id}: {caption_text[:30]}...")
+        The blank counts against the write rate like any interim, but isn't
+        queued here: it goes out in the same update as the final caption.
         
-    except Exception as e:
-        logger.error(f"Failed to publish caption: {str(e)}")
-        raise
+        Returns:
+            Update blanking the node (empty if it is already blank)
+        """
+        self.close()
+        self._latest = ""
+        if not self._last_sent:
+            return {}
+        self._next_allowed = asyncio.get_running_loop().time() + self.min_interval
+        return self._update("")
+    
+    def close(self) -> None:
+        """Cancel any pending write"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
@@ -0,0 +1,164 @@
+"""
+Structured, non-blocking logging.
+
+Formatting a record and writing it to stdout used to happen on the event
+loop for every interim result. Now:
+
+- The root logger has a single QueueHandler: the calling thread only builds
+  the LogRecord and drops it on a bounded queue. A listener thread formats
+  and writes it. When the queue is full, records are dropped and counted
+  (sauti_log_records_dropped_total) instead of stalling audio.
+- Records are one JSON object per line (LOG_FORMAT=json): `severity` and
+  `message` are what Cloud Logging indexes, and `sessionId` comes from the
+  context of the lecture that logged it (see `session_context`). Extra
+  fields passed with `extra={...}` are included as is.
+- High-frequency events (interims, per-chunk traces) go through an
+  `EventSampler`: a per-session token bucket. A record that gets through
+  carries a `suppressed` count of the ones that didn't.
+
+Hot-path call sites use %-style arguments: the message is only formatted
+on the writer thread, and not at all for records below the log level.
+"""
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import queue
+import time
+from datetime import datetime, timezone
+from typing import Optional
+from app.metrics import registry
+
+# Session the current task is working for (set by the WebSocket handlers;
+# tasks they create inherit it)
+session_context: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("session_id", default=None)
+
+records_dropped = registry.counter(
+    "sauti_log_records_dropped_total", "Log records dropped because the log writer fell behind"
+)
+
+# LogRecord attributes that aren't user-supplied `extra` fields
+_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "sessionId"}
+
+
+class SessionFilter(logging.Filter):
+    """Tag records with the session of the task that logged them"""
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, "sessionId"):
+            record.sessionId = session_context.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, in Cloud Logging's structured format"""
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "severity": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        session_id = getattr(record, "sessionId", None)
+        if session_id is not None:
+            entry["sessionId"] = session_id
+        for name, value in vars(record).items():
+            if name not in _RECORD_FIELDS:
+                entry[name] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class _NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Message arguments and tracebacks are formatted on the listener
+        # thread, so log values (str, numbers), not objects still changing
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            records_dropped.inc()
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def configure_logging(level: str = "INFO", json_format: bool = True, queue_size: int = 10000, stream=None) -> None:
+    """
+    Route every log record through a bounded queue to a writer thread.
+
+    Args:
+        level: Root log level
+        json_format: Structured JSON lines (otherwise the plain text format)
+        queue_size: Records buffered for the writer before new ones are dropped
+        stream: Where the writer thread writes (stderr by default)
+    """
+    global _listener
+    stop_logging()
+    output = logging.StreamHandler(stream)
+    if json_format:
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+    records: queue.Queue = queue.Queue(maxsize=queue_size)
+    handler = _NonBlockingQueueHandler(records)
+    handler.addFilter(SessionFilter())
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        if isinstance(existing, _NonBlockingQueueHandler):
+            root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level)
+    _listener = logging.handlers.QueueListener(records, output, respect_handler_level=True)
+    _listener.start()
+
+
+def stop_logging() -> None:
+    """Write out queued records and stop the writer thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(stop_logging)
+
+
+class EventSampler:
+    """Token bucket for one session's high-frequency log events"""
+    __slots__ = ("rate", "burst", "_tokens", "_updated", "suppressed")
+
+    def __init__(self, rate_per_second: float = 1.0, burst: float = 5.0):
+        """
+        Args:
+            rate_per_second: Sustained events let through (0 lets none through)
+            burst: Events let through back to back after a quiet spell
+        """
+        self.rate = rate_per_second
+        self.burst = max(1.0, burst)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self.suppressed = 0
+
+    def allow(self) -> bool:
+        """True if this event should be logged (take suppressed counts with take_suppressed())"""
+        if self.rate <= 0:
+            self.suppressed += 1
+            return False
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        if self._tokens >= 1.0:
+            self._tokens -= 1.0
+            return True
+        self.suppressed += 1
+        return False
+
+    def take_suppressed(self) -> int:
+        """Events suppressed since the last call"""
+        count, self.suppressed = self.suppressed, 0
+        return count
@@ -1,30 +1,139 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from contextlib import asynccontextmanager
+from app.admission import admission
 from app.config import settings
-from app.websocket import router as websocket_router
+from app.websocket import router as websocket_router, drain_streams, REGION as STREAMING_REGION
+from app.api import router as api_router
+from app.audio_spool import close_audio_spool
+from app.batch import shutdown_batch_executor
+from app.recognizers import BACKEND_GOOGLE, BACKEND_LOCAL, fallback_backend, load_local_model, shutdown_local_executor
+from app.transcription import result_cache
+from app.metrics import registry as metrics_registry, monitor_event_loop_lag
+from app.speech_pool import get_speech_pool, close_speech_pools
+from app.firebase_client import initialize_firebase, publisher as firebase_publisher
+from app.caption_hub import hub as caption_hub
+from app.logs import configure_logging
+import asyncio
+import contextvars
 import logging
+import signal
+import threading
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
+# Warm-up state per dependency, reported by /health/ready:
+# "pending" until its warm-up finishes, then "ready" or "failed"
+readiness = {"speech": "pending", "firebase": "pending"}
+
+async def warm_speech():
+    """Import the Speech clients and pre-connect the shared channels (or load the local model)"""
+    backends = (settings.RECOGNIZER_BACKEND, fallback_backend())
+    try:
+        if BACKEND_GOOGLE in backends:
+            # Pre-connect the shared Speech channels so the first lecture skips the handshake
+            speech_pool = get_speech_pool(STREAMING_REGION)
+            await speech_pool.start(timeout=settings.SPEECH_POOL_WARMUP_TIMEOUT)
+            speech_pool.start_health_checks(settings.SPEECH_POOL_HEALTH_INTERVAL)
+        if BACKEND_LOCAL in backends:
+            await asyncio.to_thread(load_local_model)
+        readiness["speech"] = "ready"
+    except Exception as e:
+        readiness["speech"] = "failed"
+        logger.error(f"❌ Speech warm-up failed: {str(e)}")
+
+async def warm_firebase():
+    """Initialize the Firebase Admin SDK off the event loop"""
+    try:
+        await asyncio.to_thread(initialize_firebase)
+        readiness["firebase"] = "ready"
+    except Exception as e:
+        readiness["firebase"] = "failed"
+        logger.error(f"❌ Firebase warm-up failed: {str(e)}")
+
+async def warm_up():
+    """Bring up the heavy clients concurrently, after the server is listening"""
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    await asyncio.gather(warm_speech(), warm_firebase())
+    logger.info(f"✅ Warm-up finished in {loop.time() - started:.2f}s: {readiness}")
+
+async def drain(timeout: float):
+    """Stop admitting streams, let live ones finalize and flush Firebase"""
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    admission.start_drain()
+    unfinished = await drain_streams(timeout)
+    try:
+        await firebase_publisher.flush(max(0.5, timeout - (loop.time() - started)))
+    except asyncio.TimeoutError:
+        logger.warning(f"⚠️  Drain timed out with {firebase_publisher.queue_depth} Firebase paths unwritten")
+    logger.info(f"🚰 Drained in {loop.time() - started:.2f}s ({unfinished} streams cut off)")
+
+def install_drain_handler():
+    """
+    Drain on the first SIGTERM before handing it on to uvicorn, whose own
+    shutdown closes every WebSocket at once. A second SIGTERM skips the wait.
+    """
+    if threading.current_thread() is not threading.main_thread():
+        return
+    loop = asyncio.get_running_loop()
+    previous = signal.getsignal(signal.SIGTERM)
+    
+    def forward(sig, frame):
+        if callable(previous):
+            previous(sig, frame)
+        else:
+            signal.signal(sig, signal.SIG_DFL)
+            signal.raise_signal(sig)
+    
+    def start_drain(sig, frame):
+        logger.info("🛑 SIGTERM received, draining live streams")
+        task = asyncio.create_task(drain(settings.DRAIN_TIMEOUT_SECONDS))
+        task.add_done_callback(lambda _: forward(sig, frame))
+    
+    def handle_sigterm(sig, frame):
+        if admission.draining:
+            forward(sig, frame)
+            return
+        # Signal handlers interrupt arbitrary code: do the work on the loop
+        # (in a fresh context, not that of whichever session was interrupted)
+        loop.call_soon_threadsafe(start_drain, sig, frame, context=contextvars.Context())
+    
+    signal.signal(signal.SIGTERM, handle_sigterm)
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Lifespan event handler for startup and shutdown"""
-    # Startup
+    # Startup: records are formatted and written on a background thread,
+    # started here rather than at import
+    configure_logging(settings.LOG_LEVEL, settings.LOG_FORMAT == "json", settings.LOG_QUEUE_SIZE)
     logger.info("🚀 Sauti Darasa Backend starting...")
     logger.info(f"Project: {settings.GCP_PROJECT_ID}")
     logger.info(f"Region: {settings.GCP_REGION}")
     logger.info(f"Allowed Origins: {settings.allowed_origins_list}")
     logger.info("📡 WebSocket endpoint: /ws/transcribe/{session_id}")
+    logger.info("👀 Viewer endpoint: /ws/captions/{session_id}")
+    
+    # Don't hold up the listening socket: liveness is answered right away and
+    # /health/ready turns 200 once the clients are warm
+    warm_up_task = asyncio.create_task(warm_up())
+    firebase_publisher.start()
+    await caption_hub.start()
+    loop_lag_monitor = asyncio.create_task(monitor_event_loop_lag(settings.METRICS_LOOP_LAG_INTERVAL))
+    install_drain_handler()
     yield
     # Shutdown
     logger.info("🛑 Sauti Darasa Backend shutting down...")
+    warm_up_task.cancel()
+    loop_lag_monitor.cancel()
+    await caption_hub.close()
+    await firebase_publisher.stop()
+    shutdown_batch_executor()
+    shutdown_local_executor()
+    await asyncio.to_thread(close_audio_spool)
+    await close_speech_pools()
 
 # Create FastAPI application
 app = FastAPI(
@@ -48,6 +157,9 @@ app.add_middleware(
 # Include WebSocket router for streaming transcription
 app.include_router(websocket_router, tags=["WebSocket"])
 
+# HTTP transcription: single chunks and recorded lectures
+app.include_router(api_router, tags=["Transcription"])
+
 @app.get("/")
 async def root():
     """Root endpoint - service information"""
@@ -57,20 +169,60 @@ async def root():
         "version": "2.0.0",
         "endpoints": {
             "health": "/health",
+            "ready": "/health/ready",
             "websocket": "/ws/transcribe/{session_id}",
+            "captions": "/ws/captions/{session_id}",
+            "batch": "/api/transcribe/batch",
+            "metrics": "/metrics",
             "docs": "/docs"
         }
     }
 
 @app.get("/health")
 async def health_check():
-    """Health check endpoint for monitoring"""
+    """Liveness: the process is up and serving (warm-up may still be running)"""
     return {
         "status": "healthy",
+        "ready": is_ready(),
+        "capacity": admission.stats(),
         "service": "transcription-api",
-        "project": settings.GCP_PROJECT_ID
+        "project": settings.GCP_PROJECT_ID,
+        "firebase": firebase_publisher.stats(),
+        "viewers": caption_hub.stats(),
+        "resultCache": result_cache.stats(),
     }
 
+def is_ready() -> bool:
+    return admission.accepting and all(state == "ready" for state in readiness.values())
+
+@app.get("/health/ready")
+async def readiness_check():
+    """
+    Readiness: 503 until the Speech channels and Firebase are warmed up, and
+    while the instance is full or draining
+    """
+    ready = is_ready()
+    if ready:
+        status = "ready"
+    elif admission.draining:
+        status = "draining"
+    elif not admission.accepting:
+        status = "full"
+    else:
+        status = "starting"
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": status, "checks": dict(readiness), "capacity": admission.stats()},
+    )
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus metrics (text exposition format)"""
+    return PlainTextResponse(
+        metrics_registry.render(),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
 @app.exception_handler(404)
 async def not_found_handler(request, exc):
     """Custom 404 handler"""
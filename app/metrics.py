@@ -0,0 +1,207 @@
+"""
+Minimal Prometheus metrics, served as text from `/metrics`.
+
+A small in-process registry rather than a client library: updates are plain
+integer/float increments and a bisect into fixed histogram buckets, cheap
+enough to leave on for every audio chunk. Values that already live elsewhere
+(queue depths, active sessions) are read by callbacks at scrape time instead
+of being pushed on the hot path.
+"""
+import asyncio
+import logging
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+LabelValues = Tuple[str, ...]
+# Callback result: one value, or a value per label combination
+Sample = Union[float, Dict[LabelValues, float]]
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 10.0)
+FAST_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+def _format_labels(names: Sequence[str], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+
+    def collect(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}", *self.collect()]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, *labels: str) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def collect(self) -> Iterable[str]:
+        for labels, value in self._values.items():
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        function: Optional[Callable[[], Sample]] = None,
+    ):
+        """
+        Args:
+            function: Read the value(s) at scrape time instead of using set()
+        """
+        super().__init__(name, help, labelnames)
+        self.function = function
+        self._values: Dict[LabelValues, float] = {}
+
+    def set(self, value: float, *labels: str) -> None:
+        self._values[labels] = value
+
+    def collect(self) -> Iterable[str]:
+        values = self._values
+        if self.function is not None:
+            sample = self.function()
+            values = sample if isinstance(sample, dict) else {(): sample}
+        for labels, value in values.items():
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help)
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)  # Last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self._counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def collect(self) -> Iterable[str]:
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self._counts):
+            cumulative += count
+            yield f'{self.name}_bucket{{le="{_format_value(bound)}"}} {cumulative}'
+        yield f"{self.name}_sum {_format_value(self.sum)}"
+        yield f"{self.name}_count {self.count}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help, labelnames))
+
+    def gauge(self, name: str, help: str, labelnames: Sequence[str] = (), function=None) -> Gauge:
+        return self.register(Gauge(name, help, labelnames, function))
+
+    def histogram(self, name: str, help: str, buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, buckets))
+
+    def get(self, name: str) -> Metric:
+        return self._metrics[name]
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            try:
+                lines.extend(metric.render())
+            except Exception as e:
+                logger.warning(f"⚠️  Metric {metric.name} failed to collect: {str(e)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# Pipeline metrics shared across modules
+interim_latency = registry.histogram(
+    "sauti_interim_latency_seconds",
+    "Time from receiving audio to the first interim result covering it",
+)
+final_latency = registry.histogram(
+    "sauti_final_latency_seconds",
+    "Time from receiving audio to the final result covering it",
+)
+audio_received_bytes = registry.counter(
+    "sauti_audio_received_bytes_total", "Audio bytes received from lecturers (as sent)"
+)
+audio_upstream_bytes = registry.counter(
+    "sauti_audio_upstream_bytes_total", "Audio bytes forwarded to Speech (after resampling and VAD)"
+)
+upstream_errors = registry.counter(
+    "sauti_upstream_errors_total", "Speech streaming errors", ("kind",)
+)
+firebase_write_latency = registry.histogram(
+    "sauti_firebase_write_seconds", "Duration of Firebase multi-path writes", FAST_BUCKETS
+)
+firebase_write_failures = registry.counter(
+    "sauti_firebase_write_failures_total", "Firebase writes dropped after all retries"
+)
+firebase_dropped_paths = registry.counter(
+    "sauti_firebase_dropped_paths_total", "Queued Firebase paths dropped before they were written", ("reason",)
+)
+event_loop_lag = registry.histogram(
+    "sauti_event_loop_lag_seconds", "How late the event loop ran a scheduled wakeup", FAST_BUCKETS
+)
+event_loop_lag_last = registry.gauge(
+    "sauti_event_loop_lag_last_seconds", "Most recent event loop lag measurement"
+)
+
+
+async def monitor_event_loop_lag(interval: float = 0.5) -> None:
+    """Measure how late sleeps wake up; a busy or blocked loop shows up here"""
+    loop = asyncio.get_running_loop()
+    while True:
+        scheduled = loop.time() + interval
+        await asyncio.sleep(interval)
+        lag = max(0.0, loop.time() - scheduled)
+        event_loop_lag.observe(lag)
+        event_loop_lag_last.set(lag)
@@ -0,0 +1,297 @@
+"""
+Opus audio over the transcription WebSocket.
+
+Clients negotiate `?encoding=webm-opus` (MediaRecorder's default in Chrome
+and Firefox) or `?encoding=ogg-opus` and send the recorder's output as is:
+~32 kbps instead of 768 kbps of 48 kHz PCM. The bytes are passed straight
+through to Speech, which decodes the container itself, so the PCM stages
+(resampling, VAD) are skipped.
+
+Rollover still has to replay unfinalized audio, and a container can't be
+cut at an arbitrary byte: a new upstream stream gets the container header
+followed by whole clusters (WebM) or pages (Ogg). The parsers below track
+where those start and their timestamps, without decoding anything.
+"""
+from collections import deque
+from typing import Deque, Iterator, List, Optional, Tuple
+from app.ring_buffer import AudioRingBuffer
+
+ENCODING_LINEAR16 = "linear16"
+ENCODING_WEBM_OPUS = "webm-opus"
+ENCODING_OGG_OPUS = "ogg-opus"
+ENCODINGS = (ENCODING_LINEAR16, ENCODING_WEBM_OPUS, ENCODING_OGG_OPUS)
+
+# A resumable unit: (start time in ms, absolute byte offset in the stream)
+Unit = Tuple[float, int]
+
+# Opus frame length (ms) by TOC config number (RFC 6716, section 3.1)
+_FRAME_MS = (
+    [10, 20, 40, 60] * 3  # SILK NB, MB, WB
+    + [10, 20] * 2  # Hybrid SWB, FB
+    + [2.5, 5, 10, 20] * 4  # CELT NB, WB, SWB, FB
+)
+
+
+def opus_packet_ms(packet: bytes) -> float:
+    """Duration of an Opus packet, from its TOC byte"""
+    if not packet:
+        return 0.0
+    toc = packet[0]
+    code = toc & 0x03
+    if code == 0:
+        frames = 1
+    elif code in (1, 2):
+        frames = 2
+    else:
+        frames = packet[1] & 0x3F if len(packet) > 1 else 1
+    return _FRAME_MS[toc >> 3] * frames
+
+
+# WebM / Matroska element IDs
+_EBML_CLUSTER = 0x1F43B675
+_EBML_TIMECODE = 0xE7
+_EBML_SIMPLE_BLOCK = 0xA3
+_EBML_BLOCK = 0xA1
+_EBML_TIMECODE_SCALE = 0x2AD7B1
+# Master elements whose children are read in place (everything else we don't
+# need is skipped by size)
+_EBML_ENTER = {0x18538067, _EBML_CLUSTER, 0xA0, 0x1549A966}  # Segment, Cluster, BlockGroup, Info
+_EBML_READ = {_EBML_TIMECODE, _EBML_SIMPLE_BLOCK, _EBML_BLOCK, _EBML_TIMECODE_SCALE}
+
+
+def _vint_length(first: int) -> int:
+    for length in range(1, 9):
+        if first & (0x80 >> (length - 1)):
+            return length
+    raise ValueError("Invalid EBML variable-length integer")
+
+
+class WebmOpusParser:
+    """Incremental WebM scanner: clusters and block timestamps"""
+    def __init__(self):
+        self._buffer = bytearray()
+        self._position = 0  # Absolute offset of _buffer[0]
+        self._skip = 0  # Bytes of an uninteresting element still to pass
+        self._header = bytearray()
+        self.header: Optional[bytes] = None  # Everything before the first cluster
+        self._timecode_scale_ms = 1.0
+        self._cluster_start: Optional[int] = None  # Offset of a cluster awaiting its timecode
+        self._cluster_ms = 0.0
+        self.end_ms = 0.0  # End of the newest complete block
+
+    def feed(self, data: bytes) -> List[Unit]:
+        """
+        Scan more of the stream.
+
+        Returns:
+            Clusters that started in it
+        """
+        if self.header is None:
+            self._header += data
+        if self._skip:
+            skipped = min(self._skip, len(data))
+            self._skip -= skipped
+            self._position += skipped
+            data = data[skipped:]
+        self._buffer += data
+        units = []
+        while True:
+            unit = self._next_element()
+            if unit is False:
+                break
+            if unit is not None:
+                units.append(unit)
+        return units
+
+    def _consume(self, count: int) -> None:
+        del self._buffer[:count]
+        self._position += count
+
+    def _next_element(self):
+        """Parse one element; False when more data is needed"""
+        buffer = self._buffer
+        if self._skip or not buffer:
+            return False
+        id_length = _vint_length(buffer[0])
+        if len(buffer) < id_length + 1:
+            return False
+        size_length = _vint_length(buffer[id_length])
+        header_length = id_length + size_length
+        if len(buffer) < header_length:
+            return False
+        element_id = int.from_bytes(buffer[:id_length], "big")
+        size = int.from_bytes(buffer[id_length:header_length], "big") & ((1 << (7 * size_length)) - 1)
+        unknown_size = size == (1 << (7 * size_length)) - 1
+
+        if element_id in _EBML_ENTER:
+            if element_id == _EBML_CLUSTER:
+                if self.header is None:
+                    self.header = bytes(self._header[:self._position])
+                    self._header = bytearray()
+                self._cluster_start = self._position
+            self._consume(header_length)
+            return None
+        if element_id in _EBML_READ and not unknown_size:
+            if len(buffer) < header_length + size:
+                return False
+            payload = bytes(buffer[header_length:header_length + size])
+            self._consume(header_length + size)
+            return self._read(element_id, payload)
+        # Not needed: skip it, even if it hasn't fully arrived yet
+        self._consume(header_length)
+        if unknown_size:
+            return None
+        skipped = min(size, len(self._buffer))
+        self._consume(skipped)
+        self._skip = size - skipped
+        return None
+
+    def _read(self, element_id: int, payload: bytes) -> Optional[Unit]:
+        if element_id == _EBML_TIMECODE_SCALE:
+            self._timecode_scale_ms = int.from_bytes(payload, "big") / 1e6
+        elif element_id == _EBML_TIMECODE:
+            self._cluster_ms = int.from_bytes(payload, "big") * self._timecode_scale_ms
+            if self._cluster_start is not None:
+                unit = (self._cluster_ms, self._cluster_start)
+                self._cluster_start = None
+                return unit
+        else:
+            # (Simple)Block: track number, int16 relative timecode, flags, frames
+            track_length = _vint_length(payload[0])
+            relative = int.from_bytes(payload[track_length:track_length + 2], "big", signed=True)
+            flags = payload[track_length + 2]
+            frames = payload[track_length + 3:]
+            count = 1
+            if flags & 0x06:  # Laced: first byte is the frame count - 1
+                count, frames = frames[0] + 1, frames[1:]
+            start_ms = self._cluster_ms + relative * self._timecode_scale_ms
+            self.end_ms = max(self.end_ms, start_ms + count * opus_packet_ms(frames))
+        return None
+
+
+class OggOpusParser:
+    """Incremental Ogg scanner: page boundaries and granule positions"""
+    def __init__(self):
+        self._buffer = bytearray()
+        self._position = 0
+        self._skip = 0
+        self._header = bytearray()
+        self.header: Optional[bytes] = None  # OpusHead and OpusTags pages
+        self._granule = 0  # Samples (48 kHz) up to the end of the last page
+        self.end_ms = 0.0
+
+    def feed(self, data: bytes) -> List[Unit]:
+        """
+        Scan more of the stream.
+
+        Returns:
+            Audio pages that started in it (those that begin a packet)
+        """
+        if self.header is None:
+            self._header += data
+        if self._skip:
+            skipped = min(self._skip, len(data))
+            self._skip -= skipped
+            self._position += skipped
+            data = data[skipped:]
+        self._buffer += data
+        units = []
+        while not self._skip and len(self._buffer) >= 27:
+            buffer = self._buffer
+            if buffer[:4] != b"OggS":
+                raise ValueError("Lost Ogg page sync")
+            segments = buffer[26]
+            if len(buffer) < 27 + segments:
+                break
+            header_type = buffer[5]
+            granule = int.from_bytes(buffer[6:14], "little", signed=True)
+            body = sum(buffer[27:27 + segments])
+            page_start = self._position
+
+            if self.header is None and granule != 0:
+                self.header = bytes(self._header[:page_start])
+                self._header = bytearray()
+            if self.header is not None and not header_type & 0x01:
+                units.append((self._granule / 48, page_start))
+            if granule > 0:
+                self._granule = granule
+                self.end_ms = granule / 48
+
+            length = 27 + segments + body
+            skipped = min(length, len(buffer))
+            del buffer[:skipped]
+            self._position += skipped
+            self._skip = length - skipped
+        return units
+
+
+def create_parser(encoding: str):
+    if encoding == ENCODING_WEBM_OPUS:
+        return WebmOpusParser()
+    if encoding == ENCODING_OGG_OPUS:
+        return OggOpusParser()
+    raise ValueError(f"No container parser for {encoding}")
+
+
+class CompressedReplayBuffer:
+    """
+    Recent Opus audio for replay, with the same interface as AudioRingBuffer
+    but addressed by audio position (LINEAR16-equivalent bytes, so result
+    offsets from Speech map onto it exactly as for PCM) instead of raw bytes.
+    """
+    def __init__(self, encoding: str, capacity_bytes: int, bytes_per_second: int):
+        """
+        Args:
+            encoding: ENCODING_WEBM_OPUS or ENCODING_OGG_OPUS
+            capacity_bytes: Approximate amount of raw stream to keep
+            bytes_per_second: Size of one second in the offsets used outside
+        """
+        self.parser = create_parser(encoding)
+        self.bytes_per_second = bytes_per_second
+        self._raw = AudioRingBuffer(capacity_bytes)
+        self._units: Deque[Tuple[int, int]] = deque()  # (audio offset, raw offset)
+
+    def _to_offset(self, ms: float) -> int:
+        return int(ms * self.bytes_per_second / 2000) * 2
+
+    @property
+    def end_offset(self) -> int:
+        """Audio offset just past the newest complete frame"""
+        return self._to_offset(self.parser.end_ms)
+
+    @property
+    def start_offset(self) -> int:
+        """Audio offset of the oldest unit that can still be replayed"""
+        return self._units[0][0] if self._units else self.end_offset
+
+    def __len__(self) -> int:
+        return len(self._raw)
+
+    def append(self, chunk: bytes) -> None:
+        self._raw.append(chunk)
+        for start_ms, position in self.parser.feed(chunk):
+            self._units.append((self._to_offset(start_ms), position))
+        while self._units and self._units[0][1] < self._raw.start_offset:
+            self._units.popleft()
+
+    def resume_point(self, offset: int) -> int:
+        """Start of the unit a replay covering `offset` has to begin with"""
+        point = self.start_offset
+        for start, _ in self._units:
+            if start > offset:
+                break
+            point = start
+        return point
+
+    def chunks_since(self, offset: int) -> Iterator[memoryview]:
+        """
+        Yield a self-contained stream: the container header, then the raw
+        bytes from the unit at resume_point(offset) to the end.
+        """
+        point = self.resume_point(offset)
+        if self.parser.header:
+            yield memoryview(self.parser.header)
+        for start, position in self._units:
+            if start == point:
+                yield from self._raw.chunks_since(position)
+                return
@@ -0,0 +1,101 @@
+"""
+Compact binary result protocol for the transcription WebSocket.
+
+Negotiated with `/ws/transcribe/{session_id}?protocol=compact`. Instead of a
+JSON object per result, each message is a MessagePack-encoded binary frame
+with short keys, and interim hypotheses only carry what changed since the
+previous one:
+
+    {"t": "i", "s": seq, "k": keep, "d": suffix}   interim delta: keep the first
+                                                   `keep` characters of the last
+                                                   interim, then append `suffix`
+    {"t": "i", "s": seq, "x": text}                interim resync (full text)
+    {"t": "f", "s": seq, "x": text, "c": conf}     final result
+    {"t": "m", "s": seq, "m": {...}}               any other message, as in JSON mode
+
+`s` increases by one per frame. A client that sees a gap ignores interim
+deltas until the next full text; the server sends one at least every
+`resync_every` interims, and every final resets the interim base.
+"""
+from typing import Any, Dict, Optional
+import msgpack
+
+PROTOCOL_JSON = "json"
+PROTOCOL_COMPACT = "compact"
+
+
+def common_prefix_length(a: str, b: str) -> int:
+    limit = min(len(a), len(b))
+    i = 0
+    while i < limit and a[i] == b[i]:
+        i += 1
+    return i
+
+
+class CompactEncoder:
+    def __init__(self, resync_every: int = 20):
+        """
+        Args:
+            resync_every: Interim frames between full-text resyncs
+        """
+        self.resync_every = resync_every
+        self.seq = 0
+        self._interim = ""
+        self._since_resync = 0
+
+    def _frame(self, frame: Dict[str, Any]) -> bytes:
+        frame["s"] = self.seq
+        self.seq += 1
+        return msgpack.packb(frame, use_bin_type=True)
+
+    def encode(self, message: Dict[str, Any]) -> bytes:
+        """Encode one outgoing message (as built for JSON mode)"""
+        if message.get("type") != "transcription":
+            return self._frame({"t": "m", "m": message})
+
+        text = message["transcript"]
+        if message["isFinal"]:
+            self._interim = ""
+            self._since_resync = 0
+            return self._frame({"t": "f", "x": text, "c": round(message["confidence"], 3)})
+
+        previous, self._interim = self._interim, text
+        keep = common_prefix_length(previous, text)
+        if not previous or self._since_resync >= self.resync_every:
+            self._since_resync = 0
+            return self._frame({"t": "i", "x": text})
+        self._since_resync += 1
+        return self._frame({"t": "i", "k": keep, "d": text[keep:]})
+
+
+class CompactDecoder:
+    """Reference client-side decoder (used by tests and the load harness)"""
+    def __init__(self):
+        self.expected_seq = 0
+        self.interim: Optional[str] = ""
+        self.gaps = 0
+
+    def decode(self, data: bytes) -> Optional[Dict[str, Any]]:
+        """
+        Returns:
+            The message in JSON-mode shape, or None while waiting for a resync
+        """
+        frame = msgpack.unpackb(data, raw=False)
+        if frame["s"] != self.expected_seq:
+            self.gaps += 1
+            self.interim = None  # Base unknown until the next full text
+        self.expected_seq = frame["s"] + 1
+
+        kind = frame["t"]
+        if kind == "m":
+            return frame["m"]
+        if kind == "f":
+            self.interim = ""
+            return {"type": "transcription", "transcript": frame["x"], "isFinal": True, "confidence": frame["c"]}
+        if "x" in frame:
+            self.interim = frame["x"]
+        elif self.interim is None:
+            return None
+        else:
+            self.interim = self.interim[:frame["k"]] + frame["d"]
+        return {"type": "transcription", "transcript": self.interim, "isFinal": False, "confidence": 0.0}
@@ -0,0 +1,455 @@
+"""
+Speech recognition backends.
+
+The live WebSocket path and the HTTP/batch paths talk to a `Recognizer`
+instead of a Speech client, so the engine is a deployment choice:
+
+- `GoogleRecognizer`: Speech-to-Text V2 over the pooled gRPC channels
+  (the default).
+- `LocalRecognizer`: a Vosk (Kaldi) model running in-process on a bounded
+  CPU worker pool. No quota and no network round trip: a fallback when
+  Speech turns streams away, an offline option for development, and a way
+  to exercise the streaming path without credentials. `vosk` is optional
+  and only imported when this backend is used.
+
+Both yield results shaped like Speech V2's (`alternatives[0].transcript`,
+`.confidence`, `.words[].start_offset`, `is_final`, `result_end_offset` as a
+timedelta), so code consuming them doesn't care which engine produced them.
+"""
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import TYPE_CHECKING, Any, Callable, Iterator, List, Optional, Sequence, Tuple
+from app.config import settings
+from app.opus_stream import ENCODING_LINEAR16, ENCODINGS
+from app.speech_pool import get_speech_pool
+
+if TYPE_CHECKING:
+    from google.cloud.speech_v2 import SpeechClient
+    from google.cloud.speech_v2.types import cloud_speech
+
+logger = logging.getLogger(__name__)
+
+BACKEND_GOOGLE = "google"
+BACKEND_LOCAL = "local"
+BACKENDS = (BACKEND_GOOGLE, BACKEND_LOCAL)
+
+# Get project ID from environment or settings
+PROJECT_ID = os.getenv("GOOGLE_CLOUD_PROJECT", settings.gcp_project_id)
+
+# Speech errors after which a live session moves to the fallback backend
+# (matched by name: google.api_core is only imported with the clients)
+FALLBACK_ERRORS = {"ResourceExhausted", "TooManyRequests", "ServiceUnavailable", "DeadlineExceeded"}
+
+
+@dataclass
+class RecognitionOptions:
+    """What to recognize and how; backends ignore what they can't honour"""
+    sample_rate: int = 16000
+    encoding: str = ENCODING_LINEAR16
+    language_codes: Sequence[str] = ("en-US",)
+    model: str = "long"
+    interim_results: bool = False
+    word_offsets: bool = False
+
+
+@dataclass
+class WordInfo:
+    word: str
+    start_offset: timedelta
+    end_offset: timedelta
+
+
+@dataclass
+class Alternative:
+    transcript: str
+    confidence: float = 0.0
+    words: List[WordInfo] = field(default_factory=list)
+
+
+@dataclass
+class RecognitionResult:
+    alternatives: List[Alternative]
+    is_final: bool = True
+    result_end_offset: Optional[timedelta] = None  # Relative to the start of the audio
+
+
+@dataclass
+class StreamingResponse:
+    results: List[RecognitionResult]
+
+
+class Recognizer:
+    """A recognition engine; one instance per live session or batch job"""
+    name = ""
+    encodings: Tuple[str, ...] = (ENCODING_LINEAR16,)
+
+    def streaming_recognize(self, options: RecognitionOptions, audio: Iterator[bytes]) -> Iterator[Any]:
+        """
+        Recognize a live stream. Blocking: runs on the stream's own thread.
+
+        Args:
+            options: Recognition options
+            audio: Audio chunks; blocks until the next one, ends on half-close
+
+        Returns:
+            Iterator of responses, each with a `results` list (may also
+            expose `cancel()` to abort the call)
+        """
+        raise NotImplementedError
+
+    def recognize(self, audio: bytes, options: RecognitionOptions) -> List[Any]:
+        """
+        Recognize a complete clip (at most ~1 minute). Blocking.
+
+        Returns:
+            Final results, offsets relative to the start of the clip
+        """
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """Release whatever the recognizer holds (pool lease, ...)"""
+
+
+def is_fallback_error(error: BaseException) -> bool:
+    """True for quota and availability errors a fallback backend can absorb"""
+    return type(error).__name__ in FALLBACK_ERRORS
+
+
+def _decoding_config(encoding: str, sample_rate: int) -> dict:
+    from google.cloud.speech_v2.types import cloud_speech
+    if encoding != ENCODING_LINEAR16:
+        # WebM/Ogg Opus: Speech reads the codec parameters from the container
+        return {"auto_decoding_config": cloud_speech.AutoDetectDecodingConfig()}
+    # Raw PCM: explicit decoding keeps result offsets aligned with the bytes
+    # we buffer for rollover replay
+    return {"explicit_decoding_config": cloud_speech.ExplicitDecodingConfig(
+        encoding=cloud_speech.ExplicitDecodingConfig.AudioEncoding.LINEAR16,
+        sample_rate_hertz=sample_rate,
+        audio_channel_count=1,  # Mono audio
+    )}
+
+
+def build_recognize_request(
+    audio_bytes: bytes,
+    language_code: str = "en-US",
+    sample_rate: int = 48000,
+    model: str = "long",
+    encoding: str = ENCODING_LINEAR16,
+    region: str = "global",
+) -> "cloud_speech.RecognizeRequest":
+    """
+    Build a synchronous Recognize request for mono audio.
+
+    Args:
+        audio_bytes: LINEAR16 PCM audio data (16-bit, mono) or a WebM/Ogg Opus
+            file, at most ~1 minute
+        language_code: Language code
+        sample_rate: Audio sample rate in Hz (LINEAR16 only)
+        model: Speech model
+        encoding: ENCODING_LINEAR16 or an Opus container
+        region: Speech API region of the recognizer
+
+    Returns:
+        RecognizeRequest for the region's default recognizer
+    """
+    from google.cloud.speech_v2.types import cloud_speech
+    config = cloud_speech.RecognitionConfig(
+        **_decoding_config(encoding, sample_rate),
+        language_codes=[language_code],
+        model=model,  # "long": flexible model that works with various audio lengths
+        features=cloud_speech.RecognitionFeatures(
+            enable_automatic_punctuation=True,
+        ),
+    )
+    return cloud_speech.RecognizeRequest(
+        recognizer=f"projects/{PROJECT_ID}/locations/{region}/recognizers/_",
+        config=config,
+        content=audio_bytes,
+    )
+
+
+class GoogleRecognizer(Recognizer):
+    name = BACKEND_GOOGLE
+    encodings = ENCODINGS
+
+    def __init__(self, region: str = settings.SPEECH_API_REGION, client: Optional["SpeechClient"] = None, lease: bool = True):
+        """
+        Args:
+            region: Speech API region ("global" for the default endpoint)
+            client: Speech client (taken from the region's channel pool by default)
+            lease: Hold a pool lease until close(), for long-lived streams;
+                short unary calls share the least-loaded channel instead
+        """
+        self.region = region
+        self._lease = lease
+        self._owns_lease = False
+        self._client = client
+        self._client_lock = threading.Lock()
+
+    @property
+    def client(self) -> "SpeechClient":
+        """
+        Speech client, taken from the pool on first use. That is on the
+        stream's thread (or the worker running recognize()): before warm-up
+        the pool opens channels and fetches credentials, which must not
+        happen on the event loop.
+        """
+        with self._client_lock:
+            if self._client is None:
+                pool = get_speech_pool(self.region)
+                self._client = pool.acquire() if self._lease else pool.client()
+                self._owns_lease = self._lease
+            return self._client
+
+    def streaming_config_request(self, options: RecognitionOptions) -> "cloud_speech.StreamingRecognizeRequest":
+        """Initial request of a stream, carrying its config"""
+        from google.cloud.speech_v2.types import cloud_speech
+        recognition_config = cloud_speech.RecognitionConfig(
+            **_decoding_config(options.encoding, options.sample_rate),
+            language_codes=list(options.language_codes),
+            model=options.model,
+            features=cloud_speech.RecognitionFeatures(
+                enable_automatic_punctuation=True,
+                enable_word_time_offsets=options.word_offsets,
+            ),
+        )
+        streaming_config = cloud_speech.StreamingRecognitionConfig(
+            config=recognition_config,
+            streaming_features=cloud_speech.StreamingRecognitionFeatures(
+                interim_results=options.interim_results,
+            ),
+        )
+        return cloud_speech.StreamingRecognizeRequest(
+            recognizer=f"projects/{PROJECT_ID}/locations/{self.region}/recognizers/_",
+            streaming_config=streaming_config,
+        )
+
+    def streaming_recognize(self, options: RecognitionOptions, audio: Iterator[bytes]) -> Iterator[Any]:
+        from google.cloud.speech_v2.types import cloud_speech
+        config_request = self.streaming_config_request(options)
+
+        def requests():
+            yield config_request
+            for chunk in audio:
+                yield cloud_speech.StreamingRecognizeRequest(audio=chunk)
+
+        # The gRPC call object: iterating it blocks, cancel() aborts it
+        return self.client.streaming_recognize(requests=requests())
+
+    def recognize(self, audio: bytes, options: RecognitionOptions) -> List[Any]:
+        request = build_recognize_request(
+            audio, options.language_codes[0], options.sample_rate, options.model, options.encoding, self.region,
+        )
+        return list(self.client.recognize(request=request).results)
+
+    def close(self) -> None:
+        with self._client_lock:
+            if self._owns_lease:
+                self._owns_lease = False
+                get_speech_pool(self.region).release(self._client)
+
+
+_local_model = None
+_local_model_lock = threading.Lock()
+_local_executor: Optional[ThreadPoolExecutor] = None
+
+
+def load_local_model() -> Any:
+    """Load the Vosk model once per process (hundreds of MB: slow, warm it up)"""
+    global _local_model
+    with _local_model_lock:
+        if _local_model is None:
+            if not settings.LOCAL_ASR_MODEL_PATH:
+                raise RuntimeError("LOCAL_ASR_MODEL_PATH is not set")
+            try:
+                import vosk
+            except ImportError as e:
+                raise RuntimeError("The local recognizer needs the optional `vosk` package") from e
+            vosk.SetLogLevel(-1)
+            _local_model = vosk.Model(settings.LOCAL_ASR_MODEL_PATH)
+            logger.info(f"🧠 Local speech model loaded from {settings.LOCAL_ASR_MODEL_PATH}")
+        return _local_model
+
+
+def get_local_executor() -> ThreadPoolExecutor:
+    """Instance-wide CPU workers shared by every local recognition"""
+    global _local_executor
+    if _local_executor is None:
+        _local_executor = ThreadPoolExecutor(
+            max_workers=settings.LOCAL_ASR_WORKERS,
+            thread_name_prefix="local-asr",
+        )
+    return _local_executor
+
+
+def shutdown_local_executor() -> None:
+    global _local_executor
+    if _local_executor is not None:
+        _local_executor.shutdown(wait=False, cancel_futures=True)
+        _local_executor = None
+
+
+def _vosk_engine(sample_rate: int) -> Any:
+    import vosk
+    engine = vosk.KaldiRecognizer(load_local_model(), sample_rate)
+    engine.SetWords(True)
+    return engine
+
+
+def _seconds(seconds: float) -> timedelta:
+    return timedelta(seconds=seconds)
+
+
+class LocalRecognizer(Recognizer):
+    """
+    In-process engine with Vosk's KaldiRecognizer interface. Decoding runs on
+    a shared worker pool sized to the CPUs we're willing to spend, so a busy
+    instance queues work instead of oversubscribing the cores the event loop
+    needs. One model, one language (options.language_codes is ignored).
+    """
+    name = BACKEND_LOCAL
+
+    def __init__(
+        self,
+        engine_factory: Optional[Callable[[int], Any]] = None,
+        executor: Optional[ThreadPoolExecutor] = None,
+        feed_seconds: float = 0.5,
+    ):
+        """
+        Args:
+            engine_factory: Builds a recognizer for a sample rate (a Vosk
+                KaldiRecognizer on the shared model by default)
+            executor: CPU worker pool (instance-wide pool by default)
+            feed_seconds: Audio handed to the engine at a time in recognize()
+        """
+        self.engine_factory = engine_factory or _vosk_engine
+        self.executor = executor or get_local_executor()
+        self.feed_seconds = feed_seconds
+
+    def _run(self, function: Callable, *args: Any) -> Any:
+        """Run one decoding step on the worker pool and wait for it"""
+        return self.executor.submit(function, *args).result()
+
+    def _check(self, options: RecognitionOptions) -> None:
+        if options.encoding not in self.encodings:
+            raise ValueError(f"The {self.name} recognizer only accepts {', '.join(self.encodings)} audio")
+
+    @staticmethod
+    def _final(raw: str, audio_seconds: float) -> Optional[RecognitionResult]:
+        """Convert a Vosk Result()/FinalResult() JSON document"""
+        data = json.loads(raw)
+        transcript = data.get("text", "").strip()
+        if not transcript:
+            return None
+        words = [
+            WordInfo(word["word"], _seconds(word["start"]), _seconds(word["end"]))
+            for word in data.get("result", [])
+        ]
+        confidence = sum(word.get("conf", 0.0) for word in data.get("result", [])) / len(words) if words else 0.0
+        end = words[-1].end_offset if words else _seconds(audio_seconds)
+        return RecognitionResult([Alternative(transcript, confidence, words)], is_final=True, result_end_offset=end)
+
+    def streaming_recognize(self, options: RecognitionOptions, audio: Iterator[bytes]) -> Iterator[Any]:
+        self._check(options)
+        engine = self._run(self.engine_factory, options.sample_rate)
+        bytes_per_second = options.sample_rate * 2
+        fed = 0
+        last_partial = ""
+        for chunk in audio:
+            fed += len(chunk)
+            if self._run(engine.AcceptWaveform, bytes(chunk)):
+                last_partial = ""
+                result = self._final(engine.Result(), fed / bytes_per_second)
+                if result is not None:
+                    yield StreamingResponse([result])
+            elif options.interim_results:
+                partial = json.loads(engine.PartialResult()).get("partial", "").strip()
+                if partial and partial != last_partial:
+                    last_partial = partial
+                    yield StreamingResponse([RecognitionResult(
+                        [Alternative(partial)], is_final=False, result_end_offset=_seconds(fed / bytes_per_second),
+                    )])
+        result = self._final(self._run(engine.FinalResult), fed / bytes_per_second)
+        if result is not None:
+            yield StreamingResponse([result])
+
+    def _recognize_clip(self, audio: bytes, sample_rate: int) -> List[RecognitionResult]:
+        """Runs on a worker: decode the whole clip in one go"""
+        engine = self.engine_factory(sample_rate)
+        bytes_per_second = sample_rate * 2
+        step = max(2, int(self.feed_seconds * sample_rate) * 2)
+        results = []
+        for start in range(0, len(audio), step):
+            end = min(len(audio), start + step)
+            if engine.AcceptWaveform(audio[start:end]):
+                result = self._final(engine.Result(), end / bytes_per_second)
+                if result is not None:
+                    results.append(result)
+        result = self._final(engine.FinalResult(), len(audio) / bytes_per_second)
+        if result is not None:
+            results.append(result)
+        return results
+
+    def recognize(self, audio: bytes, options: RecognitionOptions) -> List[Any]:
+        self._check(options)
+        return self._run(self._recognize_clip, audio, options.sample_rate)
+
+
+def recognizer_class(backend: str) -> type:
+    """
+    Raises:
+        ValueError: Unknown backend name
+    """
+    if backend == BACKEND_GOOGLE:
+        return GoogleRecognizer
+    if backend == BACKEND_LOCAL:
+        return LocalRecognizer
+    raise ValueError(f"Unknown recognizer backend '{backend}', expected one of: {', '.join(BACKENDS)}")
+
+
+_fallback_checked = False
+
+
+def fallback_backend() -> Optional[str]:
+    """
+    RECOGNIZER_FALLBACK, or None if it isn't set or names no known backend
+    (a typo is logged once and leaves sessions without a fallback instead
+    of failing every one of them).
+    """
+    global _fallback_checked
+    backend = settings.RECOGNIZER_FALLBACK
+    if not backend:
+        return None
+    if backend not in BACKENDS:
+        if not _fallback_checked:
+            logger.error(
+                f"❌ RECOGNIZER_FALLBACK='{backend}' is not a recognizer backend "
+                f"(expected one of: {', '.join(BACKENDS)}), running without a fallback"
+            )
+        _fallback_checked = True
+        return None
+    return backend
+
+
+def create_recognizer(
+    backend: Optional[str] = None,
+    region: str = settings.SPEECH_API_REGION,
+    lease: bool = True,
+) -> Recognizer:
+    """
+    Recognizer for one live session or batch job.
+
+    Args:
+        backend: BACKEND_GOOGLE or BACKEND_LOCAL (settings.RECOGNIZER_BACKEND by default)
+        region: Speech API region (Google only)
+        lease: Hold a channel lease for a long-lived stream (Google only)
+    """
+    cls = recognizer_class(backend or settings.RECOGNIZER_BACKEND)
+    if cls is GoogleRecognizer:
+        return GoogleRecognizer(region, lease=lease)
+    return cls()
@@ -0,0 +1,111 @@
+"""
+Streaming downmix + resample stage for incoming int16 PCM.
+
+Browsers capture at 48 kHz while the Speech models only need 16 kHz mono, so
+every chunk is downmixed and resampled before it is queued, cutting upstream
+bytes by two thirds. Resampling is a polyphase FIR (Kaiser-windowed sinc
+anti-aliasing filter) evaluated with NumPy over whole chunks; the only state
+carried between chunks is the filter history and a partial-frame remainder.
+"""
+from math import gcd
+import numpy as np
+
+
+def design_lowpass(up: int, down: int, half_len_per_rate: int = 10, beta: float = 8.0) -> np.ndarray:
+    """
+    Anti-aliasing FIR for an up/down polyphase resampler.
+
+    Args:
+        up: Interpolation factor
+        down: Decimation factor
+        half_len_per_rate: Filter half-length in units of max(up, down)
+        beta: Kaiser window shape (higher = more stop-band attenuation)
+
+    Returns:
+        Filter taps at the upsampled rate, scaled by `up`
+    """
+    max_rate = max(up, down)
+    half_len = half_len_per_rate * max_rate
+    n = np.arange(-half_len, half_len + 1)
+    cutoff = 1.0 / max_rate  # Fraction of the upsampled Nyquist
+    taps = cutoff * np.sinc(cutoff * n) * np.kaiser(len(n), beta)
+    return (up * taps / taps.sum()).astype(np.float32)
+
+
+class StreamingResampler:
+    def __init__(self, input_rate: int, output_rate: int = 16000, channels: int = 1):
+        """
+        Args:
+            input_rate: Sample rate of the incoming audio
+            output_rate: Sample rate sent to Speech
+            channels: Interleaved channels in the incoming audio (downmixed to mono)
+        """
+        self.input_rate = input_rate
+        self.output_rate = output_rate
+        self.channels = channels
+        self.frame_bytes = 2 * channels
+        divisor = gcd(input_rate, output_rate)
+        self.up = output_rate // divisor
+        self.down = input_rate // divisor
+        self.passthrough = self.up == self.down and channels == 1
+
+        taps = design_lowpass(self.up, self.down)
+        # Polyphase bank: phase p uses taps p, p + up, p + 2*up, ... (reversed
+        # so each row can be dotted directly with a window of input samples)
+        self.taps_per_phase = -(-len(taps) // self.up)
+        padded = np.zeros(self.up * self.taps_per_phase, dtype=np.float32)
+        padded[:len(taps)] = taps
+        self._bank = np.ascontiguousarray(padded.reshape(self.taps_per_phase, self.up).T[:, ::-1])
+        self._delay = (len(taps) - 1) // 2  # Group delay at the upsampled rate
+
+        self._carry = b""  # Partial frame left over from the last chunk
+        self._history = np.zeros(self.taps_per_phase - 1, dtype=np.float32)
+        self._consumed = 0  # Input samples seen so far (excluding history padding)
+        self._produced = 0  # Output samples emitted so far
+
+    def process(self, chunk: bytes) -> bytes:
+        """Convert one chunk of interleaved int16 audio to mono int16 at output_rate"""
+        if self.passthrough:
+            return chunk
+        data = self._carry + chunk
+        usable = len(data) - len(data) % self.frame_bytes
+        self._carry = data[usable:]
+        if not usable:
+            return b""
+
+        samples = np.frombuffer(data, dtype=np.int16, count=usable // 2)
+        if self.channels > 1:
+            samples = samples.reshape(-1, self.channels).mean(axis=1, dtype=np.float32)
+        else:
+            samples = samples.astype(np.float32)
+
+        # Buffer index j holds global input sample (consumed - history_len + j)
+        buffer = np.concatenate([self._history, samples])
+        history_len = len(self._history)
+        self._history = buffer[len(buffer) - history_len:]
+        self._consumed += len(samples)
+
+        # Output n sits at upsampled position n*down + delay; it needs input
+        # samples up to (n*down + delay) // up
+        last_input = self._consumed - 1
+        last_output = (last_input * self.up + self.up - 1 - self._delay) // self.down
+        count = last_output - self._produced + 1
+        if count <= 0:
+            return b""
+
+        n = np.arange(self._produced, self._produced + count, dtype=np.int64)
+        position = n * self.down + self._delay
+        newest = position // self.up  # Newest input sample under the filter
+        phase = position % self.up
+        start = newest - (self._consumed - len(samples) - history_len) - (self.taps_per_phase - 1)
+
+        windows = np.lib.stride_tricks.sliding_window_view(buffer, self.taps_per_phase)
+        if self.up == 1:
+            # Plain decimation: evenly strided windows, no gather copy
+            selected = windows[start[0]:start[-1] + 1:self.down]
+            output = selected @ self._bank[0]
+        else:
+            output = np.einsum("nk,nk->n", windows[start], self._bank[phase])
+
+        self._produced += count
+        return np.clip(np.rint(output), -32768, 32767).astype(np.int16).tobytes()
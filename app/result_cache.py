@@ -0,0 +1,111 @@
+"""
+Content-addressed cache for chunk transcription results.
+
+Flaky classroom connections make the frontend re-send the same audio chunk,
+and each retry used to be billed by Speech again. Results are keyed by a hash
+of the decoded audio plus the recognition config, kept in a size-bounded LRU
+with a TTL, and concurrent identical requests share one upstream call.
+"""
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+
+def cache_key(audio: bytes, **config: Any) -> str:
+    """Hash of the audio bytes and the recognition config (language, model, rate, ...)"""
+    digest = hashlib.sha256(audio)
+    for name in sorted(config):
+        digest.update(f"\0{name}={config[name]}".encode())
+    return digest.hexdigest()
+
+
+class ResultCache:
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl_seconds: float = 600.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+            max_entries: Results kept before the least recently used is evicted
+            ttl_seconds: How long a result stays valid
+            clock: Time source (monotonic seconds)
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0  # Requests that joined an identical call already in flight
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """
+        Returns:
+            (found, value) for a fresh entry
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        expires_at, value = entry
+        if self.clock() >= expires_at:
+            del self._entries[key]
+            self.expirations += 1
+            return False, None
+        self._entries.move_to_end(key)
+        return True, value
+
+    def put(self, key: str, value: Any) -> None:
+        self._entries[key] = (self.clock() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Return the cached result for `key`, joining an identical call in
+        flight or running `compute` once. Failures are not cached.
+        """
+        found, value = self.get(key)
+        if found:
+            self.hits += 1
+            return value
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.shared += 1
+        else:
+            self.misses += 1
+            # Runs as its own task so a caller giving up doesn't cancel the
+            # call for the others waiting on it
+            task = asyncio.ensure_future(compute())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        return await asyncio.shield(task)
+
+    def _finish(self, key: str, task: asyncio.Future) -> None:
+        del self._inflight[key]
+        if not task.cancelled() and task.exception() is None:
+            self.put(key, task.result())
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.shared + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "shared": self.shared,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hitRate": round((self.hits + self.shared) / lookups, 3) if lookups else 0.0,
+        }
@@ -0,0 +1,53 @@
+"""
+Bounded buffer of recent audio addressed by absolute byte offset.
+
+Used to replay audio that the Speech API has not finalized yet when a new
+upstream stream takes over from an expiring one.
+"""
+from collections import deque
+from typing import Deque, Iterator, Tuple
+
+
+class AudioRingBuffer:
+    def __init__(self, capacity_bytes: int):
+        """
+        Args:
+            capacity_bytes: Approximate amount of recent audio to keep
+        """
+        self.capacity_bytes = capacity_bytes
+        self._chunks: Deque[Tuple[int, bytes]] = deque()
+        self._size = 0
+        self.end_offset = 0  # Absolute offset just past the newest byte
+
+    @property
+    def start_offset(self) -> int:
+        """Absolute offset of the oldest byte still buffered"""
+        return self.end_offset - self._size
+
+    def __len__(self) -> int:
+        return self._size
+
+    def append(self, chunk: bytes) -> None:
+        """Add a chunk, evicting whole chunks from the front when over capacity"""
+        self._chunks.append((self.end_offset, chunk))
+        self._size += len(chunk)
+        self.end_offset += len(chunk)
+        while self._size - len(self._chunks[0][1]) >= self.capacity_bytes:
+            _, evicted = self._chunks.popleft()
+            self._size -= len(evicted)
+
+    def chunks_since(self, offset: int) -> Iterator[memoryview]:
+        """
+        Yield buffered audio from absolute `offset` to the end, keeping the
+        original chunk boundaries (the first chunk may be trimmed).
+        """
+        offset = max(offset, self.start_offset)
+        for start, chunk in self._chunks:
+            end = start + len(chunk)
+            if end <= offset:
+                continue
+            yield memoryview(chunk)[max(0, offset - start):]
+
+    def resume_point(self, offset: int) -> int:
+        """Where a replay covering `offset` starts (raw audio can start anywhere)"""
+        return max(offset, self.start_offset)
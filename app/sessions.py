@@ -0,0 +1,124 @@
+"""
+Lecturer sessions that outlive their WebSocket.
+
+A Wi-Fi blip on the lecturer's phone drops the WebSocket, but restarting the
+session would open a new upstream Speech stream, lose the audio in flight
+and the recognizer's context. Instead the session (upstream stream, replay
+buffer, transcript state) is parked for a grace period. The client
+reconnects with `?resume=<token>` and resends only the audio chunks the
+server has not acknowledged.
+"""
+import asyncio
+import logging
+import secrets
+from typing import Any, Awaitable, Callable, Dict, Optional
+from app.config import settings
+from app.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+
+class _Entry:
+    def __init__(self, session_id: str, stream: Any):
+        self.session_id = session_id
+        self.stream = stream
+        self.expiry: Optional[asyncio.TimerHandle] = None  # Set while disconnected
+
+
+class SessionRegistry:
+    def __init__(self, grace_seconds: float = 30.0):
+        """
+        Args:
+            grace_seconds: How long a disconnected session waits for a resume
+                (0 stops it as soon as the WebSocket drops)
+        """
+        self.grace_seconds = grace_seconds
+        self._entries: Dict[str, _Entry] = {}
+        self.resumed = 0
+        self.expired = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def detached(self) -> int:
+        """Sessions currently waiting for their lecturer to reconnect"""
+        return sum(1 for entry in self._entries.values() if entry.expiry is not None)
+
+    def register(self, session_id: str, stream: Any) -> str:
+        """
+        Track a new session.
+
+        Returns:
+            Resume token to hand to the client
+        """
+        token = secrets.token_urlsafe(16)
+        self._entries[token] = _Entry(session_id, stream)
+        return token
+
+    def resume(self, session_id: str, token: str) -> Optional[Any]:
+        """
+        Claim a session by its token.
+
+        Returns:
+            The session's stream, or None if the token is unknown, expired or
+            belongs to another session
+        """
+        entry = self._entries.get(token)
+        if entry is None or not secrets.compare_digest(entry.session_id, session_id):
+            return None
+        if entry.expiry is not None:
+            entry.expiry.cancel()
+            entry.expiry = None
+        self.resumed += 1
+        return entry.stream
+
+    def detach(self, token: str, on_expire: Callable[[], Awaitable[None]]) -> None:
+        """
+        Start the grace period for a session whose WebSocket dropped.
+
+        Args:
+            token: The session's resume token
+            on_expire: Stops the session if nobody resumes it in time
+        """
+        entry = self._entries.get(token)
+        if entry is None:
+            return
+        if self.grace_seconds <= 0:
+            self._expire(token, on_expire)
+            return
+        if entry.expiry is not None:
+            entry.expiry.cancel()
+        entry.expiry = asyncio.get_running_loop().call_later(self.grace_seconds, self._expire, token, on_expire)
+
+    def _expire(self, token: str, on_expire: Callable[[], Awaitable[None]]) -> None:
+        entry = self._entries.pop(token, None)
+        if entry is None:
+            return
+        self.expired += 1
+        if self.grace_seconds > 0:
+            logger.info(f"⌛ Session {entry.session_id} not resumed within {self.grace_seconds:.0f}s, stopping")
+        asyncio.ensure_future(on_expire())
+
+    def remove(self, token: str) -> None:
+        """Forget a session that has ended"""
+        entry = self._entries.pop(token, None)
+        if entry is not None and entry.expiry is not None:
+            entry.expiry.cancel()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "sessions": len(self._entries),
+            "detached": self.detached,
+            "resumed": self.resumed,
+            "expired": self.expired,
+        }
+
+
+# Process-wide registry of lecturer sessions
+sessions = SessionRegistry(grace_seconds=settings.SESSION_RESUME_GRACE_SECONDS)
+
+registry.gauge(
+    "sauti_detached_sessions", "Lecturer sessions waiting for a reconnect",
+    function=lambda: sessions.detached,
+)
@@ -0,0 +1,176 @@
+"""
+Async bridge around blocking streaming recognizers.
+
+`Recognizer.streaming_recognize` (app.recognizers; for Google, the gRPC
+streaming call) consumes an audio iterator and returns a blocking response
+iterator. Driving it directly from a coroutine parks the
+whole event loop until the next response arrives, so every other WebSocket
+on the instance stalls behind a single classroom.
+
+`SpeechStreamBridge` runs the call on a dedicated daemon thread per stream:
+- loop -> thread: audio is queued on a bounded AudioQueue and pulled by the
+  audio iterator with `run_coroutine_threadsafe`, so a slow upstream
+  pushes back on the sender instead of growing memory
+- thread -> loop: responses are handed back with `call_soon_threadsafe`
+"""
+import asyncio
+import concurrent.futures
+import logging
+import threading
+import time
+from typing import Any, AsyncIterator, Optional
+
+from app.audio_queue import AudioQueue
+from app.recognizers import RecognitionOptions, Recognizer
+
+logger = logging.getLogger(__name__)
+
+# Sentinel marking the end of the request or response stream
+_CLOSE = object()
+
+
+class _Failure:
+    """Wraps an exception raised on the bridge thread"""
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+class SpeechStreamBridge:
+    def __init__(
+        self,
+        recognizer: Recognizer,
+        options: RecognitionOptions,
+        name: str = "speech-stream",
+        base_offset: int = 0,
+        max_pending_bytes: int = 64000,
+    ):
+        """
+        Args:
+            recognizer: Backend running the blocking streaming call
+            options: Recognition options for the stream
+            name: Thread name, used in logs
+            base_offset: Absolute session byte offset of the first audio sent on
+                this stream (result offsets are relative to it)
+            max_pending_bytes: Audio allowed to wait for the upstream before
+                send() blocks
+        """
+        self.recognizer = recognizer
+        self.options = options
+        self.name = name
+        self.base_offset = base_offset
+        # time.monotonic() timestamps, used to measure stream handoffs
+        self.started_at: Optional[float] = None
+        self.first_audio_at: Optional[float] = None
+        self.last_audio_at: Optional[float] = None
+        self.first_response_at: Optional[float] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._requests = AudioQueue(max_pending_bytes)
+        self._responses: asyncio.Queue = asyncio.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._pending: Optional[concurrent.futures.Future] = None
+        self._call = None
+        self._closed = False
+
+    def start(self) -> None:
+        """Start the upstream call on its own thread (must be called from the event loop)"""
+        self._loop = asyncio.get_running_loop()
+        self.started_at = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    @property
+    def pending_bytes(self) -> int:
+        """Audio queued but not yet taken by the upstream call"""
+        return self._requests.pending_bytes
+
+    async def send(self, audio: bytes) -> None:
+        """Queue an audio chunk for the upstream stream, waiting while it is full"""
+        if self._closed:
+            return
+        await self._requests.put(audio)
+
+    def try_send(self, audio: bytes) -> bool:
+        """Queue an audio chunk only if there is room (never waits)"""
+        if self._closed:
+            return False
+        try:
+            self._requests.put_nowait(audio)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    def close(self) -> None:
+        """Half-close the stream: no more audio, pending results still arrive"""
+        if self._closed:
+            return
+        self._closed = True
+        self._requests.put_control(_CLOSE)
+
+    def cancel(self) -> None:
+        """Abort the upstream call without waiting for pending results"""
+        self.close()
+        pending = self._pending
+        if pending is not None:
+            pending.cancel()
+        call = self._call
+        if call is not None and hasattr(call, "cancel"):
+            try:
+                call.cancel()
+            except Exception:
+                pass
+
+    async def responses(self) -> AsyncIterator[Any]:
+        """Yield upstream responses on the event loop until the stream ends"""
+        while True:
+            item = await self._responses.get()
+            if item is _CLOSE:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            if self.first_response_at is None:
+                self.first_response_at = time.monotonic()
+            yield item
+
+    def _audio_iterator(self):
+        """Runs on the recognizer side: blocks this thread, never the event loop"""
+        while True:
+            self._pending = asyncio.run_coroutine_threadsafe(self._requests.get(), self._loop)
+            try:
+                audio = self._pending.result()
+            except (concurrent.futures.CancelledError, RuntimeError):
+                return
+            finally:
+                self._pending = None
+            if audio is _CLOSE:
+                return
+            self.last_audio_at = time.monotonic()
+            if self.first_audio_at is None:
+                self.first_audio_at = self.last_audio_at
+            yield audio
+
+    def _deliver(self, item: Any) -> None:
+        try:
+            self._loop.call_soon_threadsafe(self._responses.put_nowait, item)
+        except RuntimeError:
+            # Event loop already closed (process shutting down)
+            pass
+
+    def _run(self) -> None:
+        try:
+            self._call = self.recognizer.streaming_recognize(self.options, self._audio_iterator())
+            for response in self._call:
+                self._deliver(response)
+        except Exception as e:
+            if not (self._closed and _is_cancelled(e)):
+                self._deliver(_Failure(e))
+        finally:
+            self._deliver(_CLOSE)
+
+
+def _is_cancelled(error: BaseException) -> bool:
+    """True for the error gRPC raises after a local `cancel()`"""
+    return "cancel" in type(error).__name__.lower() or "cancel" in str(error).lower()
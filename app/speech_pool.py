@@ -0,0 +1,237 @@
+"""
+Process-wide pool of Speech-to-Text gRPC channels.
+
+Building a `SpeechClient` per WebSocket costs a fresh channel, TLS handshake
+and OAuth token fetch before the first caption. Instead, a small bounded set
+of channels per API endpoint is created once, pre-connected during the
+FastAPI lifespan startup, health-checked in the background and shared by
+every session (gRPC multiplexes many concurrent streams over one channel).
+"""
+import asyncio
+import logging
+import threading
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional
+
+from app.config import apply_credentials, settings
+
+if TYPE_CHECKING:
+    # gRPC and the generated Speech clients take a few hundred milliseconds
+    # to import; they load on the first channel, not on app import
+    import grpc
+    from google.cloud.speech_v2 import SpeechClient
+
+logger = logging.getLogger(__name__)
+
+# Keep idle channels alive between lectures instead of reconnecting
+CHANNEL_OPTIONS = [
+    ("grpc.keepalive_time_ms", 30000),
+    ("grpc.keepalive_timeout_ms", 10000),
+    ("grpc.keepalive_permit_without_calls", 1),
+    ("grpc.http2.max_pings_without_data", 0),
+]
+
+CLOUD_PLATFORM_SCOPE = "https://www.googleapis.com/auth/cloud-platform"
+
+
+def speech_endpoint(region: str) -> str:
+    """Regional Speech API endpoint ("global" uses the default endpoint)"""
+    if region == "global":
+        return "speech.googleapis.com"
+    return f"{region}-speech.googleapis.com"
+
+
+class _PooledChannel:
+    """A gRPC channel plus the clients built on top of it"""
+    def __init__(self, channel: "grpc.Channel"):
+        from google.cloud.speech_v2 import SpeechClient
+        from google.cloud.speech_v2.services.speech.transports import SpeechGrpcTransport
+        self.channel = channel
+        self.client = SpeechClient(transport=SpeechGrpcTransport(channel=channel))
+        self.leases = 0
+
+
+class SpeechChannelPool:
+    def __init__(
+        self,
+        api_endpoint: str,
+        size: int = 2,
+        channel_factory: Optional[Callable[[], "grpc.Channel"]] = None,
+    ):
+        """
+        Args:
+            api_endpoint: Speech API host, e.g. "us-speech.googleapis.com"
+            size: Maximum number of channels kept open
+            channel_factory: Builds a new channel (defaults to an authenticated
+                secure channel to `api_endpoint`)
+        """
+        self.api_endpoint = api_endpoint
+        self.size = max(1, size)
+        self._channel_factory = channel_factory or self._create_channel
+        self._channels: List[_PooledChannel] = []
+        # Replaced after a failed health check, closed when their last stream ends
+        self._retired: List[_PooledChannel] = []
+        self._credentials = None
+        self._lock = threading.Lock()
+        self._health_task: Optional[asyncio.Task] = None
+
+    def _create_channel(self) -> "grpc.Channel":
+        from google.cloud.speech_v2.services.speech.transports import SpeechGrpcTransport
+        if self._credentials is None:
+            import google.auth
+            apply_credentials()
+            self._credentials, _ = google.auth.default(scopes=[CLOUD_PLATFORM_SCOPE])
+        return SpeechGrpcTransport.create_channel(
+            f"{self.api_endpoint}:443",
+            credentials=self._credentials,
+            options=CHANNEL_OPTIONS,
+        )
+
+    def _fill(self) -> None:
+        """Open channels until the pool is at full size"""
+        with self._lock:
+            while len(self._channels) < self.size:
+                self._channels.append(_PooledChannel(self._channel_factory()))
+
+    def _least_loaded(self) -> _PooledChannel:
+        self._fill()
+        with self._lock:
+            return min(self._channels, key=lambda pooled: pooled.leases)
+
+    def acquire(self) -> "SpeechClient":
+        """
+        Lease a client for a long-lived stream; pair with release().
+
+        Opens channels (and fetches credentials) if the pool isn't warm yet,
+        so call it off the event loop (see GoogleRecognizer).
+        """
+        pooled = self._least_loaded()
+        with self._lock:
+            pooled.leases += 1
+        return pooled.client
+
+    def release(self, client: "SpeechClient") -> None:
+        """Return a client obtained from acquire()"""
+        with self._lock:
+            for pooled in self._channels:
+                if pooled.client is client:
+                    pooled.leases = max(0, pooled.leases - 1)
+                    return
+            for pooled in self._retired:
+                if pooled.client is client:
+                    pooled.leases = max(0, pooled.leases - 1)
+                    if pooled.leases == 0:
+                        self._retired.remove(pooled)
+                        pooled.channel.close()
+                    return
+
+    def client(self) -> "SpeechClient":
+        """Shared client for short unary calls (no lease needed, same caveat as acquire())"""
+        return self._least_loaded().client
+
+    @property
+    def active_leases(self) -> int:
+        return sum(pooled.leases for pooled in self._channels + self._retired)
+
+    def _check(self, pooled: _PooledChannel, timeout: float) -> bool:
+        import grpc
+        ready = grpc.channel_ready_future(pooled.channel)
+        try:
+            ready.result(timeout=timeout)
+            return True
+        except grpc.FutureTimeoutError:
+            ready.cancel()
+            return False
+
+    def _prefetch_token(self) -> None:
+        """Fetch the OAuth token up front so the first RPC doesn't wait for it"""
+        if self._credentials is None or self._credentials.valid:
+            return
+        import google.auth.transport.requests
+        self._credentials.refresh(google.auth.transport.requests.Request())
+
+    async def start(self, timeout: float = 10.0) -> None:
+        """Open and pre-connect every channel (TLS handshake + token fetch)"""
+        await asyncio.to_thread(self._fill)
+        checks = [asyncio.to_thread(self._check, pooled, timeout) for pooled in self._channels]
+        results = await asyncio.gather(asyncio.to_thread(self._prefetch_token), *checks, return_exceptions=True)
+        if isinstance(results[0], Exception):
+            logger.warning(f"⚠️  Speech token prefetch failed: {str(results[0])}")
+        ready = sum(1 for ok in results[1:] if ok is True)
+        logger.info(f"🔗 Speech pool {self.api_endpoint}: {ready}/{len(self._channels)} channels ready")
+
+    async def health_check(self, timeout: float = 5.0) -> int:
+        """
+        Replace channels that fail to (re)connect.
+
+        Returns:
+            Number of channels replaced
+        """
+        replaced = 0
+        for pooled in list(self._channels):
+            healthy = await asyncio.to_thread(self._check, pooled, timeout)
+            if healthy:
+                continue
+            logger.warning(f"⚠️  Speech channel to {self.api_endpoint} unhealthy, replacing")
+            with self._lock:
+                self._channels.remove(pooled)
+                # Streams already running on it keep it open until the last one
+                # releases its lease
+                if pooled.leases:
+                    self._retired.append(pooled)
+            if not pooled.leases:
+                pooled.channel.close()
+            replaced += 1
+        if replaced:
+            await asyncio.to_thread(self._fill)
+        return replaced
+
+    def start_health_checks(self, interval: float) -> None:
+        """Run health_check() every `interval` seconds in the background"""
+        async def loop():
+            while True:
+                await asyncio.sleep(interval)
+                try:
+                    await self.health_check()
+                except Exception as e:
+                    logger.error(f"❌ Speech pool health check failed: {str(e)}")
+        self._health_task = asyncio.create_task(loop())
+
+    async def close(self) -> None:
+        """Stop health checks and close every channel"""
+        if self._health_task is not None:
+            self._health_task.cancel()
+            self._health_task = None
+        with self._lock:
+            channels, self._channels = self._channels + self._retired, []
+            self._retired = []
+        for pooled in channels:
+            pooled.channel.close()
+
+
+_pools: Dict[str, SpeechChannelPool] = {}
+
+
+def get_speech_pool(region: str = settings.SPEECH_API_REGION) -> SpeechChannelPool:
+    """Process-wide pool for a Speech API region (created lazily, no I/O)"""
+    if settings.SPEECH_EMULATOR_HOST:
+        # Local fake server (load tests): every region, plaintext, no credentials
+        endpoint = settings.SPEECH_EMULATOR_HOST
+        if endpoint not in _pools:
+            import grpc
+            _pools[endpoint] = SpeechChannelPool(
+                endpoint,
+                size=settings.SPEECH_POOL_SIZE,
+                channel_factory=lambda: grpc.insecure_channel(endpoint, options=CHANNEL_OPTIONS),
+            )
+        return _pools[endpoint]
+    endpoint = speech_endpoint(region)
+    if endpoint not in _pools:
+        _pools[endpoint] = SpeechChannelPool(endpoint, size=settings.SPEECH_POOL_SIZE)
+    return _pools[endpoint]
+
+
+async def close_speech_pools() -> None:
+    """Close every pool created in this process"""
+    for pool in list(_pools.values()):
+        await pool.close()
+    _pools.clear()
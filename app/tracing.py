@@ -0,0 +1,60 @@
+"""
+Lightweight trace spans for the audio path.
+
+A span times one stage of one audio chunk (e.g. ingest: resample, VAD and
+queueing; upstream: replay buffer and hand-off to the recognizer). Every
+span is observed into a histogram (`sauti_span_<name>_seconds`); one in
+TRACE_SAMPLE_EVERY is also written to the log with its session, chunk
+sequence number and duration, so slow chunks can be followed without paying
+for a log record per chunk. A span costs two perf_counter() calls and a
+histogram bucket increment.
+"""
+import logging
+import time
+from app.metrics import FAST_BUCKETS, registry
+
+logger = logging.getLogger(__name__)
+
+
+class Span:
+    __slots__ = ("tracer", "seq", "started")
+
+    def __init__(self, tracer: "Tracer", seq: int):
+        self.tracer = tracer
+        self.seq = seq
+        self.started = 0.0
+
+    def __enter__(self) -> "Span":
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.tracer.finish(self.seq, time.perf_counter() - self.started)
+
+
+class Tracer:
+    def __init__(self, name: str, sample_every: int = 100):
+        """
+        Args:
+            name: Stage name, used in the metric and log records
+            sample_every: Log one span in this many (0 logs none)
+        """
+        self.name = name
+        self.sample_every = sample_every
+        self.histogram = registry.histogram(
+            f"sauti_span_{name}_seconds", f"Time per audio chunk spent in {name.replace('_', ' ')}", FAST_BUCKETS
+        )
+        self._count = 0
+
+    def span(self, seq: int) -> Span:
+        """Time one chunk (`with tracer.span(seq): ...`)"""
+        return Span(self, seq)
+
+    def finish(self, seq: int, seconds: float) -> None:
+        self.histogram.observe(seconds)
+        self._count += 1
+        if self.sample_every and self._count % self.sample_every == 0:
+            logger.info(
+                "🔬 %s chunk %d took %.2f ms", self.name, seq, seconds * 1000,
+                extra={"span": self.name, "seq": seq, "durationMs": round(seconds * 1000, 3)},
+            )
@@ -1,17 +1,48 @@
+import asyncio
 import base64
-import os
-from google.cloud.speech_v2 import SpeechClient
-from google.cloud.speech_v2.types import cloud_speech
 from app.config import settings
+from app.recognizers import RecognitionOptions, create_recognizer
+from app.result_cache import ResultCache, cache_key
 import logging
 
 logger = logging.getLogger(__name__)
 
-# Initialize Speech-to-Text V2 client
-speech_client = SpeechClient()
+# Results of recent chunks, keyed by audio content + recognition config
+result_cache = ResultCache(
+    max_entries=settings.RESULT_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.RESULT_CACHE_TTL_SECONDS,
+)
 
-# Get project ID from environment or settings
-PROJECT_ID = os.getenv("GOOGLE_CLOUD_PROJECT", settings.gcp_project_id)
+async def _recognize(audio_bytes: bytes, language_code: str, sample_rate: int) -> str:
+    """Run one Recognize call and join its transcripts"""
+    recognizer = create_recognizer(region="global", lease=False)
+    options = RecognitionOptions(sample_rate=sample_rate, language_codes=[language_code], model="long")
+    
+    logger.debug("🎤 Sending to %s recognizer (LINEAR16, %dHz, %s, long model)", recognizer.name, sample_rate, language_code)
+    
+    # Transcribe the audio (blocking call, kept off the event loop)
+    try:
+        results = await asyncio.to_thread(recognizer.recognize, audio_bytes, options)
+    finally:
+        recognizer.close()
+    
+    # Extract transcripts
+    transcripts = []
+    for i, result in enumerate(results):
+        if result.alternatives:
+            transcript_text = result.alternatives[0].transcript
+            confidence = result.alternatives[0].confidence
+            logger.debug("  ✅ Result %d: '%s' (confidence: %.2f%%)", i, transcript_text, confidence * 100)
+            transcripts.append(transcript_text)
+    
+    transcript = " ".join(transcripts).strip()
+    
+    if transcript:
+        logger.info("🎯 Transcription successful: %s", transcript)
+        return transcript
+    else:
+        logger.debug("⚠️  No speech detected in audio chunk")
+        return ""
 
 async def transcribe_audio(
     audio_base64: str,
@@ -19,8 +50,9 @@ async def transcribe_audio(
     sample_rate: int = 48000
 ) -> str:
     """
-    Transcribe base64-encoded audio using Google Cloud Speech-to-Text V2 API.
-    Uses explicit LINEAR16 encoding for raw PCM audio from Web Audio API.
+    Transcribe base64-encoded audio with the configured recognizer
+    (Google Cloud Speech-to-Text V2 by default, explicit LINEAR16 decoding
+    for raw PCM audio from Web Audio API).
     
     Args:
         audio_base64: Base64-encoded LINEAR16 PCM audio data (16-bit, mono)
@@ -34,60 +66,18 @@ async def transcribe_audio(
         # Decode base64 to bytes
         audio_bytes = base64.b64decode(audio_base64)
         
-        logger.info(f"📊 Audio chunk: {len(audio_bytes)} bytes")
+        if logger.isEnabledFor(logging.DEBUG):
+            # Size and first few bytes, for debugging client encoders
+            logger.debug("📊 Audio chunk: %d bytes, header %s", len(audio_bytes), audio_bytes[:8].hex())
         
-        # Log first few bytes for debugging
-        if len(audio_bytes) >= 8:
-            header = audio_bytes[:8].hex()
-            logger.info(f"🔍 Audio header (first 8 bytes): {header}")
-        
-        # V2 API: Use ExplicitDecodingConfig for LINEAR16 PCM audio
-        # This matches the raw PCM output from Web Audio API
-        explicit_config = cloud_speech.ExplicitDecodingConfig(
-            encoding=cloud_speech.ExplicitDecodingConfig.AudioEncoding.LINEAR16,
-            sample_rate_hertz=sample_rate,
-            audio_channel_count=1,  # Mono audio
+        # Retried chunks are answered from the cache instead of being billed again
+        key = cache_key(
+            audio_bytes, backend=settings.RECOGNIZER_BACKEND, language=language_code, model="long", sample_rate=sample_rate,
         )
-        
-        config = cloud_speech.RecognitionConfig(
-            explicit_decoding_config=explicit_config,
-            language_codes=[language_code],
-            model="long",  # Flexible model that works with various audio lengths
-            features=cloud_speech.RecognitionFeatures(
-                enable_automatic_punctuation=True,
-            ),
+        return await result_cache.get_or_compute(
+            key, lambda: _recognize(audio_bytes, language_code, sample_rate)
         )
         
-        # Create recognize request
-        request = cloud_speech.RecognizeRequest(
-            recognizer=f"projects/{PROJECT_ID}/locations/global/recognizers/_",
-            config=config,
-            content=audio_bytes,
-        )
-        
-        logger.info(f"🎤 Sending to Speech-to-Text V2 API (LINEAR16, {sample_rate}Hz, {language_code}, long model)...")
-        
-        # Transcribe the audio
-        response = speech_client.recognize(request=request)
-        
-        # Extract transcripts
-        transcripts = []
-        for i, result in enumerate(response.results):
-            if result.alternatives:
-                transcript_text = result.alternatives[0].transcript
-                confidence = result.alternatives[0].confidence
-                logger.info(f"  ✅ Result {i}: '{transcript_text}' (confidence: {confidence:.2%})")
-                transcripts.append(transcript_text)
-        
-        transcript = " ".join(transcripts).strip()
-        
-        if transcript:
-            logger.info(f"🎯 Transcription successful: {transcript}")
-            return transcript
-        else:
-            logger.warning("⚠️  No speech detected in audio chunk")
-            return ""
-        
     except base64.binascii.Error as e:
         logger.error(f"❌ Base64 decode error: {str(e)}")
         raise ValueError(f"Invalid base64 audio data: {str(e)}")
@@ -3,17 +3,12 @@ Streaming transcription using Google Cloud Speech-to-Text
 This handles real-time audio chunks properly
 """
 import base64
-import queue
-import threading
-from google.cloud import speech_v1 as speech
-from app.config import settings
+from app.opus_stream import ENCODING_WEBM_OPUS
+from app.recognizers import RecognitionOptions, create_recognizer
 import logging
 
 logger = logging.getLogger(__name__)
 
-# Initialize Speech-to-Text client
-speech_client = speech.SpeechClient()
-
 def transcribe_audio_streaming(audio_base64: str, language_code: str = "en-KE") -> str:
     """
     Use streaming recognition for better chunk handling.
@@ -21,29 +16,29 @@ def transcribe_audio_streaming(audio_base64: str, language_code: str = "en-KE")
     """
     try:
         audio_bytes = base64.b64decode(audio_base64)
-        logger.info(f"Streaming audio chunk size: {len(audio_bytes)} bytes")
-        
-        # For now, use the synchronous method with proper config
-        audio = speech.RecognitionAudio(content=audio_bytes)
-        
-        # Use LINEAR16 encoding which is more reliable for chunks
-        config = speech.RecognitionConfig(
-            encoding=speech.RecognitionConfig.AudioEncoding.WEBM_OPUS,
-            sample_rate_hertz=48000,
-            language_code=language_code,
-            enable_automatic_punctuation=True,
-            model="default",
+        logger.debug("Streaming audio chunk size: %d bytes", len(audio_bytes))
+
+        # WebM/Opus chunks from MediaRecorder, decoded by the recognizer
+        options = RecognitionOptions(
+            sample_rate=48000,
+            encoding=ENCODING_WEBM_OPUS,
+            language_codes=[language_code],
+            model="long",
         )
-        
-        response = speech_client.recognize(config=config, audio=audio)
-        
+
+        recognizer = create_recognizer(region="global", lease=False)
+        try:
+            results = recognizer.recognize(audio_bytes, options)
+        finally:
+            recognizer.close()
+
         transcripts = []
-        for result in response.results:
+        for result in results:
             if result.alternatives:
                 transcripts.append(result.alternatives[0].transcript)
-        
+
         return " ".join(transcripts).strip()
-        
+
     except Exception as e:
         logger.error(f"Streaming transcription error: {str(e)}")
         return ""
@@ -0,0 +1,179 @@
+"""
+Server-side voice activity detection for LINEAR16 audio.
+
+Classroom audio is mostly silence, so audio is gated before it reaches the
+Speech API: frames are classified by energy against an adaptive noise floor
+(vectorized with NumPy, one pass per chunk), a short pre-roll is kept so word
+onsets are not clipped, a hangover keeps trailing syllables, and long
+silences ask the caller to suspend the upstream stream altogether.
+
+The gate remembers where it dropped audio, so positions in the forwarded
+audio (which is all the recognizer sees) can be mapped back to positions
+in the lecture with `input_offset()`.
+"""
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from typing import List
+import numpy as np
+
+# dBFS reference for int16 samples
+_FULL_SCALE = 32768.0 ** 2
+
+
+def frame_levels(frames: np.ndarray) -> np.ndarray:
+    """Per-frame energy in dBFS of int16 frames shaped (n_frames, frame_len)"""
+    samples = frames.astype(np.float32)
+    energy = np.einsum("ij,ij->i", samples, samples) / frames.shape[1]
+    return 10.0 * np.log10(energy / _FULL_SCALE + 1e-12)
+
+
+@dataclass
+class VadResult:
+    """Outcome of gating one chunk"""
+    audio: bytes  # Audio to forward upstream (pre-roll + speech), may be empty
+    suspend: bool = False  # Silence has lasted long enough to close the upstream stream
+
+
+class VoiceActivityGate:
+    def __init__(
+        self,
+        sample_rate: int,
+        frame_ms: int = 20,
+        margin_db: float = 10.0,
+        min_speech_db: float = -55.0,
+        preroll_ms: int = 300,
+        hangover_ms: int = 500,
+        suspend_after_s: float = 15.0,
+        floor_rise_db_per_s: float = 3.0,
+    ):
+        """
+        Args:
+            sample_rate: Sample rate of the mono int16 input
+            frame_ms: Analysis frame length
+            margin_db: How far above the noise floor a frame must be to count as speech
+            min_speech_db: Absolute level (dBFS) below which nothing counts as speech
+            preroll_ms: Audio kept before speech onset
+            hangover_ms: Audio kept after the last speech frame
+            suspend_after_s: Silence after which the upstream stream can be suspended (0 = never)
+            floor_rise_db_per_s: How fast the noise floor may creep up
+        """
+        self.frame_len = max(1, sample_rate * frame_ms // 1000)
+        self.frame_bytes = self.frame_len * 2
+        self.frame_seconds = self.frame_len / sample_rate
+        self.margin_db = margin_db
+        self.min_speech_db = min_speech_db
+        self.preroll = max(0, preroll_ms // frame_ms)
+        self.hangover = max(0, hangover_ms // frame_ms)
+        # 0 disables suspension
+        self.suspend_after = int(suspend_after_s / self.frame_seconds) if suspend_after_s > 0 else None
+        self.floor_rise_db = floor_rise_db_per_s * self.frame_seconds
+
+        self.noise_floor_db = min_speech_db - margin_db
+        self._carry = b""  # Partial frame left over from the last chunk
+        self._frame_index = 0  # Global index of the next frame
+        self._last_speech = -(10 ** 9)  # Global index of the last speech frame
+        # Most recent frames, kept so pre-roll can reach into the previous chunk
+        self._tail = np.zeros((0, self.frame_len), dtype=np.int16)
+        self._tail_sent = np.zeros(0, dtype=bool)
+        self._silent_frames = 0
+        self.suspended = False
+
+        # Per-session accounting
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+        # Where forwarded audio resumes after dropped frames: output byte
+        # offset -> input byte offset, one entry per dropped span
+        self._resume_out: List[int] = []
+        self._resume_in: List[int] = []
+        self._last_sent = -1  # Global index of the last forwarded frame
+
+    @property
+    def suppressed_percent(self) -> float:
+        """Share of incoming audio that was not forwarded upstream"""
+        if not self.bytes_in:
+            return 0.0
+        return 100.0 * (1.0 - self.bytes_out / self.bytes_in)
+
+    def input_offset(self, output_offset: int, end: bool = False) -> int:
+        """
+        Byte offset in the incoming audio of a byte offset in the forwarded audio.
+
+        Args:
+            output_offset: Offset into the audio the gate forwarded
+            end: The offset ends a span (a word's end), so where a dropped
+                span begins it maps to the audio before the gap, not after it
+        """
+        i = (bisect_left if end else bisect_right)(self._resume_out, output_offset) - 1
+        if i < 0:
+            return output_offset
+        return self._resume_in[i] + output_offset - self._resume_out[i]
+
+    def process(self, chunk: bytes) -> VadResult:
+        """Gate one chunk of mono int16 audio"""
+        self.bytes_in += len(chunk)
+        data = self._carry + chunk
+        n_frames = len(data) // self.frame_bytes
+        self._carry = data[n_frames * self.frame_bytes:]
+        if n_frames == 0:
+            return VadResult(b"")
+
+        frames = np.frombuffer(data, dtype=np.int16, count=n_frames * self.frame_len).reshape(n_frames, self.frame_len)
+        levels = frame_levels(frames)
+
+        # Noise floor follows quiet frames down fast and up slowly
+        quietest = float(levels.min())
+        if quietest < self.noise_floor_db:
+            self.noise_floor_db = quietest
+        else:
+            self.noise_floor_db += min(quietest - self.noise_floor_db, self.floor_rise_db * n_frames)
+        threshold = max(self.noise_floor_db + self.margin_db, self.min_speech_db)
+        is_speech = levels > threshold
+
+        # Hangover: frames within `hangover` frames after the last speech frame
+        index = np.arange(self._frame_index, self._frame_index + n_frames)
+        last_speech = np.maximum.accumulate(np.where(is_speech, index, self._last_speech))
+        active = (index - last_speech) <= self.hangover
+
+        # Pre-roll: also keep frames shortly before an active frame, including
+        # frames from the previous chunk that were held back
+        all_frames = np.concatenate([self._tail, frames])
+        already_sent = np.concatenate([self._tail_sent, np.zeros(n_frames, dtype=bool)])
+        all_active = np.concatenate([np.zeros(len(self._tail), dtype=bool), active])
+        if self.preroll:
+            # Index of the next active frame at or after each position
+            positions = np.arange(len(all_active))
+            next_active = np.where(all_active, positions, len(all_active) + self.preroll + 1)
+            next_active = np.minimum.accumulate(next_active[::-1])[::-1]
+            keep = (next_active - positions) <= self.preroll
+        else:
+            keep = all_active
+        send = keep & ~already_sent
+
+        audio = all_frames[send].tobytes()
+        sent = np.flatnonzero(send) + (self._frame_index - len(self._tail))
+        if len(sent):
+            for position in np.flatnonzero(np.diff(sent, prepend=self._last_sent) != 1):
+                self._resume_out.append(self.bytes_out + int(position) * self.frame_bytes)
+                self._resume_in.append(int(sent[position]) * self.frame_bytes)
+            self._last_sent = int(sent[-1])
+        self.bytes_out += len(audio)
+
+        self._tail = all_frames[-self.preroll:] if self.preroll else all_frames[:0]
+        self._tail_sent = (already_sent | send)[-self.preroll:] if self.preroll else already_sent[:0]
+        self._frame_index += n_frames
+        if is_speech.any():
+            self._last_speech = int(last_speech[-1])
+
+        # Long silence: tell the caller once, until speech resumes
+        if active.any():
+            trailing_silence = n_frames - 1 - int(np.flatnonzero(active)[-1])
+            self._silent_frames = trailing_silence
+            self.suspended = False
+        else:
+            self._silent_frames += n_frames
+        suspend = False
+        if self.suspend_after is not None and not self.suspended and self._silent_frames >= self.suspend_after:
+            self.suspended = True
+            suspend = True
+        return VadResult(audio, suspend)
@@ -1,167 +1,962 @@
 from fastapi import WebSocket, WebSocketDisconnect, APIRouter
-from google.cloud.speech_v2 import SpeechClient
-from google.cloud.speech_v2.types import cloud_speech
-from google.api_core.client_options import ClientOptions
+from collections import deque
+from typing import Deque, List, Optional, Set, Tuple
 import asyncio
 import json
 import logging
+import time
+from app import firebase_client
+from app.admission import admission
 from app.config import settings
+from app.audio_framer import AudioFramer
+from app.audio_queue import AudioQueue, OverloadPolicy
+from app.audio_spool import SessionSpool, get_audio_spool
+from app.caption_cues import CueTrack, cue_tracks
+from app.caption_hub import hub as caption_hub
+from app.metrics import (
+    audio_received_bytes, audio_upstream_bytes, final_latency, interim_latency, registry, upstream_errors,
+)
+from app.logs import EventSampler, session_context
+from app.opus_stream import CompressedReplayBuffer, ENCODING_LINEAR16, ENCODINGS
+from app.recognizers import (
+    GoogleRecognizer, RecognitionOptions, Recognizer, create_recognizer, fallback_backend, is_fallback_error,
+    recognizer_class,
+)
+from app.ring_buffer import AudioRingBuffer
+from app.speech_bridge import SpeechStreamBridge
+from app.tracing import Tracer
+from app.protocol import CompactEncoder, PROTOCOL_COMPACT, PROTOCOL_JSON
+from app.resampler import StreamingResampler
+from app.sessions import sessions
+from app.vad import VoiceActivityGate
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
 REGION = "us"  # US region for guaranteed chirp_3 availability
-PROJECT_ID = settings.gcp_project_id
+
+# Queue markers: the active upstream stream is due for rollover / should be
+# suspended after a long silence
+_ROLLOVER = object()
+_SUSPEND = object()
+
+# Per-chunk timing of the two audio stages: WebSocket -> queue, queue -> recognizer
+ingest_tracer = Tracer("chunk_ingest", settings.TRACE_SAMPLE_EVERY)
+upstream_tracer = Tracer("chunk_upstream", settings.TRACE_SAMPLE_EVERY)
+
+# Sessions currently streaming, read by the metrics below at scrape time
+_active_streams: Set["TranscriptionStream"] = set()
+
+registry.gauge(
+    "sauti_active_streams", "Lecturer sessions currently streaming",
+    function=lambda: len(_active_streams),
+)
+audio_messages = registry.counter(
+    "sauti_audio_messages_total", "Audio messages from clients (in) and to the recognizer (upstream)", ("direction",)
+)
+recognizer_fallbacks = registry.counter(
+    "sauti_recognizer_fallbacks_total", "Live sessions moved to the fallback recognizer", ("backend",)
+)
+registry.gauge(
+    "sauti_audio_queue_bytes", "Audio waiting in session queues",
+    function=lambda: sum(stream.audio_queue.pending_bytes for stream in _active_streams),
+)
+registry.gauge(
+    "sauti_session_audio_bytes", "Audio bytes per active session", ("session", "direction"),
+    function=lambda: {
+        key: value
+        for stream in _active_streams
+        for key, value in (
+            ((stream.session_id, "in"), stream.bytes_received),
+            ((stream.session_id, "upstream"), stream.bytes_upstream),
+        )
+    },
+)
 
 class TranscriptionStream:
-    def __init__(self, websocket: WebSocket, session_id: str):
-        self.websocket = websocket
+    def __init__(
+        self,
+        websocket: WebSocket,
+        session_id: str,
+        client=None,
+        protocol: str = PROTOCOL_JSON,
+        encoding: str = ENCODING_LINEAR16,
+        recognizer: Optional[Recognizer] = None,
+    ):
+        """
+        Args:
+            websocket: The lecturer's connection
+            session_id: Lecture session
+            client: Speech client to stream through (shorthand for a
+                GoogleRecognizer on it)
+            protocol: PROTOCOL_JSON or PROTOCOL_COMPACT
+            encoding: Audio the client sends (see app.opus_stream)
+            recognizer: Recognition backend (settings.RECOGNIZER_BACKEND
+                with a pooled channel lease by default)
+
+        Raises:
+            ValueError: The backend can't recognize `encoding`
+        """
+        self.websocket: Optional[WebSocket] = websocket  # None while the lecturer is disconnected
         self.session_id = session_id
-        self.client = SpeechClient(
-            client_options=ClientOptions(
-                api_endpoint=f"{REGION}-speech.googleapis.com"
-            )
-        )
-        self.audio_queue = asyncio.Queue()
+        # Compact mode: binary MessagePack frames with delta-encoded interims
+        self.encoder: Optional[CompactEncoder] = None
+        if protocol == PROTOCOL_COMPACT:
+            self.encoder = CompactEncoder(resync_every=settings.COMPACT_RESYNC_EVERY)
+        
+        # Resume state: the client numbers its audio chunks from 0 and, after
+        # a reconnect, resends from `chunks_received` on
+        self.resume_token: Optional[str] = None
+        self.task: Optional[asyncio.Task] = None  # Runs start(), outlives any one WebSocket
+        self.chunks_received = 0
+        self._held: Deque[dict] = deque(maxlen=settings.SESSION_HELD_MESSAGES)
+        self._upstream_lost = False  # Stream failed while disconnected; replay on the next audio
+        # Google by default: a pooled, pre-connected channel shared with other sessions
+        if recognizer is None:
+            recognizer = GoogleRecognizer(REGION, client) if client is not None else create_recognizer(region=REGION)
+        if encoding not in recognizer.encodings:
+            recognizer.close()
+            raise ValueError(f"The {recognizer.name} recognizer doesn't accept {encoding} audio")
+        self.recognizer = recognizer
+        # Backend to move to if the primary turns this session away (once)
+        self._fallback = fallback_backend()
+        if self._fallback == recognizer.name or (
+            self._fallback and encoding not in recognizer_class(self._fallback).encodings
+        ):
+            self._fallback = None
         self.is_streaming = False
-    
-    async def start(self):
-        """Start bidirectional streaming with Google Speech-to-Text V2"""
-        self.is_streaming = True
         
-        logger.info(f"🎙️  Starting streaming for session: {self.session_id}")
-        
-        # Create streaming config with chirp_3
-        recognition_config = cloud_speech.RecognitionConfig(
-            auto_decoding_config=cloud_speech.AutoDetectDecodingConfig(),
-            language_codes=["en-US", "sw-KE"],  # English + Swahili Kenya
-            model="chirp_3",
-            features=cloud_speech.RecognitionFeatures(
-                enable_automatic_punctuation=True,
-                enable_word_time_offsets=True,
-            ),
+        # Speech streams are capped at a few minutes, lectures are not: the
+        # session rolls over to a fresh upstream stream before the limit and
+        # replays whatever audio has not been finalized yet.
+        self.upstream: Optional[SpeechStreamBridge] = None  # Receives live audio
+        self._retiring: Optional[SpeechStreamBridge] = None  # Previous stream during overlap
+        self._consumers: List[asyncio.Task] = []
+        self._error: Optional[BaseException] = None
+        self._rollover_timer: Optional[asyncio.TimerHandle] = None
+        self._retire_timer: Optional[asyncio.TimerHandle] = None
+        # Raw PCM, or Opus passed through to Speech in its container
+        self.encoding = encoding
+        self.compressed = encoding != ENCODING_LINEAR16
+        # Incoming PCM is conditioned to mono LINEAR16 at the rate Speech needs
+        self.resampler: Optional[StreamingResampler] = None
+        if not self.compressed:
+            self.resampler = StreamingResampler(
+                settings.SPEECH_SAMPLE_RATE,
+                settings.SPEECH_TARGET_SAMPLE_RATE,
+                channels=settings.AUDIO_INPUT_CHANNELS,
+            )
+        # Offsets are in LINEAR16 bytes at this rate in both modes
+        self.sample_rate = settings.SPEECH_TARGET_SAMPLE_RATE
+        self.bytes_per_second = self.sample_rate * 2  # LINEAR16 mono
+        self.options = RecognitionOptions(
+            sample_rate=self.sample_rate,
+            encoding=encoding,
+            language_codes=settings.SPEECH_LANGUAGES,  # English + Swahili Kenya
+            model=settings.SPEECH_MODEL,
+            interim_results=True,  # Get word-by-word results
+            word_offsets=True,
         )
         
-        streaming_config = cloud_speech.StreamingRecognitionConfig(
-            config=recognition_config,
-            streaming_features=cloud_speech.StreamingRecognitionFeatures(
-                interim_results=True  # Get word-by-word results
-            ),
+        # Bounded: when Speech falls behind, the overload policy decides
+        # between pausing the WebSocket and shedding audio. Shedding would
+        # corrupt a container, so Opus sessions always push back instead
+        # (the same byte budget holds far more Opus audio).
+        self.audio_queue = AudioQueue(
+            int(settings.AUDIO_QUEUE_MAX_SECONDS * self.bytes_per_second),
+            policy="block" if self.compressed else settings.AUDIO_OVERLOAD_POLICY,
+            max_chunk_bytes=settings.AUDIO_MAX_REQUEST_BYTES,
         )
+        self._overload_reported_at = 0.0
         
-        # Initial config request
-        config_request = cloud_speech.StreamingRecognizeRequest(
-            recognizer=f"projects/{PROJECT_ID}/locations/{REGION}/recognizers/_",
-            streaming_config=streaming_config,
-        )
+        # Live interim captions for Realtime DB viewers, rate-limited
+        self.interim_captions: Optional[firebase_client.InterimCaptionThrottle] = None
+        if settings.FIREBASE_INTERIM_ENABLED:
+            self.interim_captions = firebase_client.InterimCaptionThrottle(session_id)
+        # Durable, segmented transcript of every final
+        self.transcript_log: Optional[firebase_client.TranscriptSegmentWriter] = None
+        if settings.FIREBASE_TRANSCRIPT_ENABLED:
+            self.transcript_log = firebase_client.TranscriptSegmentWriter(
+                session_id, segment_size=settings.FIREBASE_SEGMENT_SIZE
+            )
+        # Timed cues for WebVTT/SRT export, built as results arrive
+        self.cue_track: Optional[CueTrack] = None
+        if settings.CAPTION_CUES_ENABLED:
+            self.cue_track = cue_tracks.open(session_id)
+        replay_bytes = int(settings.STREAM_REPLAY_BUFFER_SECONDS * self.bytes_per_second)
+        self.replay_buffer = AudioRingBuffer(replay_bytes)
+        if self.compressed:
+            self.replay_buffer = CompressedReplayBuffer(encoding, replay_bytes, self.bytes_per_second)
+        self._last_final_end = 0  # Absolute byte offset of audio already finalized
         
-        # Generator for audio requests
-        async def audio_generator():
-            yield config_request
-            while self.is_streaming:
-                try:
-                    audio_data = await asyncio.wait_for(
-                        self.audio_queue.get(), 
-                        timeout=1.0
-                    )
-                    yield cloud_speech.StreamingRecognizeRequest(audio=audio_data)
-                except asyncio.TimeoutError:
-                    continue
+        # Latency tracking: when the audio up to each upstream offset arrived
+        self._arrivals: Deque[Tuple[int, float]] = deque()
+        self._interim_covered = 0  # Upstream offset already covered by an interim
+        self.bytes_received = 0
+        self.bytes_upstream = 0
+        self._upstream_chunks = 0
+        self.rollover_gaps_ms: List[float] = []
+        # Interims arrive several times a second: only a sample is logged
+        self.log_sampler = EventSampler(settings.LOG_SAMPLE_PER_SECOND, burst=1)
         
-        try:
-            # Start gRPC streaming
-            responses = self.client.streaming_recognize(
-                requests=audio_generator()
+        # Silence is dropped before it is queued; long silences close the
+        # upstream stream until speech resumes
+        self.vad: Optional[VoiceActivityGate] = None
+        if settings.VAD_ENABLED and not self.compressed:
+            self.vad = VoiceActivityGate(
+                self.sample_rate,
+                margin_db=settings.VAD_MARGIN_DB,
+                min_speech_db=settings.VAD_MIN_SPEECH_DB,
+                preroll_ms=settings.VAD_PREROLL_MS,
+                hangover_ms=settings.VAD_HANGOVER_MS,
+                suspend_after_s=settings.VAD_SUSPEND_AFTER_SECONDS,
             )
-            
-            # Process responses and send back via WebSocket
-            for response in responses:
-                for result in response.results:
-                    transcript = result.alternatives[0].transcript
-                    is_final = result.is_final
-                    confidence = result.alternatives[0].confidence if is_final else 0.0
-                    
-                    logger.info(f"{'✅' if is_final else '⏳'} {transcript} (confidence: {confidence:.2%})")
-                    
-                    await self.websocket.send_json({
-                        "type": "transcription",
-                        "transcript": transcript,
-                        "isFinal": is_final,
-                        "confidence": confidence,
-                        "sessionId": self.session_id,
-                    })
-                    
-                    # Publish final transcripts to Firebase Realtime DB
-                    if is_final and transcript.strip():
-                        try:
-                            from app.firebase_client import publish_caption
-                            await publish_caption(self.session_id, transcript)
-                            logger.info(f"✅ Published to Firebase: {transcript[:50]}...")
-                        except Exception as fb_error:
-                            logger.error(f"❌ Firebase publish failed: {str(fb_error)}")
-                            # Don't fail the whole stream if Firebase fails
+        
+        # Worklet-sized client chunks are re-assembled into fixed-duration
+        # frames before they are queued: fewer, evenly sized upstream messages
+        self.framer: Optional[AudioFramer] = None
+        if settings.AUDIO_FRAME_MS > 0 and not self.compressed:
+            self.framer = AudioFramer(
+                self.bytes_per_second * settings.AUDIO_FRAME_MS // 1000,
+                max_hold_seconds=settings.AUDIO_FRAME_MAX_HOLD_MS / 1000,
+                max_frame_bytes=settings.AUDIO_MAX_REQUEST_BYTES,
+            )
+        self._hold_timer: Optional[asyncio.TimerHandle] = None
+        self._queueing_frames = False  # send_audio is queueing frames the framer released
+        self.started_at: Optional[float] = None
+        
+        # Copy of the conditioned PCM on disk, written in the background
+        self.spool: Optional[SessionSpool] = None
+        audio_spool = get_audio_spool()
+        if audio_spool is not None and not self.compressed:
+            self.spool = audio_spool.open(session_id, self.sample_rate)
+    
+    async def start(self):
+        """Start bidirectional streaming with the recognizer (Google Speech-to-Text V2 by default)"""
+        self.is_streaming = True
+        self.started_at = time.monotonic()
+        _active_streams.add(self)
+        session_context.set(self.session_id)
+        
+        logger.info(f"🎙️  Starting streaming for session: {self.session_id} ({self.recognizer.name})")
+        
+        try:
+            self.upstream = self._open_upstream(base_offset=0)
+            await self._pump_audio()
+            # Let every open upstream stream flush its pending finals
+            await asyncio.gather(*self._consumers)
+            if self._error is not None:
+                raise self._error
         except Exception as e:
             logger.error(f"❌ Streaming error: {str(e)}", exc_info=True)
             try:
-                await self.websocket.send_json({
+                await self._send({
                     "type": "error",
                     "message": str(e),
                 })
             except:
                 pass  # WebSocket might be closed
+        finally:
+            for timer in (self._rollover_timer, self._retire_timer, self._hold_timer):
+                if timer is not None:
+                    timer.cancel()
+            for upstream in (self.upstream, self._retiring):
+                if upstream is not None:
+                    upstream.cancel()
+            for task in self._consumers:
+                if not task.done():
+                    task.cancel()
+            if self.interim_captions is not None:
+                self.interim_captions.close()
+            if self.cue_track is not None:
+                cue_tracks.finish(self.cue_track)
+            await self._send_stats()
+            _active_streams.discard(self)
+            self.recognizer.close()
+            if self.spool is not None:
+                self.spool.close()
+    
+    def _open_upstream(self, base_offset: int) -> SpeechStreamBridge:
+        """Start a new upstream stream and schedule its rollover"""
+        # Blocking recognizer call runs on its own thread; this coroutine only awaits
+        upstream = SpeechStreamBridge(
+            self.recognizer,
+            self.options,
+            name=f"speech-{self.session_id}",
+            base_offset=base_offset,
+            max_pending_bytes=int(settings.UPSTREAM_MAX_PENDING_SECONDS * self.bytes_per_second),
+        )
+        upstream.start()
+        self._consumers.append(asyncio.create_task(self._consume(upstream)))
+        self._rollover_timer = asyncio.get_running_loop().call_later(
+            settings.STREAM_ROLLOVER_SECONDS, self.audio_queue.put_control, _ROLLOVER
+        )
+        return upstream
+    
+    async def _pump_audio(self):
+        """Forward queued audio to the upstream stream until stop() is called"""
+        while True:
+            audio_data = await self.audio_queue.get()
+            if audio_data is None:
+                break
+            if audio_data is _ROLLOVER:
+                if self.upstream is not None:
+                    await self._rollover()
+                continue
+            if audio_data is _SUSPEND:
+                self._suspend()
+                continue
+            if self.upstream is None and self._upstream_lost:
+                await self._reopen_upstream()
+            elif self.upstream is None:
+                # Speech after a long silence: nothing left to replay
+                self.upstream = self._open_upstream(base_offset=self.replay_buffer.end_offset)
+                logger.info(f"🔊 Resuming upstream stream for session {self.session_id}")
+            self._upstream_chunks += 1
+            audio_messages.inc(1, "upstream")
+            with upstream_tracer.span(self._upstream_chunks):
+                self.replay_buffer.append(audio_data)
+                self._arrivals.append((self.replay_buffer.end_offset, self.audio_queue.last_enqueued_at))
+                while self._arrivals and self._arrivals[0][0] < self.replay_buffer.start_offset:
+                    self._arrivals.popleft()
+                self.bytes_upstream += len(audio_data)
+                audio_upstream_bytes.inc(len(audio_data))
+                await self.upstream.send(audio_data)
+                if self._retiring is not None:
+                    # Best effort: the old stream must never hold up the new one
+                    self._retiring.try_send(audio_data)
+        self._retire()
+        if self.upstream is not None:
+            self.upstream.close()
+    
+    def _suspend(self):
+        """Close the upstream stream during a long silence (finals still flush)"""
+        if self.upstream is None:
+            return
+        self._retire()
+        self.upstream.close()
+        self.upstream = None
+        if self._rollover_timer is not None:
+            self._rollover_timer.cancel()
+        logger.info(f"💤 Suspending upstream stream for session {self.session_id} after silence")
+    
+    async def _reopen_upstream(self):
+        """Replace a stream that failed while the lecturer was away (or before a fallback)"""
+        self._upstream_lost = False
+        replay_from = self.replay_buffer.resume_point(max(self._last_final_end, self.replay_buffer.start_offset))
+        self.upstream = self._open_upstream(base_offset=replay_from)
+        replayed = 0
+        for chunk in self.replay_buffer.chunks_since(replay_from):
+            await self.upstream.send(bytes(chunk))
+            replayed += len(chunk)
+        logger.info(f"🔊 Reopened upstream stream for session {self.session_id} (replaying {replayed} bytes)")
+    
+    async def _rollover(self):
+        """Hand live audio over to a fresh upstream stream"""
+        self._retire()  # Previous handoff still pending
+        # Opus can only restart at a cluster/page: replay from the one
+        # holding the first unfinalized audio (duplicates are trimmed)
+        replay_from = self.replay_buffer.resume_point(max(self._last_final_end, self.replay_buffer.start_offset))
+        self._retiring = self.upstream
+        self.upstream = self._open_upstream(base_offset=replay_from)
+        
+        # Replay the unfinalized tail, then keep feeding both streams until
+        # the new one answers (or the overlap window runs out)
+        replayed = 0
+        for chunk in self.replay_buffer.chunks_since(replay_from):
+            await self.upstream.send(bytes(chunk))
+            replayed += len(chunk)
+        self._retire_timer = asyncio.get_running_loop().call_later(
+            settings.STREAM_ROLLOVER_OVERLAP_SECONDS, self._retire
+        )
+        logger.info(f"🔁 Rolling over stream for session {self.session_id} (replaying {replayed} bytes)")
+    
+    def _retire(self):
+        """Stop feeding the previous stream; it still flushes its finals"""
+        old, self._retiring = self._retiring, None
+        if old is None:
+            return
+        if self._retire_timer is not None:
+            self._retire_timer.cancel()
+            self._retire_timer = None
+        old.close()
+        
+        # Time during which no upstream stream was accepting live audio
+        new_ready_at = (self.upstream and self.upstream.first_audio_at) or time.monotonic()
+        old_last_at = old.last_audio_at or new_ready_at
+        gap_ms = max(0.0, (new_ready_at - old_last_at) * 1000)
+        self.rollover_gaps_ms.append(gap_ms)
+        logger.info(f"🔁 Rollover #{len(self.rollover_gaps_ms)} for session {self.session_id}: gap {gap_ms:.1f} ms")
+        asyncio.create_task(self._send_json({
+            "type": "rollover",
+            "gapMs": round(gap_ms, 1),
+            "count": len(self.rollover_gaps_ms),
+            "sessionId": self.session_id,
+        }))
+    
+    async def _send(self, message: dict):
+        """
+        Send a message to the lecturer in the negotiated protocol.
+        
+        While the lecturer is disconnected, finals and errors are held for
+        the resumed connection; interims and progress messages are dropped.
+        """
+        websocket = self.websocket
+        if websocket is not None:
+            try:
+                if self.encoder is not None:
+                    await websocket.send_bytes(self.encoder.encode(message))
+                else:
+                    await websocket.send_json(message)
+                return
+            except Exception as e:
+                # The receive loop notices the drop and parks the session
+                logger.debug("Send to %s failed: %s", self.session_id, e)
+        if message.get("isFinal") or message.get("type") in ("error", "stats"):
+            self._held.append(message)
+    
+    async def _send_json(self, message: dict):
+        try:
+            await self._send(message)
+        except Exception:
+            pass  # WebSocket might be closed
+    
+    async def _consume(self, upstream: SpeechStreamBridge):
+        """Process one upstream stream's responses"""
+        try:
+            async for response in upstream.responses():
+                if upstream is self.upstream and self._retiring is not None:
+                    # New stream is live: stop feeding the old one
+                    self._retire()
+                for result in response.results:
+                    await self._handle_result(upstream, result)
+        except Exception as e:
+            if upstream is self.upstream and self._fallback and is_fallback_error(e):
+                # Quota or outage: carry on with the fallback engine, replaying
+                # the unfinalized audio when the next chunk arrives
+                upstream_errors.inc(1, "fallback")
+                previous, self.recognizer = self.recognizer, create_recognizer(self._fallback, region=REGION)
+                self._fallback = None
+                previous.close()
+                recognizer_fallbacks.inc(1, self.recognizer.name)
+                logger.warning(
+                    f"⚠️  {previous.name} stream for session {self.session_id} failed ({type(e).__name__}), "
+                    f"switching to the {self.recognizer.name} recognizer"
+                )
+                self._lose_upstream()
+                await self._send_json({
+                    "type": "recognizer",
+                    "backend": self.recognizer.name,
+                    "reason": type(e).__name__,
+                    "sessionId": self.session_id,
+                })
+            elif upstream is self.upstream and self.websocket is None:
+                # Likely an audio timeout while the lecturer is away: reopen
+                # when audio flows again instead of ending the session
+                upstream_errors.inc(1, "detached_stream")
+                logger.warning(f"⚠️  Stream for disconnected session {self.session_id} ended: {str(e)}")
+                self._lose_upstream()
+            elif upstream is self.upstream:
+                upstream_errors.inc(1, "stream")
+                self._error = e
+                self.audio_queue.put_control(None)
+            else:
+                upstream_errors.inc(1, "retired_stream")
+                logger.warning(f"⚠️  Retired stream for session {self.session_id} failed: {str(e)}")
+    
+    def _lose_upstream(self):
+        """Drop the failed active stream; the next audio chunk reopens it with a replay"""
+        self.upstream = None
+        self._upstream_lost = True
+        if self._rollover_timer is not None:
+            self._rollover_timer.cancel()
+    
+    def _offset_bytes(self, offset) -> int:
+        """Convert a result time offset to a byte offset in LINEAR16 audio"""
+        return int(offset.total_seconds() * self.sample_rate) * 2
+    
+    def _lecture_ms(self, upstream: SpeechStreamBridge, offset, end: bool = False) -> int:
+        """
+        Position in the lecture (ms of audio received, silence included) of a
+        result time offset. The recognizer only hears what the VAD forwards.
+        
+        Args:
+            upstream: Stream the result came from
+            offset: Result time offset
+            end: The offset ends a word or result (see VoiceActivityGate.input_offset)
+        """
+        forwarded = upstream.base_offset + self._offset_bytes(offset)
+        if self.vad is not None:
+            forwarded = self.vad.input_offset(forwarded, end=end)
+        return forwarded * 1000 // self.bytes_per_second
+    
+    def _observe_latency(self, upstream: SpeechStreamBridge, result, is_final: bool):
+        """Record how long after its audio arrived a result came back"""
+        if not result.result_end_offset:
+            return
+        end = upstream.base_offset + self._offset_bytes(result.result_end_offset)
+        if not is_final:
+            if end <= self._interim_covered:
+                return  # Only the first interim covering new audio counts
+            self._interim_covered = end
+        for offset, received_at in self._arrivals:
+            if offset >= end:
+                latency = time.monotonic() - received_at
+                (final_latency if is_final else interim_latency).observe(latency)
+                break
+        if is_final:
+            while self._arrivals and self._arrivals[0][0] <= end:
+                self._arrivals.popleft()
+    
+    def _dedupe_final(self, upstream: SpeechStreamBridge, result) -> Optional[Tuple[str, list]]:
+        """
+        Drop or trim a final that overlaps audio already finalized by another
+        stream (replayed audio is recognized twice around a rollover).
+        
+        Returns:
+            Transcript to publish and the words it covers, or None for a full duplicate
+        """
+        alternative = result.alternatives[0]
+        if not result.result_end_offset:
+            return alternative.transcript, list(alternative.words)  # No timing info to compare
+        
+        end = upstream.base_offset + self._offset_bytes(result.result_end_offset)
+        if end <= self._last_final_end:
+            logger.debug("Dropping duplicate final: %s", alternative.transcript)
+            return None
+        
+        transcript = alternative.transcript
+        words = list(alternative.words)
+        if words and upstream.base_offset + self._offset_bytes(words[0].start_offset) < self._last_final_end:
+            words = [
+                word for word in words
+                if upstream.base_offset + self._offset_bytes(word.start_offset) >= self._last_final_end
+            ]
+            transcript = " ".join(word.word for word in words)
+        self._last_final_end = end
+        return transcript, words
+    
+    def _word_timings(self, upstream: SpeechStreamBridge, words: list) -> List[dict]:
+        """Word timings in ms into the lecture, for the transcript and caption cues"""
+        return [
+            {
+                'w': word.word,
+                's': self._lecture_ms(upstream, word.start_offset),
+                'e': self._lecture_ms(upstream, word.end_offset, end=True),
+            }
+            for word in words
+        ]
+    
+    def _log_final(self, transcript: str, timings: List[dict], end_ms: Optional[int]):
+        """Append a final, with word timings, to the durable transcript"""
+        start_ms = timings[0]['s'] if timings else None
+        self.transcript_log.append(transcript, start_ms=start_ms, end_ms=end_ms, words=timings)
+    
+    async def _handle_result(self, upstream: SpeechStreamBridge, result):
+        if not result.alternatives:
+            return
+        transcript = result.alternatives[0].transcript
+        is_final = result.is_final
+        self._observe_latency(upstream, result, is_final)
+        
+        if is_final:
+            deduped = self._dedupe_final(upstream, result)
+            if deduped is None:
+                return
+            transcript, words = deduped
+        elif upstream is not self.upstream:
+            return  # Superseded by the stream that took over
+        
+        confidence = result.alternatives[0].confidence if is_final else 0.0
+        
+        if is_final:
+            logger.info("✅ %s (confidence: %.2f%%)", transcript, confidence * 100, extra={"event": "final"})
+        elif self.log_sampler.allow():
+            logger.info("⏳ %s", transcript, extra={"event": "interim", "suppressed": self.log_sampler.take_suppressed()})
+        
+        message = {
+            "type": "transcription",
+            "transcript": transcript,
+            "isFinal": is_final,
+            "confidence": confidence,
+            "sessionId": self.session_id,
+        }
+        await self._send(message)
+        
+        # Fan out to viewers connected to this backend (interims are latest-wins)
+        caption_hub.publish(self.session_id, message, replaceable=not is_final)
+        
+        # Publish to Firebase Realtime DB (queued, never blocks)
+        cleared = {}
+        if self.interim_captions is not None:
+            if not is_final:
+                self.interim_captions.update(transcript)
+            else:
+                cleared = self.interim_captions.clear()
+        # Timed against the lecture, so the transcript, cues, players and
+        # the spooled recording line up
+        end_ms = None
+        if result.result_end_offset:
+            end_ms = self._lecture_ms(upstream, result.result_end_offset, end=True)
+        if not is_final and self.cue_track is not None:
+            self.cue_track.update_interim(transcript, end_ms)
+        if is_final and transcript.strip():
+            # The blanked interim goes out in the same write as the final
+            await firebase_client.publish_caption(self.session_id, transcript, cleared)
+            timings = self._word_timings(upstream, words)
+            if self.transcript_log is not None:
+                self._log_final(transcript, timings, end_ms)
+            if self.cue_track is not None:
+                self.cue_track.add_final(transcript, timings, end_ms)
+        elif cleared:
+            firebase_client.publisher.enqueue(cleared)
+    
+    async def _send_stats(self):
+        """Session summary for the lecturer: VAD savings and upstream message rate"""
+        stats = {"type": "stats"}
+        if self.vad is not None:
+            suppressed = self.vad.suppressed_percent
+            logger.info(f"📉 Session {self.session_id}: {suppressed:.1f}% of audio suppressed by VAD")
+            stats["audioSuppressedPercent"] = round(suppressed, 1)
+        if self.framer is not None and self.started_at is not None:
+            elapsed = max(time.monotonic() - self.started_at, 1e-3)
+            rate_in = self.framer.chunks_in / elapsed
+            rate_upstream = self._upstream_chunks / elapsed
+            logger.info(
+                f"📦 Session {self.session_id}: {rate_in:.1f} client messages/s framed into "
+                f"{rate_upstream:.1f} upstream messages/s"
+            )
+            stats["messagesPerSecondIn"] = round(rate_in, 1)
+            stats["messagesPerSecondUpstream"] = round(rate_upstream, 1)
+        if len(stats) > 1:
+            stats["sessionId"] = self.session_id
+            await self._send_json(stats)
     
     async def send_audio(self, audio_bytes: bytes):
-        """Queue audio data for streaming"""
-        await self.audio_queue.put(audio_bytes)
+        """Queue audio data for streaming (silence is dropped by the VAD)"""
+        self.chunks_received += 1
+        audio_messages.inc(1, "in")
+        with ingest_tracer.span(self.chunks_received):
+            self.bytes_received += len(audio_bytes)
+            audio_received_bytes.inc(len(audio_bytes))
+            if self.resampler is not None:
+                audio_bytes = self.resampler.process(audio_bytes)
+            if not audio_bytes:
+                return
+            if self.spool is not None:
+                self.spool.write(audio_bytes)
+            suspend = False
+            if self.vad is not None:
+                gated = self.vad.process(audio_bytes)
+                audio_bytes, suspend = gated.audio, gated.suspend
+            frames = [audio_bytes] if audio_bytes else []
+            if self.framer is not None:
+                frames = self.framer.push(audio_bytes) if audio_bytes else []
+                # Nothing more is coming before a suspend; a stalled partial
+                # frame goes out once it has waited max-hold
+                if suspend or self.framer.due():
+                    frames.append(self.framer.flush())
+            self._queueing_frames = True
+            try:
+                for frame in frames:
+                    if frame:
+                        await self._queue_audio(frame)
+            finally:
+                self._queueing_frames = False
+            if self.framer is not None:
+                self._schedule_held_release()
+            if suspend:
+                self.audio_queue.put_control(_SUSPEND)
+    
+    async def _queue_audio(self, audio_bytes: bytes):
+        started = time.monotonic()
+        dropped = await self.audio_queue.put(audio_bytes)
+        waited = time.monotonic() - started
+        if dropped or waited > 0.1:
+            await self._report_overload(waited)
+    
+    def _schedule_held_release(self):
+        """Make sure a partial frame goes out within max-hold if no audio follows"""
+        if self.framer.held_bytes and self._hold_timer is None:
+            self._hold_timer = asyncio.get_running_loop().call_later(
+                self.framer.hold_remaining(), self._release_held_frame
+            )
+    
+    def _release_held_frame(self, force: bool = False):
+        """Queue the partial frame once it is due (or at once with `force`)"""
+        if self._hold_timer is not None:
+            self._hold_timer.cancel()
+            self._hold_timer = None
+        if self._queueing_frames:
+            return  # Frames ahead of it are still being queued; send_audio reschedules
+        if not force and not self.framer.due():
+            self._schedule_held_release()
+            return
+        if (
+            not force
+            and self.audio_queue.policy is OverloadPolicy.BLOCK
+            and not self.audio_queue.has_room(self.framer.held_bytes)
+        ):
+            # Backlogged: the held audio can wait for the next chunk
+            self._schedule_held_release()
+            return
+        held = self.framer.flush()
+        if held:
+            # At the end of the stream nothing follows it: queue it past the bound
+            self.audio_queue.put_nowait(held, force=force)
+    
+    async def _report_overload(self, waited: float):
+        """Tell the client we are shedding or pausing audio (at most once a second)"""
+        now = time.monotonic()
+        if now - self._overload_reported_at < 1.0:
+            return
+        self._overload_reported_at = now
+        queued_ms = 1000 * self.audio_queue.pending_bytes / self.bytes_per_second
+        dropped_ms = 1000 * self.audio_queue.dropped_bytes / self.bytes_per_second
+        logger.warning(
+            f"⚠️  Session {self.session_id} overloaded ({self.audio_queue.policy.value}): "
+            f"{queued_ms:.0f} ms queued, {dropped_ms:.0f} ms dropped"
+        )
+        await self._send_json({
+            "type": "overload",
+            "policy": self.audio_queue.policy.value,
+            "queuedMs": round(queued_ms),
+            "droppedMs": round(dropped_ms),
+            "pausedMs": round(waited * 1000),
+            "sessionId": self.session_id,
+        })
+    
+    def session_info(self, resumed: bool) -> dict:
+        """First message on every connection: how to resume and where to resume from"""
+        return {
+            "type": "session",
+            "sessionId": self.session_id,
+            "resumeToken": self.resume_token,
+            "resumed": resumed,
+            "nextSeq": self.chunks_received,
+            "encoding": self.encoding,
+            "graceSeconds": sessions.grace_seconds,
+        }
+    
+    async def attach(self, websocket: WebSocket, protocol: str = PROTOCOL_JSON):
+        """Continue the session on a reconnected WebSocket"""
+        self.websocket = websocket
+        self.encoder = None
+        if protocol == PROTOCOL_COMPACT:
+            self.encoder = CompactEncoder(resync_every=settings.COMPACT_RESYNC_EVERY)
+        await self._send(self.session_info(resumed=True))
+        # Finals recognized while the lecturer was away
+        held = list(self._held)
+        self._held.clear()
+        for message in held:
+            await self._send(message)
+    
+    def detach(self):
+        """The lecturer's WebSocket dropped; keep streaming what was received"""
+        self.websocket = None
     
     async def stop(self):
         """Stop streaming"""
         self.is_streaming = False
+        if self.framer is not None:
+            self._release_held_frame(force=True)
+        # Wake the pump so it half-closes the upstream stream
+        self.audio_queue.put_control(None)
         logger.info(f"🛑 Stopped streaming for session: {self.session_id}")
 
 
+def _session_ended(stream: TranscriptionStream):
+    sessions.remove(stream.resume_token)
+    admission.release()
+
+
+async def _reject(websocket: WebSocket, session_id: str, reason: str):
+    """Turn a new lecture away at once instead of degrading the ones running"""
+    logger.warning(f"🚫 Rejecting session {session_id}: {reason} ({admission.active} streams active)")
+    message = {
+        "type": "rejected",
+        "reason": reason,
+        "retryAfterMs": settings.ADMISSION_RETRY_AFTER_MS,
+        "sessionId": session_id,
+    }
+    if settings.ADMISSION_REDIRECT_URL:
+        message["redirect"] = f"{settings.ADMISSION_REDIRECT_URL.rstrip('/')}/ws/transcribe/{session_id}"
+    try:
+        await websocket.send_json(message)
+        await websocket.close(code=1013)  # Try again later
+    except Exception:
+        pass
+
+
+async def drain_streams(timeout: float) -> int:
+    """
+    Finalize every live lecture before shutdown: tell the lecturer, then
+    half-close the upstream stream so Speech flushes its last finals.
+    
+    Returns:
+        Streams that had not finished when the timeout ran out
+    """
+    streams = list(_active_streams)
+    for stream in streams:
+        await stream._send_json({"type": "draining", "sessionId": stream.session_id})
+        await stream.stop()
+    tasks = [stream.task for stream in streams if stream.task is not None and not stream.task.done()]
+    if not tasks:
+        return 0
+    _, pending = await asyncio.wait(tasks, timeout=timeout)
+    return len(pending)
+
+
 @router.websocket("/ws/transcribe/{session_id}")
-async def websocket_transcribe(websocket: WebSocket, session_id: str):
+async def websocket_transcribe(
+    websocket: WebSocket,
+    session_id: str,
+    protocol: str = PROTOCOL_JSON,
+    resume: Optional[str] = None,
+    encoding: str = ENCODING_LINEAR16,
+):
     """
     WebSocket endpoint for real-time speech transcription.
     
     Flow:
-    1. Client connects and starts sending audio chunks
-    2. Server streams audio to Google Speech-to-Text V2 via gRPC
+    1. Client connects and gets {"type": "session", "resumeToken": ..., "nextSeq": 0}
+    2. Client sends audio chunks; the server streams them to the recognizer
+       (Google Speech-to-Text V2 via gRPC by default) and acknowledges them with
+       {"type": "ack", "nextSeq": n} every few chunks
     3. Interim and final results are sent back to client via WebSocket
     4. Client sends {"command": "stop"} to end streaming
+    
+    If the connection drops, the session keeps running for
+    SESSION_RESUME_GRACE_SECONDS. Reconnecting with `?resume=<token>`
+    continues it: the session message carries the `nextSeq` the client
+    resends from, followed by any finals it missed.
+    
+    If Speech turns the session away (quota, outage) and RECOGNIZER_FALLBACK
+    is set, the session continues on that backend and the client gets
+    {"type": "recognizer", "backend": ...}.
+    
+    Audio is raw 48 kHz LINEAR16 by default; `?encoding=webm-opus` or
+    `?encoding=ogg-opus` accepts MediaRecorder output instead (see
+    app.opus_stream). Results are JSON text frames by default;
+    `?protocol=compact` switches to binary MessagePack frames with
+    delta-encoded interims (see app.protocol).
     """
     await websocket.accept()
+    session_context.set(session_id)
     
-    logger.info(f"🔌 WebSocket connected: {session_id}")
+    if encoding not in ENCODINGS:
+        logger.warning(f"⚠️  Unsupported audio encoding '{encoding}' requested by {session_id}")
+        await websocket.send_json({
+            "type": "error",
+            "message": f"Unsupported encoding '{encoding}', expected one of: {', '.join(ENCODINGS)}",
+        })
+        await websocket.close(code=1003)
+        return
     
-    stream = TranscriptionStream(websocket, session_id)
+    if protocol not in (PROTOCOL_JSON, PROTOCOL_COMPACT):
+        logger.warning(f"⚠️  Unknown protocol '{protocol}' requested by {session_id}, using JSON")
+        protocol = PROTOCOL_JSON
     
-    try:
+    stream = sessions.resume(session_id, resume) if resume else None
+    if stream is not None:
+        previous = stream.websocket
+        await stream.attach(websocket, protocol)
+        if previous is not None:
+            # Half-open old connection: this one takes over
+            try:
+                await previous.close()
+            except Exception:
+                pass
+        logger.info(f"🔄 WebSocket resumed: {session_id} ({protocol}) at chunk {stream.chunks_received}")
+    else:
+        if resume:
+            logger.info(f"⚠️  Resume token for {session_id} unknown or expired, starting a new session")
+        rejected = admission.try_admit()
+        if rejected:
+            await _reject(websocket, session_id, rejected)
+            return
+        logger.info(f"🔌 WebSocket connected: {session_id} ({protocol}, {encoding})")
+        try:
+            stream = TranscriptionStream(websocket, session_id, protocol=protocol, encoding=encoding)
+        except ValueError as e:
+            admission.release()
+            logger.warning(f"⚠️  Cannot start session {session_id}: {str(e)}")
+            await websocket.send_json({"type": "error", "message": str(e)})
+            await websocket.close(code=1003)
+            return
+        except BaseException:
+            admission.release()
+            raise
+        stream.resume_token = sessions.register(session_id, stream)
         # Start streaming in background
-        streaming_task = asyncio.create_task(stream.start())
-        
+        stream.task = asyncio.create_task(stream.start())
+        stream.task.add_done_callback(lambda _: _session_ended(stream))
+        await stream._send(stream.session_info(resumed=False))
+    
+    try:
         # Receive audio from frontend
         while True:
             data = await websocket.receive()
             
-            if "bytes" in data:
+            if data["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(data.get("code", 1000))
+            if "bytes" in data and data["bytes"] is not None:
                 # Received audio chunk
                 await stream.send_audio(data["bytes"])
-            elif "text" in data:
+                if stream.chunks_received % settings.SESSION_ACK_EVERY_CHUNKS == 0:
+                    await stream._send({"type": "ack", "nextSeq": stream.chunks_received})
+            elif "text" in data and data["text"] is not None:
                 message = json.loads(data["text"])
                 if message.get("command") == "stop":
                     break
         
         await stream.stop()
-        await streaming_task
+        await stream.task
         
     except WebSocketDisconnect:
-        logger.info(f"🔌 WebSocket disconnected: {session_id}")
-        await stream.stop()
+        if stream.websocket is websocket:
+            logger.info(f"🔌 WebSocket disconnected: {session_id}, holding session for resume")
+            stream.detach()
+            sessions.detach(stream.resume_token, stream.stop)
     except Exception as e:
         logger.error(f"❌ WebSocket error: {str(e)}", exc_info=True)
-        await stream.stop()
+        if stream.websocket is websocket:
+            await stream.stop()
     finally:
         logger.info(f"🔚 WebSocket closed: {session_id}")
+
+
+@router.websocket("/ws/captions/{session_id}")
+async def websocket_captions(websocket: WebSocket, session_id: str):
+    """
+    WebSocket endpoint for students watching a session's captions.
+    
+    Interim and final results are pushed as the same
+    {"type": "transcription", ...} messages the lecturer receives.
+    """
+    await websocket.accept()
+    session_context.set(session_id)
+    subscriber = caption_hub.subscribe(session_id)
+    logger.info(f"👀 Viewer joined {session_id} ({caption_hub.subscriber_count(session_id)} watching)")
+    
+    async def forward():
+        while True:
+            payload = await subscriber.get()
+            if payload is None:
+                return
+            await websocket.send_text(payload)
+    
+    sender = asyncio.create_task(forward())
+    try:
+        # Viewers don't send anything; this only notices the disconnect
+        while True:
+            data = await websocket.receive()
+            if data["type"] == "websocket.disconnect":
+                break
+    except WebSocketDisconnect:
+        pass
+    finally:
+        caption_hub.unsubscribe(subscriber)
+        sender.cancel()
+        logger.info(f"👋 Viewer left {session_id} ({subscriber.dropped} messages dropped)")
@@ -0,0 +1,98 @@
+"""
+Upstream message rate with and without re-framing client audio.
+
+Streams a lecture through TranscriptionStream at several client chunk sizes
+(an AudioWorklet's 128 samples up to MediaRecorder-style 250 ms slices) and
+reports messages per second of audio from the client and to the recognizer,
+plus server CPU, with AUDIO_FRAME_MS off and on.
+
+Usage:
+    python benchmarks/bench_framing.py [--seconds 60] [--frame-ms 100]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+for name, value in (
+    ("GCP_PROJECT_ID", "bench"),
+    ("FIREBASE_DATABASE_URL", "https://bench.firebaseio.com"),
+    ("FIREBASE_PROJECT_ID", "bench"),
+    ("ALLOWED_ORIGINS", "http://localhost"),
+):
+    os.environ.setdefault(name, value)
+
+from app.config import settings  # noqa: E402
+from app.websocket import TranscriptionStream  # noqa: E402
+
+
+class CountingRecognizer:
+    def __init__(self):
+        self.messages = 0
+
+    def streaming_recognize(self, requests):
+        for request in requests:
+            if request.audio:
+                self.messages += 1
+        return iter(())
+
+
+class NullWebSocket:
+    async def send_json(self, data):
+        pass
+
+
+def lecture_pcm(seconds: float, sample_rate: int) -> bytes:
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    signal = 6000 * (0.55 + 0.45 * np.sin(2 * np.pi * 4 * t)) * np.sin(2 * np.pi * 180 * t)
+    return signal.astype(np.int16).tobytes()
+
+
+async def run_stream(pcm: bytes, chunk_bytes: int) -> CountingRecognizer:
+    recognizer = CountingRecognizer()
+    stream = TranscriptionStream(NullWebSocket(), "bench-framing", client=recognizer)
+    stream.interim_captions = None
+    task = asyncio.create_task(stream.start())
+    for i in range(0, len(pcm), chunk_bytes):
+        await stream.send_audio(pcm[i:i + chunk_bytes])
+    await stream.stop()
+    await task
+    return recognizer
+
+
+def bench(label: str, pcm: bytes, chunk_bytes: int, seconds: float, frame_ms: int) -> None:
+    settings.AUDIO_FRAME_MS = frame_ms
+    cpu_start = time.process_time()
+    recognizer = asyncio.run(run_stream(pcm, chunk_bytes))
+    cpu = time.process_time() - cpu_start
+    chunks = -(-len(pcm) // chunk_bytes)
+    print(
+        f"{label:>12} | framing {'off' if frame_ms == 0 else f'{frame_ms} ms':>6} | "
+        f"{chunks / seconds:7.1f} msgs/s in | {recognizer.messages / seconds:7.1f} msgs/s upstream | "
+        f"CPU {1000 * cpu / seconds:6.2f} ms per audio second"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=60.0, help="Audio per run")
+    parser.add_argument("--frame-ms", type=int, default=100, help="Upstream frame duration when framing is on")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+    settings.VAD_ENABLED = False  # Count every message, not just speech
+
+    rate = settings.SPEECH_SAMPLE_RATE
+    pcm = lecture_pcm(args.seconds, rate)
+    for label, samples in (("128 samples", 128), ("20 ms", rate // 50), ("100 ms", rate // 10), ("250 ms", rate // 4)):
+        for frame_ms in (0, args.frame_ms):
+            bench(label, pcm, samples * 2, args.seconds, frame_ms)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Server CPU per lecturer stream for each audio ingestion mode.
+
+Drives TranscriptionStream with a recognizer that just drains its requests,
+so the numbers cover everything the backend does per chunk: resampling and
+VAD for PCM, container scanning for Opus, queueing, the replay buffer and
+the gRPC thread bridge. Also reports the uplink each mode needs.
+
+Usage:
+    python benchmarks/bench_ingest.py [--seconds 120] [--chunk-ms 100]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+for name, value in (
+    ("GCP_PROJECT_ID", "bench"),
+    ("FIREBASE_DATABASE_URL", "https://bench.firebaseio.com"),
+    ("FIREBASE_PROJECT_ID", "bench"),
+    ("ALLOWED_ORIGINS", "http://localhost"),
+):
+    os.environ.setdefault(name, value)
+
+from app.config import settings  # noqa: E402
+from app.websocket import TranscriptionStream  # noqa: E402
+from tests.opus_fixtures import ogg_opus, split, webm_opus  # noqa: E402
+
+
+class DrainingRecognizer:
+    def streaming_recognize(self, requests):
+        for _ in requests:
+            pass
+        return iter(())
+
+
+class NullWebSocket:
+    async def send_json(self, data):
+        pass
+
+    async def send_bytes(self, data):
+        pass
+
+
+def lecture_pcm(seconds: float, sample_rate: int) -> bytes:
+    """Speech-like signal: a voiced tone with syllable-rate modulation and pauses"""
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    envelope = np.clip(np.sin(2 * np.pi * 0.2 * t) + 0.3, 0, None) * (0.55 + 0.45 * np.sin(2 * np.pi * 4 * t))
+    signal = 6000 * envelope * (np.sin(2 * np.pi * 180 * t) + 0.5 * np.sin(2 * np.pi * 360 * t))
+    return signal.astype(np.int16).tobytes()
+
+
+async def run_stream(encoding: str, chunks) -> TranscriptionStream:
+    stream = TranscriptionStream(NullWebSocket(), f"bench-{encoding}", client=DrainingRecognizer(), encoding=encoding)
+    stream.interim_captions = None
+    task = asyncio.create_task(stream.start())
+    for chunk in chunks:
+        await stream.send_audio(chunk)
+    await stream.stop()
+    await task
+    return stream
+
+
+def bench(encoding: str, chunks, seconds: float) -> None:
+    cpu_start = time.process_time()
+    stream = asyncio.run(run_stream(encoding, chunks))
+    cpu = time.process_time() - cpu_start
+    uplink_kbps = stream.bytes_received * 8 / seconds / 1000
+    upstream_kbps = stream.bytes_upstream * 8 / seconds / 1000
+    print(
+        f"{encoding:>10} | CPU {1000 * cpu / seconds:6.2f} ms per audio second "
+        f"({100 * cpu / seconds:5.2f}% of a core per stream) | "
+        f"uplink {uplink_kbps:6.1f} kbps | to Speech {upstream_kbps:6.1f} kbps"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=120.0, help="Audio per run")
+    parser.add_argument("--chunk-ms", type=int, default=100, help="Audio per WebSocket message")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)  # Running flat out trips the overload warnings
+
+    pcm = lecture_pcm(args.seconds, settings.SPEECH_SAMPLE_RATE)
+    pcm_chunk = settings.SPEECH_SAMPLE_RATE * 2 * args.chunk_ms // 1000
+    webm = webm_opus(args.seconds)
+    ogg = ogg_opus(args.seconds)
+    # MediaRecorder with a timeslice delivers about chunk-ms of audio per event
+    per_chunk = lambda data: max(1, len(data) * args.chunk_ms // int(args.seconds * 1000))
+
+    bench("linear16", split(pcm, pcm_chunk), args.seconds)
+    bench("webm-opus", split(webm, per_chunk(webm)), args.seconds)
+    bench("ogg-opus", split(ogg, per_chunk(ogg)), args.seconds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Event loop time per log record for the interim-result log line.
+
+Compares what the calling thread pays for:
+  - direct: the old setup, an f-string formatted and written to stderr by
+    a StreamHandler on the calling thread
+  - queued: %-style record handed to the log writer thread (JSON formatting
+    and the write happen there)
+  - sampled out: an interim the per-session sampler suppresses
+
+Each runs twice: writing to stderr, and to a sink that takes --stall-ms
+per write (stdout piped to a collector that has fallen behind). Direct
+logging waits for the sink on every record; queued logging doesn't.
+
+Usage:
+    python benchmarks/bench_logging.py [--records 20000] [--stall-ms 0.5] 2>/dev/null
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+os.environ.setdefault("GCP_PROJECT_ID", "bench")
+os.environ.setdefault("FIREBASE_DATABASE_URL", "https://bench.firebaseio.com")
+os.environ.setdefault("FIREBASE_PROJECT_ID", "bench")
+os.environ.setdefault("ALLOWED_ORIGINS", "http://localhost")
+
+from app.logs import EventSampler, configure_logging, session_context, stop_logging  # noqa: E402
+
+TRANSCRIPT = "habari za asubuhi, leo tutajifunza kuhusu"
+
+
+class StalledStream:
+    def __init__(self, stall_seconds: float):
+        self.stall_seconds = stall_seconds
+
+    def write(self, text: str) -> None:
+        time.sleep(self.stall_seconds)
+
+    def flush(self) -> None:
+        pass
+
+
+def reset_root() -> logging.Logger:
+    stop_logging()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    return root
+
+
+def direct(records: int, stream=None) -> float:
+    root = reset_root()
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+    root.addHandler(handler)
+    root.setLevel(logging.INFO)
+    logger = logging.getLogger("app.websocket")
+    started = time.perf_counter()
+    for i in range(records):
+        logger.info(f"📝 Interim: {TRANSCRIPT} {i}")
+    return time.perf_counter() - started
+
+
+def queued(records: int, stream=None) -> float:
+    reset_root()
+    configure_logging("INFO", json_format=True, queue_size=records + 1, stream=stream)
+    logger = logging.getLogger("app.websocket")
+    started = time.perf_counter()
+    for i in range(records):
+        logger.info("📝 Interim: %s %d", TRANSCRIPT, i, extra={"event": "interim", "suppressed": 0})
+    elapsed = time.perf_counter() - started
+    stop_logging()  # Writer catches up outside the timed section
+    return elapsed
+
+
+def sampled_out(records: int, stream=None) -> float:
+    reset_root()
+    configure_logging("INFO", json_format=True, stream=stream)
+    logger = logging.getLogger("app.websocket")
+    sampler = EventSampler(rate_per_second=1.0, burst=1)
+    started = time.perf_counter()
+    for i in range(records):
+        if sampler.allow():
+            logger.info("📝 Interim: %s %d", TRANSCRIPT, i, extra={"event": "interim", "suppressed": sampler.take_suppressed()})
+    elapsed = time.perf_counter() - started
+    stop_logging()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=20000, help="Records per run")
+    parser.add_argument("--stall-ms", type=float, default=0.5, help="Time the stalled sink takes per write")
+    args = parser.parse_args()
+    session_context.set("bench-lecture")
+
+    runs = (("direct", direct), ("queued", queued), ("sampled out", sampled_out))
+    for sink, stream in (("stderr", None), (f"stalled {args.stall_ms} ms", StalledStream(args.stall_ms / 1000))):
+        # Keep the stalled runs short (the direct run sleeps for every record)
+        records = args.records if stream is None else min(args.records, 1000)
+        results = [(name, run(records, stream)) for name, run in runs]
+        reset_root()
+        for name, elapsed in results:
+            print(f"{sink:>16} | {name:>12} | {1e6 * elapsed / records:8.2f} µs per record on the calling thread")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Micro-benchmark for the incoming PCM conditioning stage.
+
+Reports per-chunk CPU cost of StreamingResampler and the upstream bytes it
+saves per classroom-hour.
+
+Usage:
+    python benchmarks/bench_resampler.py [--chunk-ms 100] [--iterations 2000]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.resampler import StreamingResampler  # noqa: E402
+
+SECONDS_PER_HOUR = 3600
+
+
+def bench(input_rate: int, channels: int, output_rate: int, chunk_ms: int, iterations: int) -> None:
+    rng = np.random.default_rng(0)
+    samples = int(input_rate * chunk_ms / 1000) * channels
+    chunk = (rng.standard_normal(samples) * 3000).astype(np.int16).tobytes()
+    resampler = StreamingResampler(input_rate, output_rate, channels=channels)
+    
+    resampler.process(chunk)  # Warm up
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    out_bytes = 0
+    for _ in range(iterations):
+        out_bytes += len(resampler.process(chunk))
+    cpu = time.process_time() - cpu_start
+    wall = time.perf_counter() - wall_start
+    
+    per_chunk_us = wall / iterations * 1e6
+    audio_seconds = iterations * chunk_ms / 1000
+    in_per_hour = len(chunk) * iterations / audio_seconds * SECONDS_PER_HOUR
+    out_per_hour = out_bytes / audio_seconds * SECONDS_PER_HOUR
+    print(
+        f"{input_rate:>6} Hz x{channels} -> {output_rate} Hz | "
+        f"{per_chunk_us:7.1f} us/chunk ({chunk_ms} ms) | "
+        f"CPU {100 * cpu / audio_seconds:5.3f}% of real time | "
+        f"{in_per_hour / 1e6:6.1f} MB/h -> {out_per_hour / 1e6:6.1f} MB/h "
+        f"(saves {(in_per_hour - out_per_hour) / 1e6:6.1f} MB per classroom-hour)"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunk-ms", type=int, default=100)
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+    
+    for input_rate, channels in ((48000, 1), (48000, 2), (44100, 1)):
+        bench(input_rate, channels, 16000, args.chunk_ms, args.iterations)
+
+
+if __name__ == "__main__":
+    main()
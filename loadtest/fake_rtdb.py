@@ -0,0 +1,70 @@
+"""
+Local stand-in for the Firebase Realtime Database REST API.
+
+Point the Admin SDK at it with FIREBASE_DATABASE_EMULATOR_HOST=127.0.0.1:<port>;
+every write is accepted and counted.
+"""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeRealtimeDatabase:
+    def __init__(self):
+        self.writes = 0
+        self.paths = 0
+        self.bytes = 0
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def address(self) -> str:
+        return f"127.0.0.1:{self._server.server_address[1]}"
+
+    def start(self) -> "FakeRealtimeDatabase":
+        database = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _write(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                try:
+                    paths = len(json.loads(body or b"{}"))
+                except ValueError:
+                    paths = 0
+                with database._lock:
+                    database.writes += 1
+                    database.paths += paths
+                    database.bytes += len(body)
+                if "print=silent" in self.path:
+                    self.send_response(204)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self._reply(body)
+
+            def _reply(self, body: bytes):
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            do_PATCH = do_PUT = do_POST = _write
+
+            def do_GET(self):
+                self._reply(b"null")
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
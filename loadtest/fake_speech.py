@@ -0,0 +1,114 @@
+"""
+Local stand-in for the Speech V2 StreamingRecognize RPC.
+
+Serves `/google.cloud.speech.v2.Speech/StreamingRecognize` over plaintext
+gRPC and answers on a realistic cadence: an interim result every
+`interim_every` seconds of audio and a final every `final_every` seconds,
+after `processing_delay`. The last word of every transcript is `@<ms>`, the
+audio offset the result covers, so clients can measure caption latency.
+"""
+import datetime
+import threading
+import time
+from concurrent import futures
+
+import grpc
+from google.cloud.speech_v2.types import cloud_speech
+
+METHOD = "/google.cloud.speech.v2.Speech/StreamingRecognize"
+
+
+class FakeSpeechServer:
+    def __init__(
+        self,
+        interim_every: float = 0.5,
+        final_every: float = 3.0,
+        processing_delay: float = 0.05,
+        max_workers: int = 256,
+    ):
+        """
+        Args:
+            interim_every: Seconds of audio between interim results
+            final_every: Seconds of audio between final results
+            processing_delay: Time spent "recognizing" before each result
+            max_workers: Concurrent streams the server can hold
+        """
+        self.interim_every = interim_every
+        self.final_every = final_every
+        self.processing_delay = processing_delay
+        self.max_workers = max_workers
+        self.server = None
+        self.port = None
+        self.streams = 0
+        self.audio_bytes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def address(self) -> str:
+        return f"127.0.0.1:{self.port}"
+
+    def start(self) -> "FakeSpeechServer":
+        handler = grpc.method_handlers_generic_handler("google.cloud.speech.v2.Speech", {
+            "StreamingRecognize": grpc.stream_stream_rpc_method_handler(
+                self._streaming_recognize,
+                request_deserializer=cloud_speech.StreamingRecognizeRequest.deserialize,
+                response_serializer=cloud_speech.StreamingRecognizeResponse.serialize,
+            ),
+        })
+        self.server = grpc.server(futures.ThreadPoolExecutor(max_workers=self.max_workers))
+        self.server.add_generic_rpc_handlers((handler,))
+        self.port = self.server.add_insecure_port("127.0.0.1:0")
+        self.server.start()
+        return self
+
+    def stop(self) -> None:
+        if self.server is not None:
+            self.server.stop(grace=None)
+
+    def _result(self, words, end_seconds: float, is_final: bool):
+        marker = f"@{int(end_seconds * 1000)}"
+        return cloud_speech.StreamingRecognizeResponse(results=[
+            cloud_speech.StreamingRecognitionResult(
+                alternatives=[cloud_speech.SpeechRecognitionAlternative(
+                    transcript=" ".join(words + [marker]),
+                    confidence=0.9 if is_final else 0.0,
+                )],
+                is_final=is_final,
+                result_end_offset=datetime.timedelta(seconds=end_seconds),
+            )
+        ])
+
+    def _streaming_recognize(self, requests, context):
+        with self._lock:
+            self.streams += 1
+        bytes_per_second = 32000
+        received = 0
+        next_interim = self.interim_every
+        next_final = self.final_every
+        words = []
+        for request in requests:
+            if request.streaming_config:
+                config = request.streaming_config.config
+                if config.explicit_decoding_config.sample_rate_hertz:
+                    bytes_per_second = 2 * config.explicit_decoding_config.sample_rate_hertz
+                continue
+            if not request.audio:
+                continue
+            received += len(request.audio)
+            with self._lock:
+                self.audio_bytes += len(request.audio)
+            seconds = received / bytes_per_second
+            if seconds >= next_final:
+                time.sleep(self.processing_delay)
+                words.append(f"w{len(words)}")
+                yield self._result(words, seconds, is_final=True)
+                words = []
+                next_final += self.final_every
+                next_interim = seconds + self.interim_every
+            elif seconds >= next_interim:
+                time.sleep(self.processing_delay)
+                words.append(f"w{len(words)}")
+                yield self._result(words, seconds, is_final=False)
+                next_interim += self.interim_every
+        if words:
+            yield self._result(words, received / bytes_per_second, is_final=True)
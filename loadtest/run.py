@@ -0,0 +1,299 @@
+"""
+Load test for the streaming path.
+
+Starts a fake Speech server and a fake Realtime DB in this process, runs the
+backend under uvicorn in a subprocess pointed at them, and drives N simulated
+lecturers over /ws/transcribe/{session_id}, each sending 48 kHz PCM paced in
+real time. Reports caption latency percentiles (audio sent -> result
+received) and the backend's CPU and RSS per session.
+
+Usage:
+    python -m loadtest.run --sessions 50 --duration 60
+    python -m loadtest.run --sessions 20 --max-p95-ms 800   # exits 1 on regression
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+import websockets
+
+from loadtest.fake_rtdb import FakeRealtimeDatabase
+from loadtest.fake_speech import FakeSpeechServer
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+SAMPLE_RATE = 48000  # Audio the simulated lecturers send
+_MARKER = re.compile(r"@(\d+)$")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def process_usage(pid: int) -> Dict[str, float]:
+    """CPU seconds and resident memory of a process (Linux /proc)"""
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    cpu_seconds = (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+    rss_mb = 0.0
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                rss_mb = int(line.split()[1]) / 1024
+    return {"cpu_seconds": cpu_seconds, "rss_mb": rss_mb}
+
+
+def lecture_pcm(seconds: float, sample_rate: int = SAMPLE_RATE) -> bytes:
+    """Speech-like test signal: a voiced tone with syllable-rate amplitude modulation"""
+    import numpy as np
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    envelope = 0.55 + 0.45 * np.sin(2 * np.pi * 4 * t)
+    signal = 6000 * envelope * (np.sin(2 * np.pi * 180 * t) + 0.5 * np.sin(2 * np.pi * 360 * t))
+    return signal.astype(np.int16).tobytes()
+
+
+class Lecturer:
+    """One simulated lecturer streaming audio in real time"""
+    def __init__(self, url: str, session_id: str, audio: bytes, chunk_ms: int, sample_rate: int):
+        self.url = url
+        self.session_id = session_id
+        self.audio = audio
+        self.chunk_bytes = sample_rate * 2 * chunk_ms // 1000
+        self.chunk_seconds = chunk_ms / 1000
+        self.bytes_per_ms = sample_rate * 2 / 1000
+        self.sent_at: List[float] = []  # Send time of each chunk
+        self.interim_ms: List[float] = []
+        self.final_ms: List[float] = []
+        self.errors: List[str] = []
+        self.finished = asyncio.Event()  # The final covering the end of the audio arrived
+        self.audio_ms = len(audio) / self.bytes_per_ms
+
+    def _latency_ms(self, transcript: str) -> Optional[float]:
+        match = _MARKER.search(transcript)
+        if not match:
+            return None
+        # The chunk holding the last audio this result covers
+        chunk = max(0, math.ceil(int(match.group(1)) * self.bytes_per_ms / self.chunk_bytes) - 1)
+        if chunk >= len(self.sent_at):
+            return None
+        return (time.monotonic() - self.sent_at[chunk]) * 1000
+
+    async def _receive(self, websocket):
+        async for raw in websocket:
+            message = json.loads(raw)
+            if message.get("type") == "error":
+                self.errors.append(message.get("message", ""))
+            if message.get("type") != "transcription":
+                continue
+            latency = self._latency_ms(message["transcript"])
+            if latency is not None:
+                (self.final_ms if message["isFinal"] else self.interim_ms).append(latency)
+            match = _MARKER.search(message["transcript"])
+            if message["isFinal"] and match and int(match.group(1)) >= self.audio_ms - 1000 * self.chunk_seconds:
+                self.finished.set()
+
+    async def run(self):
+        async with websockets.connect(f"{self.url}/ws/transcribe/{self.session_id}", max_size=None) as websocket:
+            receiver = asyncio.create_task(self._receive(websocket))
+            started = time.monotonic()
+            for index, offset in enumerate(range(0, len(self.audio), self.chunk_bytes)):
+                # Real-time pacing without drift
+                delay = started + index * self.chunk_seconds - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                self.sent_at.append(time.monotonic())
+                await websocket.send(self.audio[offset:offset + self.chunk_bytes])
+            await websocket.send(json.dumps({"command": "stop"}))
+            try:
+                await asyncio.wait_for(self.finished.wait(), timeout=10.0)
+            except asyncio.TimeoutError:
+                self.errors.append("Timed out waiting for the last final")
+            receiver.cancel()
+
+
+async def wait_until_ready(url: str, process: subprocess.Popen, timeout: float = 30.0):
+    import httpx
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"Backend exited with code {process.returncode}")
+            try:
+                if (await client.get(f"{url}/health/ready")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError("Backend did not become ready in time")
+
+
+def start_backend(port: int, speech: FakeSpeechServer, database: FakeRealtimeDatabase, extra_env: Dict[str, str]):
+    """
+    Run the backend under uvicorn, pointed at the fake servers.
+
+    Returns:
+        (process, open log file, log path)
+    """
+    env = {
+        **os.environ,
+        "GCP_PROJECT_ID": os.environ.get("GCP_PROJECT_ID", "loadtest"),
+        "FIREBASE_DATABASE_URL": os.environ.get("FIREBASE_DATABASE_URL", "https://loadtest.firebaseio.com"),
+        "FIREBASE_PROJECT_ID": os.environ.get("FIREBASE_PROJECT_ID", "loadtest"),
+        "ALLOWED_ORIGINS": os.environ.get("ALLOWED_ORIGINS", "http://localhost"),
+        # The lecturers' rate, whatever .env says
+        "SPEECH_SAMPLE_RATE": str(SAMPLE_RATE),
+        "SPEECH_EMULATOR_HOST": speech.address,
+        "FIREBASE_DATABASE_EMULATOR_HOST": database.address,
+        **extra_env,
+    }
+    log_path = os.path.join(tempfile.gettempdir(), f"sauti-loadtest-{port}.log")
+    log = open(log_path, "w")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=REPO_ROOT, env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+    return process, log, log_path
+
+
+async def run_load(
+    sessions: int,
+    duration: float,
+    chunk_ms: int = 100,
+    ramp_seconds: float = 2.0,
+    vad: bool = False,
+    extra_env: Optional[Dict[str, str]] = None,
+) -> Dict:
+    """
+    Run one load test and return its summary.
+
+    Args:
+        sessions: Concurrent simulated lecturers
+        duration: Seconds of audio each lecturer streams
+        chunk_ms: Audio per WebSocket message
+        ramp_seconds: Lecturers connect evenly over this window
+        vad: Keep server-side VAD on (the test signal is continuous speech)
+        extra_env: Additional backend settings
+    """
+    speech = FakeSpeechServer().start()
+    database = FakeRealtimeDatabase().start()
+    port = free_port()
+    url = f"ws://127.0.0.1:{port}"
+    process, log, log_path = start_backend(port, speech, database, {
+        "VAD_ENABLED": "true" if vad else "false",
+        **(extra_env or {}),
+    })
+    try:
+        await wait_until_ready(f"http://127.0.0.1:{port}", process)
+        idle = process_usage(process.pid)
+
+        audio = lecture_pcm(duration)
+        lecturers = [Lecturer(url, f"load-{i}", audio, chunk_ms, SAMPLE_RATE) for i in range(sessions)]
+
+        async def start(lecturer: Lecturer, delay: float):
+            await asyncio.sleep(delay)
+            try:
+                await lecturer.run()
+            except Exception as e:
+                lecturer.errors.append(str(e))
+
+        peak_rss = idle["rss_mb"]
+
+        async def sample_rss():
+            nonlocal peak_rss
+            while True:
+                await asyncio.sleep(0.5)
+                peak_rss = max(peak_rss, process_usage(process.pid)["rss_mb"])
+
+        sampler = asyncio.create_task(sample_rss())
+        started = time.monotonic()
+        await asyncio.gather(*(
+            start(lecturer, ramp_seconds * i / max(1, sessions)) for i, lecturer in enumerate(lecturers)
+        ))
+        wall = time.monotonic() - started
+        sampler.cancel()
+        busy = process_usage(process.pid)
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        speech.stop()
+        database.stop()
+        log.close()
+
+    interim = [v for lecturer in lecturers for v in lecturer.interim_ms]
+    final = [v for lecturer in lecturers for v in lecturer.final_ms]
+    cpu = busy["cpu_seconds"] - idle["cpu_seconds"]
+    return {
+        "sessions": sessions,
+        "audioSeconds": duration,
+        "wallSeconds": round(wall, 2),
+        "interimLatencyMs": {p: round(percentile(interim, q), 1) for p, q in (("p50", 50), ("p95", 95), ("p99", 99))},
+        "finalLatencyMs": {p: round(percentile(final, q), 1) for p, q in (("p50", 50), ("p95", 95), ("p99", 99))},
+        "results": {"interim": len(interim), "final": len(final)},
+        "cpuPercentPerSession": round(100 * cpu / wall / sessions, 2),
+        "rssMb": {"idle": round(idle["rss_mb"], 1), "peak": round(peak_rss, 1)},
+        "rssMbPerSession": round((peak_rss - idle["rss_mb"]) / sessions, 2),
+        "speechStreams": speech.streams,
+        "firebaseWrites": database.writes,
+        "errors": [e for lecturer in lecturers for e in lecturer.errors],
+        "backendLog": log_path,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the streaming transcription path")
+    parser.add_argument("--sessions", type=int, default=10, help="Concurrent lecturers")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of audio per lecturer")
+    parser.add_argument("--chunk-ms", type=int, default=100, help="Audio per WebSocket message")
+    parser.add_argument("--ramp", type=float, default=2.0, help="Seconds over which lecturers connect")
+    parser.add_argument("--vad", action="store_true", help="Keep server-side VAD enabled")
+    parser.add_argument("--max-p95-ms", type=float, help="Fail if final-result p95 latency exceeds this")
+    parser.add_argument("--json", action="store_true", help="Print the summary as JSON only")
+    args = parser.parse_args()
+
+    summary = asyncio.run(run_load(args.sessions, args.duration, args.chunk_ms, args.ramp, args.vad))
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        print(f"Sessions: {summary['sessions']} x {summary['audioSeconds']:.0f}s audio ({summary['wallSeconds']}s wall)")
+        for kind in ("interimLatencyMs", "finalLatencyMs"):
+            stats = summary[kind]
+            print(f"{kind:>18}: p50 {stats['p50']} ms  p95 {stats['p95']} ms  p99 {stats['p99']} ms")
+        print(f"   CPU per session: {summary['cpuPercentPerSession']}% of a core")
+        print(f"   RSS per session: {summary['rssMbPerSession']} MB (idle {summary['rssMb']['idle']} MB, peak {summary['rssMb']['peak']} MB)")
+        print(f"   Firebase writes: {summary['firebaseWrites']}, Speech streams: {summary['speechStreams']}")
+        if summary["errors"]:
+            print(f"   Errors: {len(summary['errors'])} (first: {summary['errors'][0]})")
+            print(f"   Backend log: {summary['backendLog']}")
+
+    failed = bool(summary["errors"])
+    if args.max_p95_ms is not None and not summary["finalLatencyMs"]["p95"] <= args.max_p95_ms:
+        print(f"❌ Final p95 latency {summary['finalLatencyMs']['p95']} ms exceeds {args.max_p95_ms} ms")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Minimal Redis stand-in for tests: speaks RESP over TCP and implements the
+pub/sub subset the caption broker uses (PUBLISH, SUBSCRIBE, UNSUBSCRIBE,
+AUTH, PING).
+"""
+import asyncio
+from app.broker import encode_command, read_reply
+
+
+def bulk(value: bytes) -> bytes:
+    return b"$%d\r\n%s\r\n" % (len(value), value)
+
+
+class FakeRedisServer:
+    def __init__(self):
+        self.channels = {}  # channel -> set of writers
+        self.commands = []  # Command names in arrival order
+        self.auth = []  # AUTH arguments of each connection that sent one
+        self.reads = 0  # Socket reads that carried PUBLISH commands
+        self.server = None
+        self.port = None
+    
+    @property
+    def url(self) -> str:
+        return f"redis://127.0.0.1:{self.port}/0"
+    
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+    
+    async def close(self):
+        self.server.close()
+        await self.server.wait_closed()
+    
+    def subscriber_count(self, channel: str) -> int:
+        return len(self.channels.get(channel.encode(), ()))
+    
+    async def _handle(self, reader, writer):
+        subscribed = set()
+        try:
+            while True:
+                command = await read_reply(reader)
+                name = command[0].upper()
+                self.commands.append(name.decode())
+                if name == b"AUTH":
+                    self.auth.append([argument.decode() for argument in command[1:]])
+                    writer.write(b"+OK\r\n")
+                elif name == b"PUBLISH":
+                    channel, message = command[1], command[2]
+                    receivers = self.channels.get(channel, set())
+                    for receiver in receivers:
+                        receiver.write(b"*3\r\n" + bulk(b"message") + bulk(channel) + bulk(message))
+                    writer.write(b":%d\r\n" % len(receivers))
+                elif name == b"SUBSCRIBE":
+                    for channel in command[1:]:
+                        self.channels.setdefault(channel, set()).add(writer)
+                        subscribed.add(channel)
+                        writer.write(b"*3\r\n" + bulk(b"subscribe") + bulk(channel) + b":%d\r\n" % len(subscribed))
+                elif name == b"UNSUBSCRIBE":
+                    for channel in command[1:]:
+                        self.channels.get(channel, set()).discard(writer)
+                        subscribed.discard(channel)
+                        writer.write(b"*3\r\n" + bulk(b"unsubscribe") + bulk(channel) + b":%d\r\n" % len(subscribed))
+                else:
+                    writer.write(b"+OK\r\n" if name != b"PING" else b"+PONG\r\n")
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            for channel in subscribed:
+                self.channels.get(channel, set()).discard(writer)
+            writer.close()
@@ -0,0 +1,53 @@
+"""Offline stand-in for a Vosk KaldiRecognizer"""
+import json
+import threading
+
+
+class FakeKaldiEngine:
+    """
+    Each audio chunk decodes to one word: its text up to the first NUL byte.
+    A word ending in "." closes the utterance (the engine's endpoint).
+    """
+    def __init__(self, sample_rate: int):
+        self.sample_rate = sample_rate
+        self.fed = 0
+        self.words = []
+        self.threads = set()  # Threads decoding ran on
+
+    def _seconds(self, position: int) -> float:
+        return position / 2 / self.sample_rate
+
+    def AcceptWaveform(self, data: bytes) -> bool:
+        self.threads.add(threading.current_thread().name)
+        start = self._seconds(self.fed)
+        self.fed += len(data)
+        text = bytes(data).split(b"\0")[0].decode()
+        if text:
+            self.words.append({
+                "word": text.rstrip("."), "start": start, "end": self._seconds(self.fed), "conf": 0.8,
+            })
+        return text.endswith(".")
+
+    def _take(self) -> str:
+        words, self.words = self.words, []
+        return json.dumps({"text": " ".join(word["word"] for word in words), "result": words})
+
+    def Result(self) -> str:
+        return self._take()
+
+    def FinalResult(self) -> str:
+        return self._take()
+
+    def PartialResult(self) -> str:
+        return json.dumps({"partial": " ".join(word["word"] for word in self.words)})
+
+
+class FakeKaldiFactory:
+    """engine_factory for LocalRecognizer that remembers what it built"""
+    def __init__(self):
+        self.engines = []
+
+    def __call__(self, sample_rate: int) -> FakeKaldiEngine:
+        engine = FakeKaldiEngine(sample_rate)
+        self.engines.append(engine)
+        return engine
@@ -0,0 +1,87 @@
+"""
+Synthetic WebM and Ogg Opus streams for tests and benchmarks.
+
+The Opus packets are placeholders with a valid TOC byte (20 ms CELT
+fullband frames at ~32 kbps), which is all the container scanners look at.
+"""
+from typing import List
+
+OPUS_PACKET = bytes([0xF8]) + b"\x55" * 79
+FRAME_MS = 20
+
+
+def ebml_id(element_id: int) -> bytes:
+    return element_id.to_bytes((element_id.bit_length() + 7) // 8, "big")
+
+
+def ebml_size(size: int) -> bytes:
+    for length in range(1, 9):
+        if size < (1 << (7 * length)) - 1:
+            return (size | (1 << (7 * length))).to_bytes(length, "big")
+    raise ValueError("Element too large")
+
+
+UNKNOWN_SIZE = b"\x01\xff\xff\xff\xff\xff\xff\xff"
+
+
+def element(element_id: int, payload: bytes) -> bytes:
+    return ebml_id(element_id) + ebml_size(len(payload)) + payload
+
+
+def uint(value: int) -> bytes:
+    return value.to_bytes(max(1, (value.bit_length() + 7) // 8), "big")
+
+
+def webm_header() -> bytes:
+    """EBML header, live Segment (unknown size), Info and an Opus track"""
+    return (
+        element(0x1A45DFA3, element(0x4282, b"webm"))
+        + ebml_id(0x18538067) + UNKNOWN_SIZE
+        + element(0x1549A966, element(0x2AD7B1, uint(1000000)))
+        + element(0x1654AE6B, element(0xAE, element(0xD7, uint(1)) + element(0x86, b"A_OPUS")))
+    )
+
+
+def webm_cluster(start_ms: int, duration_ms: int) -> bytes:
+    """An unknown-size cluster of SimpleBlocks, as MediaRecorder writes them"""
+    blocks = b"".join(
+        element(0xA3, b"\x81" + (t - start_ms).to_bytes(2, "big", signed=True) + b"\x80" + OPUS_PACKET)
+        for t in range(start_ms, start_ms + duration_ms, FRAME_MS)
+    )
+    return ebml_id(0x1F43B675) + UNKNOWN_SIZE + element(0xE7, uint(start_ms)) + blocks
+
+
+def webm_opus(seconds: float, cluster_ms: int = 1000) -> bytes:
+    total_ms = int(seconds * 1000)
+    return webm_header() + b"".join(
+        webm_cluster(start, min(cluster_ms, total_ms - start)) for start in range(0, total_ms, cluster_ms)
+    )
+
+
+def ogg_page(header_type: int, granule: int, sequence: int, packets: List[bytes]) -> bytes:
+    lacing = b""
+    for packet in packets:
+        lacing += b"\xff" * (len(packet) // 255) + bytes([len(packet) % 255])
+    return (
+        b"OggS" + bytes([0, header_type]) + granule.to_bytes(8, "little", signed=True)
+        + (1).to_bytes(4, "little") + sequence.to_bytes(4, "little") + b"\0\0\0\0"
+        + bytes([len(lacing)]) + lacing + b"".join(packets)
+    )
+
+
+def ogg_header() -> bytes:
+    head = b"OpusHead" + bytes([1, 1]) + (312).to_bytes(2, "little") + (48000).to_bytes(4, "little") + b"\0\0\0"
+    tags = b"OpusTags" + (4).to_bytes(4, "little") + b"test" + (0).to_bytes(4, "little")
+    return ogg_page(0x02, 0, 0, [head]) + ogg_page(0, 0, 1, [tags])
+
+
+def ogg_opus(seconds: float, page_ms: int = 200) -> bytes:
+    pages = [ogg_header()]
+    for index, start in enumerate(range(0, int(seconds * 1000), page_ms)):
+        packets = [OPUS_PACKET] * (page_ms // FRAME_MS)
+        pages.append(ogg_page(0, (start + page_ms) * 48, index + 2, packets))
+    return b"".join(pages)
+
+
+def split(data: bytes, size: int) -> List[bytes]:
+    return [data[i:i + size] for i in range(0, len(data), size)]
@@ -0,0 +1,32 @@
+from app.admission import AdmissionController
+
+
+def test_admits_up_to_the_limit():
+    admission = AdmissionController(max_streams=2)
+    
+    assert admission.try_admit() == ""
+    assert admission.try_admit() == ""
+    assert admission.try_admit() == "capacity"
+    assert admission.available == 0 and not admission.accepting
+    
+    admission.release()
+    assert admission.available == 1
+    assert admission.try_admit() == ""
+    assert admission.stats()["rejected"] == {"capacity": 1, "draining": 0}
+
+
+def test_draining_turns_everyone_away():
+    admission = AdmissionController(max_streams=10)
+    admission.try_admit()
+    admission.start_drain()
+    
+    assert admission.try_admit() == "draining"
+    assert admission.available == 0
+    assert admission.stats()["activeStreams"] == 1
+
+
+def test_zero_means_unlimited():
+    admission = AdmissionController(max_streams=0)
+    for _ in range(1000):
+        assert admission.try_admit() == ""
+    assert admission.available == -1 and admission.accepting
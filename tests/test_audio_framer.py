@@ -0,0 +1,40 @@
+import pytest
+from app.audio_framer import AudioFramer
+
+
+def test_small_chunks_are_assembled_into_frames():
+    framer = AudioFramer(frame_bytes=8)
+    frames = []
+    for chunk in (b"ab", b"cdef", b"ghij", b"klmnopqrstu"):
+        frames += framer.push(chunk)
+    
+    assert frames == [b"abcdefgh", b"ijklmnop"]
+    assert framer.held_bytes == 5
+    assert framer.flush() == b"qrstu"
+    assert framer.flush() == b""
+    assert (framer.chunks_in, framer.frames_out) == (4, 3)
+
+
+def test_large_chunks_pass_through_uncopied():
+    framer = AudioFramer(frame_bytes=4, max_frame_bytes=8)
+    chunk = b"abcdef"
+    assert framer.push(chunk)[0] is chunk
+    # Split only above the request size limit
+    assert framer.push(b"ghijklmnopqrs") == [b"ghijklmn", b"opqrs"]
+    assert framer.push(b"tu") == []
+    assert framer.push(b"vwxyz") == [b"tuvw"]
+    assert framer.held_bytes == 3
+
+
+def test_partial_frame_is_due_after_max_hold():
+    now = [0.0]
+    framer = AudioFramer(frame_bytes=100, max_hold_seconds=0.1, clock=lambda: now[0])
+    framer.push(b"x" * 10)
+    now[0] = 0.06
+    framer.push(b"y" * 10)  # Topping up keeps the oldest byte's time
+    assert not framer.due()
+    assert framer.hold_remaining() == pytest.approx(0.04)
+    now[0] = 0.1
+    assert framer.due()
+    assert framer.flush() == b"x" * 10 + b"y" * 10
+    assert not framer.due()
@@ -0,0 +1,52 @@
+import asyncio
+import pytest
+from app.audio_queue import AudioQueue
+
+
+@pytest.mark.asyncio
+async def test_block_policy_waits_for_space():
+    queue = AudioQueue(max_bytes=8, policy="block")
+    await queue.put(b"aaaa")
+    await queue.put(b"bbbb")
+    
+    blocked = asyncio.create_task(queue.put(b"cccc"))
+    await asyncio.sleep(0.01)
+    assert not blocked.done()
+    
+    assert await queue.get() == b"aaaa"
+    await asyncio.wait_for(blocked, timeout=1.0)
+    assert queue.pending_bytes == 8
+
+
+@pytest.mark.asyncio
+async def test_drop_oldest_sheds_audio_but_keeps_markers():
+    queue = AudioQueue(max_bytes=8, policy="drop_oldest")
+    stop = object()
+    await queue.put(b"aaaa")
+    queue.put_control(stop)
+    await queue.put(b"bbbb")
+    
+    assert await queue.put(b"cccc") == 4
+    assert queue.dropped_bytes == 4
+    assert [await queue.get() for _ in range(3)] == [stop, b"bbbb", b"cccc"]
+
+
+@pytest.mark.asyncio
+async def test_coalesce_merges_backlog_into_larger_chunks():
+    queue = AudioQueue(max_bytes=12, policy="coalesce", max_chunk_bytes=8)
+    for chunk in (b"aa", b"bb", b"cc", b"dd", b"ee"):
+        await queue.put(chunk)
+    
+    assert queue.qsize() == 2
+    assert queue.coalesced_chunks == 3
+    assert [await queue.get(), await queue.get()] == [b"aabbccdd", b"ee"]
+
+
+@pytest.mark.asyncio
+async def test_get_wakes_on_put_without_polling():
+    queue = AudioQueue(max_bytes=8)
+    getter = asyncio.create_task(queue.get())
+    await asyncio.sleep(0.01)
+    queue.put_control(None)
+    
+    assert await asyncio.wait_for(getter, timeout=0.1) is None
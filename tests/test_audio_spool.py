@@ -0,0 +1,188 @@
+import asyncio
+import datetime
+import json
+import os
+import pytest
+from fastapi.testclient import TestClient
+from app.audio_spool import AudioSpool, SessionSpool, read_info, read_session
+from app.config import settings
+from app.recognizers import Alternative, RecognitionResult
+
+
+def spooled_files(root, name):
+    return sorted(os.listdir(os.path.join(root, name)))
+
+
+def test_audio_is_written_in_segments(tmp_path):
+    spool = AudioSpool(str(tmp_path), segment_bytes=1000, buffer_bytes=300)
+    session = spool.open("lecture/1", 16000)
+    audio = bytes(range(256)) * 10
+    for i in range(0, len(audio), 64):
+        session.write(audio[i:i + 64])
+    session.close()
+    assert spool.flush(timeout=2.0)
+    spool.close()
+
+    assert spooled_files(tmp_path, "lecture_1") == ["000-000000.pcm", "000-000001.pcm", "000-000002.pcm", "session.json"]
+    assert os.path.getsize(tmp_path / "lecture_1" / "000-000000.pcm") == 1000
+    assert b"".join(read_session(str(tmp_path), "lecture/1", chunk_bytes=512)) == audio
+    info = read_info(str(tmp_path), "lecture_1")
+    assert info["sessionId"] == "lecture/1"
+    assert info["sampleRate"] == 16000
+    assert info["closedAt"] is not None
+
+
+def test_reused_session_id_starts_a_new_recording(tmp_path):
+    spool = AudioSpool(str(tmp_path), segment_bytes=100, buffer_bytes=10)
+    for part in (b"a" * 150, b"b" * 20):
+        session = spool.open("restart", 16000)
+        session.write(part)
+        session.close()
+    spool.close()
+    # The second lecture starts at its own time 0 instead of after the first
+    assert b"".join(read_session(str(tmp_path), "restart")) == b"b" * 20
+    assert b"".join(read_session(str(tmp_path), "restart", generation=0)) == b"a" * 150
+    assert spooled_files(tmp_path, "restart") == ["000-000000.pcm", "000-000001.pcm", "001-000000.pcm", "session.json"]
+    assert read_info(str(tmp_path), "restart")["generation"] == 1
+
+
+def test_writer_backlog_drops_instead_of_blocking(tmp_path):
+    spool = AudioSpool(str(tmp_path), buffer_bytes=100, max_pending_bytes=250)
+    session = SessionSpool(spool, "stalled")  # Writer never started: the disk is "stuck"
+    for _ in range(5):
+        session.write(b"\0" * 100)
+    assert spool.pending_bytes == 200
+    assert spool.dropped_bytes == 300
+
+
+def test_dropped_blocks_become_silence_and_are_listed(tmp_path):
+    spool = AudioSpool(str(tmp_path), segment_bytes=250, buffer_bytes=100, max_pending_bytes=250)
+    session = spool.open("backlog", 16000)
+    assert spool.flush(timeout=2.0)
+    with spool._cond:  # Hold the writer so the backlog builds up
+        for i in range(5):
+            session.write(bytes([i + 1]) * 100)
+    session.close()
+    assert spool.flush(timeout=2.0)
+    spool.close()
+
+    audio = b"".join(read_session(str(tmp_path), "backlog"))
+    # Every block keeps its place in the lecture: the dropped ones as silence
+    assert audio == b"\1" * 100 + b"\2" * 100 + b"\0" * 300
+    assert read_info(str(tmp_path), "backlog")["gaps"] == [[200, 300]]
+    # Left as holes across segment files, not written
+    assert spool.written_bytes == 200
+    assert [os.path.getsize(tmp_path / "backlog" / f"000-00000{i}.pcm") for i in range(2)] == [250, 250]
+
+
+def test_reconnect_before_the_old_stream_ends_keeps_both_recordings(tmp_path):
+    spool = AudioSpool(str(tmp_path), buffer_bytes=4)
+    old = spool.open("overlap", 16000)
+    old.write(b"AAAA")
+    new = spool.open("overlap", 16000)  # The old stream is still in its grace period
+    new.write(b"BBBB")
+    old.close()
+    new.write(b"CCCC")
+    assert spool.flush(timeout=2.0)
+
+    assert spool.stats()["active"] == 1
+    assert read_info(str(tmp_path), "overlap")["closedAt"] is None
+    new.close()
+    spool.close()
+    assert b"".join(read_session(str(tmp_path), "overlap")) == b"BBBBCCCC"
+    assert b"".join(read_session(str(tmp_path), "overlap", generation=0)) == b"AAAA"
+    assert read_info(str(tmp_path), "overlap")["closedAt"] is not None
+
+
+def make_closed_session(root, name, closed_at, size):
+    os.makedirs(os.path.join(root, name))
+    with open(os.path.join(root, name, "000000.pcm"), "wb") as f:
+        f.write(b"\0" * size)
+    with open(os.path.join(root, name, "session.json"), "w") as f:
+        json.dump({"sessionId": name, "sampleRate": 16000, "closedAt": closed_at}, f)
+
+
+def test_retention_by_age_and_size(tmp_path):
+    now = 1_000_000.0
+    spool = AudioSpool(str(tmp_path), retention_seconds=3600, max_bytes=2500, clock=lambda: now)
+    make_closed_session(tmp_path, "expired", now - 7200, 100)
+    make_closed_session(tmp_path, "older", now - 600, 1000)
+    make_closed_session(tmp_path, "newer", now - 60, 1000)
+    make_closed_session(tmp_path, "live", now - 9000, 1000)
+    spool._active["live"] += 1
+
+    assert spool.sweep() == 2
+    # Expired by age, then the oldest closed session until under the size cap
+    assert sorted(os.listdir(tmp_path)) == ["live", "newer"]
+    assert spool.evicted_sessions == 2
+
+
+class FakeWebSocket:
+    async def send_json(self, data):
+        pass
+
+
+class FakeRecognizer:
+    name = "fake"
+
+    def __init__(self):
+        self.clips = []
+
+    def recognize(self, audio, options):
+        self.clips.append((len(audio), options.sample_rate))
+        return [RecognitionResult(
+            [Alternative("spooled lecture", 0.9)],
+            result_end_offset=datetime.timedelta(seconds=len(audio) / 2 / options.sample_rate),
+        )]
+
+
+@pytest.fixture
+def spool_dir(tmp_path, monkeypatch):
+    import app.audio_spool
+    monkeypatch.setattr(settings, "AUDIO_SPOOL_ENABLED", True)
+    monkeypatch.setattr(settings, "AUDIO_SPOOL_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "VAD_ENABLED", False)
+    monkeypatch.setattr(settings, "SPEECH_SAMPLE_RATE", 48000)  # What the test tone is recorded at
+    monkeypatch.setattr(app.audio_spool, "_spool", None)
+    yield tmp_path
+    app.audio_spool.close_audio_spool()
+
+
+@pytest.mark.asyncio
+async def test_live_session_audio_can_be_retranscribed(spool_dir, monkeypatch):
+    import numpy as np
+    import app.batch
+    from app.main import app as fastapi_app
+    from app.websocket import TranscriptionStream
+
+    class SilentSpeech:
+        def streaming_recognize(self, requests):
+            for _ in requests:
+                pass
+            return iter([])
+
+    stream = TranscriptionStream(FakeWebSocket(), "spooled", client=SilentSpeech())
+    task = asyncio.create_task(stream.start())
+    t = np.arange(48000) / 48000
+    tone = (8000 * np.sin(2 * np.pi * 220 * t)).astype(np.int16).tobytes()
+    for i in range(0, len(tone), 9600):
+        await stream.send_audio(tone[i:i + 9600])
+    await stream.stop()
+    await asyncio.wait_for(task, timeout=2.0)
+
+    recognizer = FakeRecognizer()
+    monkeypatch.setattr(app.batch, "create_recognizer", lambda **kwargs: recognizer)
+    response = await asyncio.to_thread(TestClient(fastapi_app).post, "/api/sessions/spooled/retranscribe")
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["transcript"] == "spooled lecture"
+    # One second of 48 kHz audio was spooled after resampling to 16 kHz
+    assert body["durationSeconds"] == pytest.approx(1.0, abs=0.01)
+    assert recognizer.clips[0][1] == settings.SPEECH_TARGET_SAMPLE_RATE
+
+
+def test_retranscribe_unknown_session(spool_dir):
+    from app.main import app as fastapi_app
+    response = TestClient(fastapi_app).post("/api/sessions/never-recorded/retranscribe")
+    assert response.status_code == 404
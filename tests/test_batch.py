@@ -0,0 +1,151 @@
+import asyncio
+import datetime
+import struct
+import threading
+import time
+import numpy as np
+import pytest
+from google.cloud.speech_v2.types import cloud_speech
+from app.batch import BatchTranscriber, SilenceSplitter, parse_wav_header
+
+RATE = 16000
+
+
+def tone(seconds, amplitude=8000):
+    t = np.arange(int(seconds * RATE)) / RATE
+    return (amplitude * np.sin(2 * np.pi * 220 * t)).astype(np.int16).tobytes()
+
+
+def silence(seconds):
+    return bytes(int(seconds * RATE) * 2)
+
+
+def wav(pcm, rate=RATE, channels=1):
+    return (
+        b"RIFF" + struct.pack("<I", 36 + len(pcm)) + b"WAVE"
+        + b"fmt " + struct.pack("<IHHIIHH", 16, 1, channels, rate, rate * channels * 2, channels * 2, 16)
+        + b"data" + struct.pack("<I", len(pcm)) + pcm
+    )
+
+
+async def upload(data, chunk=32768):
+    for i in range(0, len(data), chunk):
+        yield data[i:i + chunk]
+
+
+class FakeRecognizer:
+    """Blocking Recognize stand-in: one result per call, labelled by call order"""
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+        self.durations = []
+    
+    def recognize(self, request):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        seconds = len(request.content) / 2 / request.config.explicit_decoding_config.sample_rate_hertz
+        self.durations.append(seconds)
+        time.sleep(self.delay)
+        with self.lock:
+            self.active -= 1
+        return cloud_speech.RecognizeResponse(results=[
+            cloud_speech.SpeechRecognitionResult(
+                alternatives=[cloud_speech.SpeechRecognitionAlternative(
+                    transcript=f"piece of {seconds:.0f}s", confidence=0.9,
+                )],
+                result_end_offset=datetime.timedelta(seconds=seconds),
+            )
+        ])
+
+
+def test_splitter_cuts_at_pauses_within_the_limit():
+    splitter = SilenceSplitter(RATE, max_segment_seconds=10.0, search_seconds=4.0)
+    audio = (tone(7) + silence(0.5)) * 4
+    
+    segments = splitter.feed(audio) + splitter.finish()
+    
+    assert all(len(s.audio) <= 10 * RATE * 2 for s in segments)
+    assert b"".join(s.audio for s in segments) == audio
+    # Every cut except the last falls inside a pause
+    for segment in segments[:-1]:
+        end = segment.start_sample + len(segment.audio) // 2
+        assert end % int(7.5 * RATE) >= 7 * RATE
+
+
+def test_silent_pieces_are_flagged():
+    splitter = SilenceSplitter(RATE, max_segment_seconds=5.0, search_seconds=2.0)
+    segments = splitter.feed(silence(5) + tone(3)) + splitter.finish()
+    assert segments[0].silent
+    assert not segments[-1].silent
+
+
+def test_wav_header_is_parsed():
+    data = wav(silence(0.1), rate=44100, channels=2)
+    assert parse_wav_header(data) == (44100, 2, 44)
+    assert parse_wav_header(data[:20]) is None
+
+
+@pytest.mark.asyncio
+async def test_pieces_are_recognized_concurrently_and_reassembled_in_order():
+    recognizer = FakeRecognizer(delay=0.2)
+    transcriber = BatchTranscriber(client=recognizer, max_concurrency=4, max_segment_seconds=10.0)
+    audio = (tone(9) + silence(0.5)) * 8
+    
+    started = time.monotonic()
+    result = await transcriber.transcribe(upload(wav(audio)))
+    elapsed = time.monotonic() - started
+    
+    assert len(recognizer.durations) >= 8
+    assert 1 < recognizer.peak <= 4
+    assert elapsed < 0.2 * len(recognizer.durations) * 0.75
+    starts = [segment["startMs"] for segment in result["segments"]]
+    assert starts == sorted(starts) and starts[0] == 0
+    assert result["segments"][-1]["endMs"] == pytest.approx(result["durationSeconds"] * 1000, abs=1)
+    assert result["durationSeconds"] == pytest.approx(len(audio) / 2 / RATE)
+
+
+@pytest.mark.asyncio
+async def test_raw_upload_is_resampled_and_silence_skipped():
+    recognizer = FakeRecognizer()
+    transcriber = BatchTranscriber(client=recognizer, max_segment_seconds=5.0)
+    stereo_48k = np.repeat(np.frombuffer(silence(20), dtype=np.int16), 6).tobytes()
+    
+    result = await transcriber.transcribe(upload(stereo_48k), sample_rate=48000, channels=2)
+    
+    assert recognizer.durations == []
+    assert result["segments"] == []
+    assert result["durationSeconds"] == pytest.approx(20, abs=0.01)
+
+
+@pytest.mark.asyncio
+async def test_raw_upload_needs_a_sample_rate():
+    transcriber = BatchTranscriber(client=FakeRecognizer())
+    with pytest.raises(ValueError):
+        await transcriber.transcribe(upload(tone(1)))
+
+
+@pytest.mark.asyncio
+async def test_wav_split_inside_its_magic_is_still_a_wav():
+    async def trickle(data):
+        yield data[:2]  # "RI"
+        yield data[2:3]
+        async for chunk in upload(data[3:]):
+            yield chunk
+
+    recognizer = FakeRecognizer()
+    transcriber = BatchTranscriber(client=recognizer)
+    audio = tone(1)
+    result = await transcriber.transcribe(trickle(wav(audio, rate=8000)))
+
+    # Read at the header's rate (no sampleRate given), header not taken for audio
+    assert result["durationSeconds"] == pytest.approx(len(audio) / 2 / 8000, abs=0.01)
+
+
+@pytest.mark.asyncio
+async def test_raw_upload_shorter_than_the_format_check():
+    transcriber = BatchTranscriber(client=FakeRecognizer())
+    result = await transcriber.transcribe(upload(b"\0\0"), sample_rate=RATE)
+    assert result["segments"] == []  # Read as audio, not an empty upload
@@ -0,0 +1,99 @@
+import asyncio
+import json
+import pytest
+import pytest_asyncio
+from app.broker import RedisBroker, encode_command
+from app.caption_hub import CaptionHub
+from tests.fake_redis import FakeRedisServer
+
+
+def caption(text, is_final=True):
+    return {"type": "transcription", "transcript": text, "isFinal": is_final, "sessionId": "s1"}
+
+
+async def wait_for(condition, timeout=2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+
+
+@pytest_asyncio.fixture
+async def redis_server():
+    server = FakeRedisServer()
+    await server.start()
+    yield server
+    await server.close()
+
+
+def test_commands_are_encoded_as_resp_arrays():
+    assert encode_command("PUBLISH", "c", "hi") == b"*3\r\n$7\r\nPUBLISH\r\n$1\r\nc\r\n$2\r\nhi\r\n"
+
+
+@pytest.mark.asyncio
+async def test_viewers_on_another_instance_receive_captions(redis_server):
+    """Lecturer on instance A, students on instance B"""
+    lecturer_side = CaptionHub(broker=RedisBroker(redis_server.url, reconnect_delay=0.05))
+    viewer_side = CaptionHub(broker=RedisBroker(redis_server.url, reconnect_delay=0.05))
+    await lecturer_side.start()
+    await viewer_side.start()
+    try:
+        remote = viewer_side.subscribe("s1")
+        local = lecturer_side.subscribe("s1")
+        await wait_for(lambda: redis_server.subscriber_count("sauti:captions:s1") == 2)
+        
+        lecturer_side.publish("s1", caption("habari za asubuhi"))
+        
+        message = json.loads(await asyncio.wait_for(remote.get(), timeout=2.0))
+        assert message["transcript"] == "habari za asubuhi"
+        # Local viewers are served directly and don't get an echo from Redis
+        assert json.loads(await local.get())["transcript"] == "habari za asubuhi"
+        await asyncio.sleep(0.1)
+        assert len(local) == 0
+    finally:
+        await lecturer_side.close()
+        await viewer_side.close()
+
+
+@pytest.mark.asyncio
+async def test_outgoing_messages_are_batched(redis_server):
+    broker = RedisBroker(redis_server.url, reconnect_delay=0.05)
+    hub = CaptionHub(broker=broker)
+    await hub.start()
+    try:
+        for i in range(200):
+            hub.publish("s1", caption(f"word {i}"))
+        await wait_for(lambda: broker.published == 200)
+        assert broker.batches < 20
+        assert redis_server.commands.count("PUBLISH") == 200
+    finally:
+        await hub.close()
+
+
+@pytest.mark.asyncio
+async def test_instance_only_subscribes_while_it_has_viewers(redis_server):
+    hub = CaptionHub(broker=RedisBroker(redis_server.url, reconnect_delay=0.05))
+    await hub.start()
+    try:
+        first, second = hub.subscribe("s1"), hub.subscribe("s1")
+        await wait_for(lambda: redis_server.subscriber_count("sauti:captions:s1") == 1)
+        hub.unsubscribe(first)
+        hub.unsubscribe(second)
+        await wait_for(lambda: redis_server.subscriber_count("sauti:captions:s1") == 0)
+    finally:
+        await hub.close()
+
+
+@pytest.mark.asyncio
+async def test_credentials_from_the_url_are_sent(redis_server):
+    for credentials, expected in (("lecturer:secret@", ["lecturer", "secret"]), (":secret@", ["secret"])):
+        broker = RedisBroker(f"redis://{credentials}127.0.0.1:{redis_server.port}", reconnect_delay=0.05)
+        _, writer = await broker._connect()
+        writer.close()
+        assert redis_server.auth[-1] == expected
+
+
+def test_url_selecting_a_database_is_rejected():
+    RedisBroker("redis://localhost:6379/0")
+    with pytest.raises(ValueError):
+        RedisBroker("redis://localhost:6379/2")
@@ -0,0 +1,105 @@
+import time
+from fastapi.testclient import TestClient
+from app.caption_cues import CueTrack, cue_tracks, wrap_lines
+
+
+def timed(text: str, start_ms: int, word_ms: int = 300):
+    """Word timings for a sentence spoken at a steady pace"""
+    return [
+        {'w': word, 's': start_ms + i * word_ms, 'e': start_ms + (i + 1) * word_ms}
+        for i, word in enumerate(text.split())
+    ]
+
+
+def test_cues_follow_line_length_and_sentence_rules():
+    track = CueTrack("lecture", max_line_chars=20, max_lines=2, min_cue_seconds=1.0)
+    track.add_final("Habari za asubuhi wanafunzi.", timed("Habari za asubuhi wanafunzi.", 0))
+    track.add_final(
+        "Today we look at photosynthesis in green plants and algae",
+        timed("Today we look at photosynthesis in green plants and algae", 1200),
+    )
+    track.finish()
+
+    assert [cue.text for cue in track.cues] == [
+        "Habari za asubuhi wanafunzi.",
+        "Today we look at photosynthesis in",
+        "green plants and algae",
+    ]
+    for cue in track.cues:
+        assert len(wrap_lines(cue.words, 20)) <= 2
+    assert wrap_lines(track.cues[1].words, 20) == ["Today we look at", "photosynthesis in"]
+
+
+def test_pauses_split_cues_and_short_cues_are_held_for_reading():
+    track = CueTrack("lecture", max_chars_per_second=10.0, min_cue_seconds=1.0, pause_seconds=1.0)
+    track.add_final("Right.", [{'w': "Right.", 's': 0, 'e': 200}])
+    track.add_final("So", [{'w': "So", 's': 1500, 'e': 1700}])
+    track.add_final("next", [{'w': "next", 's': 4000, 'e': 4300}])
+    track.finish()
+
+    first, second, third = track.cues
+    # Held for the minimum time, but never into the next cue
+    assert (first.start_ms, first.end_ms) == (0, 1000)
+    assert (second.start_ms, second.end_ms) == (1500, 2500)
+    assert third.start_ms == 4000
+
+
+def test_interims_only_replace_the_provisional_tail():
+    track = CueTrack("lecture")
+    track.add_final("Karibu", timed("Karibu", 0))
+    track.update_interim("darasa la", end_ms=900)
+    track.update_interim("darasa la leo", end_ms=1200)
+
+    assert track.cues == []
+    assert "Karibu darasa la leo" in track.webvtt()
+    assert "darasa" not in track.webvtt(include_interim=False)
+    assert "Karibu" in track.webvtt(include_interim=False)
+
+    track.add_final("darasa la leo.", timed("darasa la leo.", 300))
+    assert "Karibu darasa la leo." in track.srt()
+
+
+def test_webvtt_and_srt_documents():
+    track = CueTrack("lecture")
+    track.add_final("Good morning.", [{'w': "Good", 's': 61000, 'e': 61400}, {'w': "morning.", 's': 61400, 'e': 62100}])
+    track.finish()
+
+    assert track.webvtt() == "WEBVTT\n\n1\n00:01:01.000 --> 00:01:02.100\nGood morning.\n"
+    assert track.srt() == "1\n00:01:01,000 --> 00:01:02,100\nGood morning.\n"
+
+
+def test_result_cost_does_not_grow_with_the_lecture():
+    track = CueTrack("ninety-minutes")
+    sentence = "the cell membrane controls what enters and leaves the cell"
+
+    def add_results(count: int, start_ms: int) -> float:
+        started = time.perf_counter()
+        for i in range(count):
+            at = start_ms + i * 4000
+            for partial in range(1, 5):
+                track.update_interim(" ".join(sentence.split()[:partial * 2]), end_ms=at + partial * 600)
+            track.add_final(sentence, timed(sentence, at))
+        return time.perf_counter() - started
+
+    early = add_results(100, 0)
+    add_results(1150, 400_000)  # About 90 minutes of speech
+    late = add_results(100, 5_000_000)
+
+    assert len(track.cues) > 1000
+    # Generous bound for noisy CI machines; work over the whole lecture would be far above it
+    assert late < 3 * early + 0.05
+
+
+def test_caption_endpoints():
+    from app.main import app as fastapi_app
+    track = cue_tracks.open("export-lecture")
+    track.add_final("Asanteni sana.", timed("Asanteni sana.", 0))
+    client = TestClient(fastapi_app)
+
+    vtt = client.get("/api/sessions/export-lecture/captions.vtt")
+    assert vtt.status_code == 200
+    assert vtt.headers["content-type"].startswith("text/vtt")
+    assert vtt.text.startswith("WEBVTT") and "Asanteni sana." in vtt.text
+    srt = client.get("/api/sessions/export-lecture/captions.srt")
+    assert srt.text.startswith("1\n00:00:00,000 --> ")
+    assert client.get("/api/sessions/unknown-lecture/captions.vtt").status_code == 404
@@ -0,0 +1,71 @@
+import asyncio
+import json
+import time
+import pytest
+from app.caption_hub import CaptionHub
+
+
+def caption(text, is_final=False):
+    return {"type": "transcription", "transcript": text, "isFinal": is_final, "sessionId": "s1"}
+
+
+@pytest.mark.asyncio
+async def test_every_viewer_of_a_session_receives_results():
+    hub = CaptionHub()
+    viewers = [hub.subscribe("s1") for _ in range(3)]
+    other = hub.subscribe("s2")
+    
+    hub.publish("s1", caption("habari", is_final=True))
+    
+    for viewer in viewers:
+        message = json.loads(await asyncio.wait_for(viewer.get(), timeout=1.0))
+        assert message["transcript"] == "habari"
+    assert len(other) == 0
+
+
+@pytest.mark.asyncio
+async def test_fan_out_to_hundreds_of_viewers_is_cheap():
+    hub = CaptionHub()
+    for _ in range(500):
+        hub.subscribe("s1")
+    
+    started = time.perf_counter()
+    for i in range(100):
+        hub.publish("s1", caption(f"word {i}", is_final=True))
+    per_message_ms = (time.perf_counter() - started) * 1000 / 100
+    
+    assert per_message_ms < 5.0
+
+
+@pytest.mark.asyncio
+async def test_slow_viewer_is_bounded_and_keeps_latest_interim():
+    hub = CaptionHub(max_messages=10)
+    slow = hub.subscribe("s1")
+    
+    for i in range(50):
+        hub.publish("s1", caption(f"partial {i}"), replaceable=True)
+    assert len(slow) == 1  # Stale interims were overwritten
+    
+    for i in range(30):
+        hub.publish("s1", caption(f"final {i}", is_final=True))
+    assert len(slow) == 10
+    assert slow.dropped == 21
+    
+    last = None
+    while len(slow):
+        last = json.loads(await slow.get())
+    assert last["transcript"] == "final 29"
+
+
+@pytest.mark.asyncio
+async def test_unsubscribe_wakes_the_viewer_and_forgets_the_session():
+    hub = CaptionHub()
+    viewer = hub.subscribe("s1")
+    waiter = asyncio.create_task(viewer.get())
+    await asyncio.sleep(0)
+    
+    hub.unsubscribe(viewer)
+    
+    assert await asyncio.wait_for(waiter, timeout=1.0) is None
+    assert hub.deliver("s1", "{}") == 0
+    assert hub.stats()["sessions"] == 0
@@ -0,0 +1,244 @@
+import asyncio
+import threading
+import time
+import pytest
+from app.firebase_client import FirebasePublisher, InterimCaptionThrottle, TranscriptSegmentWriter
+from app.metrics import firebase_dropped_paths
+
+
+class FakeDatabase:
+    """Blocking multi-path writer; can be held to simulate a slow Firebase"""
+    def __init__(self, failures: int = 0):
+        self.batches = []
+        self.failures = failures
+        self.gate = threading.Event()
+        self.gate.set()
+    
+    def write(self, updates):
+        self.gate.wait(timeout=5.0)
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("503 Service Unavailable")
+        self.batches.append(dict(updates))
+
+
+@pytest.mark.asyncio
+async def test_enqueue_never_blocks_the_event_loop():
+    database = FakeDatabase()
+    database.gate.clear()  # Firebase hangs
+    publisher = FirebasePublisher(write=database.write)
+    
+    started = time.perf_counter()
+    for i in range(100):
+        publisher.enqueue({f"captions/s{i % 3}/latest": {"text": str(i)}})
+    assert time.perf_counter() - started < 0.05
+    
+    database.gate.set()
+    await publisher.stop(timeout=2.0)
+
+
+@pytest.mark.asyncio
+async def test_pending_writes_are_coalesced_into_one_multipath_update():
+    database = FakeDatabase()
+    database.gate.clear()
+    publisher = FirebasePublisher(write=database.write)
+    
+    publisher.enqueue({"captions/a/latest": {"text": "first"}})
+    await asyncio.sleep(0.05)  # First write now in flight
+    for i in range(10):
+        publisher.enqueue({"captions/a/latest": {"text": f"a{i}"}})
+        publisher.enqueue({"captions/b/latest": {"text": f"b{i}"}})
+    assert publisher.queue_depth == 2
+    
+    database.gate.set()
+    await publisher.flush(timeout=2.0)
+    
+    assert database.batches == [
+        {"captions/a/latest": {"text": "first"}},
+        {"captions/a/latest": {"text": "a9"}, "captions/b/latest": {"text": "b9"}},
+    ]
+    assert publisher.stats()["writes"] == 2
+    await publisher.stop()
+
+
+@pytest.mark.asyncio
+async def test_failed_writes_are_retried_with_backoff():
+    database = FakeDatabase(failures=2)
+    publisher = FirebasePublisher(write=database.write, base_backoff=0.01)
+    
+    publisher.enqueue({"captions/a/latest": {"text": "hello"}})
+    await publisher.flush(timeout=2.0)
+    
+    assert database.batches == [{"captions/a/latest": {"text": "hello"}}]
+    assert publisher.retries == 2
+    assert publisher.failed_writes == 0
+    await publisher.stop()
+
+
+@pytest.mark.asyncio
+async def test_batch_dropped_after_max_attempts():
+    database = FakeDatabase(failures=10)
+    publisher = FirebasePublisher(write=database.write, base_backoff=0.001, max_attempts=3)
+    
+    publisher.enqueue({"captions/a/latest": {"text": "lost"}})
+    await publisher.flush(timeout=2.0)
+    
+    assert database.batches == []
+    assert publisher.failed_writes == 1
+    await publisher.stop()
+
+
+@pytest.mark.asyncio
+async def test_one_failing_session_does_not_drop_the_others():
+    written = []
+    
+    def write(updates):
+        if any(path.startswith("captions/bad/") for path in updates):
+            raise ValueError("400 Invalid data")  # e.g. rejected by database rules
+        written.append(dict(updates))
+    
+    publisher = FirebasePublisher(write=write, base_backoff=0.001, max_attempts=3)
+    dropped = firebase_dropped_paths.value("failed")
+    publisher.enqueue({
+        "captions/good/latest": {"text": "habari"},
+        "captions/bad/latest": {"text": "\ud800"},
+        "captions/good/segments/seg000000/seq000000": {"text": "habari"},
+    })
+    await publisher.flush(timeout=2.0)
+    
+    assert written == [{
+        "captions/good/latest": {"text": "habari"},
+        "captions/good/segments/seg000000/seq000000": {"text": "habari"},
+    }]
+    assert publisher.failed_writes == 1
+    assert publisher.dropped_paths == 1
+    assert firebase_dropped_paths.value("failed") - dropped == 1
+    
+    # The good session writes without backoff afterwards
+    publisher.enqueue({"captions/good/latest": {"text": "asante"}})
+    await publisher.flush(timeout=2.0)
+    assert written[-1] == {"captions/good/latest": {"text": "asante"}}
+    await publisher.stop()
+
+
+@pytest.mark.asyncio
+async def test_overflow_evicts_replaceable_paths_but_never_transcript_entries():
+    database = FakeDatabase()
+    database.gate.clear()
+    publisher = FirebasePublisher(write=database.write, max_pending_paths=3)
+    dropped = firebase_dropped_paths.value("overflow")
+    publisher.enqueue({"captions/a/latest": {"text": "in flight"}})
+    await asyncio.sleep(0.05)
+    
+    entries = {f"captions/a/segments/seg000000/seq{i:06d}": {"text": str(i)} for i in range(5)}
+    for path, entry in entries.items():
+        publisher.enqueue({path: entry, "captions/a/latest": {"text": entry["text"]}})
+    
+    # Captions give way to the bound; the entries are kept past it
+    assert publisher.queue_depth == 5
+    assert publisher.dropped_paths == 3
+    assert firebase_dropped_paths.value("overflow") - dropped == 3
+    database.gate.set()
+    await publisher.flush(timeout=2.0)
+    written = {path: value for batch in database.batches for path, value in batch.items()}
+    assert all(written[path] == entry for path, entry in entries.items())
+    await publisher.stop()
+
+
+class RecordingPublisher:
+    def __init__(self):
+        self.updates = []
+    
+    def enqueue(self, updates):
+        self.updates.append(dict(updates))
+    
+    def texts(self):
+        return [batch["captions/s1/interim"]["text"] for batch in self.updates]
+
+
+@pytest.mark.asyncio
+async def test_interim_captions_are_rate_limited_latest_wins():
+    recorder = RecordingPublisher()
+    throttle = InterimCaptionThrottle("s1", publisher=recorder, max_writes_per_second=5, debounce_ms=20)
+    
+    # 10 hypotheses per second for one second
+    for i in range(10):
+        throttle.update(f"hello {i}")
+        await asyncio.sleep(0.1)
+    await asyncio.sleep(0.25)
+    
+    texts = recorder.texts()
+    assert 3 <= len(texts) <= 6
+    assert texts[-1] == "hello 9"  # The latest hypothesis always lands
+    assert throttle.writes == len(texts)
+
+
+@pytest.mark.asyncio
+async def test_unchanged_interim_text_is_not_rewritten():
+    recorder = RecordingPublisher()
+    throttle = InterimCaptionThrottle("s1", publisher=recorder, max_writes_per_second=50, debounce_ms=5)
+    
+    throttle.update("habari")
+    await asyncio.sleep(0.05)
+    for _ in range(5):
+        throttle.update("habari")
+        await asyncio.sleep(0.03)
+    
+    assert recorder.texts() == ["habari"]
+    assert throttle.suppressed == 5
+
+
+@pytest.mark.asyncio
+async def test_final_result_clears_interim_and_cancels_pending_write():
+    recorder = RecordingPublisher()
+    throttle = InterimCaptionThrottle("s1", publisher=recorder, max_writes_per_second=50, debounce_ms=5)
+    
+    throttle.update("good mor")
+    await asyncio.sleep(0.05)
+    throttle.update("good morning")  # Still debouncing when the final arrives
+    cleared = throttle.clear()
+    await asyncio.sleep(0.05)
+    
+    # The blank is left for the final's write
+    assert recorder.texts() == ["good mor"]
+    assert cleared["captions/s1/interim"]["text"] == ""
+    assert throttle.clear() == {}
+
+
+@pytest.mark.asyncio
+async def test_interim_after_a_final_waits_for_the_rate_limit():
+    recorder = RecordingPublisher()
+    throttle = InterimCaptionThrottle("s1", publisher=recorder, max_writes_per_second=5, debounce_ms=5)
+    
+    throttle.update("good")
+    await asyncio.sleep(0.25)
+    throttle.clear()
+    throttle.update("morning")
+    await asyncio.sleep(0.1)
+    assert recorder.texts() == ["good"]  # The blank took this interval's write
+    await asyncio.sleep(0.2)
+    assert recorder.texts() == ["good", "morning"]
+
+
+@pytest.mark.asyncio
+async def test_transcript_is_appended_in_fixed_size_segments():
+    database = FakeDatabase()
+    publisher = FirebasePublisher(write=database.write)
+    publisher.start()
+    log = TranscriptSegmentWriter("s1", segment_size=3, publisher=publisher)
+    
+    for i in range(7):
+        log.append(f"sentence {i}", start_ms=i * 1000, end_ms=i * 1000 + 900,
+                   words=[{"w": "sentence", "s": i * 1000, "e": i * 1000 + 400}])
+    await publisher.flush(timeout=2.0)
+    await publisher.stop(timeout=2.0)
+    
+    written = {}
+    for batch in database.batches:
+        written.update(batch)
+    segments = {path.split("/")[3] for path in written if "/segments/" in path}
+    assert segments == {"seg000000", "seg000001", "seg000002"}
+    assert written["captions/s1/segments/seg000002/seq000006"]["text"] == "sentence 6"
+    assert written["captions/s1/segments/seg000001/seq000004"]["startMs"] == 4000
+    assert written["captions/s1/meta"]["lastSeq"] == 6
+    assert written["captions/s1/meta"]["segmentCount"] == 3
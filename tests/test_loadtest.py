@@ -0,0 +1,68 @@
+import sys
+import pytest
+
+pytestmark = pytest.mark.skipif(not sys.platform.startswith("linux"), reason="reads /proc for CPU and RSS")
+
+
+@pytest.mark.asyncio
+async def test_streaming_path_under_load():
+    """Small load run against the fake Speech and Realtime DB servers (regression gate)"""
+    from loadtest.run import run_load
+    
+    summary = await run_load(sessions=4, duration=4.0, ramp_seconds=0.5)
+    
+    assert summary["errors"] == []
+    assert summary["speechStreams"] == 4
+    assert summary["results"]["final"] >= 4
+    assert summary["results"]["interim"] >= 4 * 4
+    # Fake recognition takes 50 ms; the backend must add little on top
+    assert summary["finalLatencyMs"]["p95"] < 500
+    assert summary["interimLatencyMs"]["p95"] < 500
+    assert summary["firebaseWrites"] > 0
+
+
+@pytest.mark.asyncio
+async def test_sigterm_drains_live_lectures():
+    """SIGTERM: live lectures get their last finals before the backend exits"""
+    import json
+    import signal
+    import subprocess
+    import websockets
+    from loadtest.fake_rtdb import FakeRealtimeDatabase
+    from loadtest.fake_speech import FakeSpeechServer
+    from loadtest.run import free_port, lecture_pcm, start_backend, wait_until_ready
+    
+    speech = FakeSpeechServer(final_every=30.0).start()
+    database = FakeRealtimeDatabase().start()
+    port = free_port()
+    process, log, _ = start_backend(port, speech, database, {"VAD_ENABLED": "false"})
+    messages = []
+    try:
+        await wait_until_ready(f"http://127.0.0.1:{port}", process)
+        async with websockets.connect(f"ws://127.0.0.1:{port}/ws/transcribe/lecture") as lecturer:
+            await lecturer.send(lecture_pcm(1.0))
+            # Signal once Speech has heard the audio, so there are words to finalize
+            async for raw in lecturer:
+                messages.append(json.loads(raw))
+                if messages[-1]["type"] == "transcription":
+                    break
+            process.send_signal(signal.SIGTERM)
+            try:
+                async for raw in lecturer:
+                    messages.append(json.loads(raw))
+            except websockets.ConnectionClosed:
+                pass  # Closed by the server once drained
+        process.wait(timeout=10)
+    finally:
+        if process.poll() is None:
+            process.kill()
+        speech.stop()
+        database.stop()
+        log.close()
+    
+    types = [m["type"] for m in messages]
+    assert "draining" in types
+    # The final flushed by half-closing the upstream stream arrives after the notice
+    after = messages[types.index("draining"):]
+    assert any(m["type"] == "transcription" and m["isFinal"] for m in after)
+    assert database.writes > 0
@@ -0,0 +1,100 @@
+import asyncio
+import json
+import logging
+import queue
+import time
+import pytest
+from app.logs import (
+    EventSampler,
+    JsonFormatter,
+    SessionFilter,
+    _NonBlockingQueueHandler,
+    records_dropped,
+    session_context,
+)
+from app.tracing import Tracer
+
+
+def make_record(message="📝 %s", *args, **extra):
+    record = logging.LogRecord("app.websocket", logging.INFO, __file__, 1, message, args, None)
+    for name, value in extra.items():
+        setattr(record, name, value)
+    return record
+
+
+def test_json_records_carry_session_and_extra_fields():
+    async def log_for(session_id):
+        session_context.set(session_id)
+        record = make_record("📝 Interim: %s", "habari", event="interim", suppressed=3)
+        SessionFilter().filter(record)
+        return record
+
+    async def main():
+        # Each task logs with its own session
+        return await asyncio.gather(log_for("lecture-a"), log_for("lecture-b"))
+
+    first, second = asyncio.run(main())
+    entry = json.loads(JsonFormatter().format(first))
+
+    assert entry["severity"] == "INFO"
+    assert entry["logger"] == "app.websocket"
+    assert entry["message"] == "📝 Interim: habari"
+    assert entry["sessionId"] == "lecture-a"
+    assert entry["event"] == "interim"
+    assert entry["suppressed"] == 3
+    assert json.loads(JsonFormatter().format(second))["sessionId"] == "lecture-b"
+    assert "sessionId" not in json.loads(JsonFormatter().format(make_record("no session")))
+
+
+def test_full_log_queue_drops_instead_of_blocking():
+    handler = _NonBlockingQueueHandler(queue.Queue(maxsize=2))
+    dropped = records_dropped.value()
+    for i in range(5):
+        handler.handle(make_record("chunk %d", i))
+    assert handler.queue.qsize() == 2
+    assert records_dropped.value() - dropped == 3
+    # Arguments are left for the writer thread to format
+    assert handler.queue.get_nowait().args == (0,)
+
+
+def test_sampler_lets_a_burst_through_then_counts_what_it_suppresses(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    sampler = EventSampler(rate_per_second=2.0, burst=2)
+
+    assert [sampler.allow() for _ in range(5)] == [True, True, False, False, False]
+    assert sampler.take_suppressed() == 3
+    assert sampler.take_suppressed() == 0
+    now[0] += 0.5  # One token refilled
+    assert [sampler.allow() for _ in range(2)] == [True, False]
+    assert EventSampler(rate_per_second=0).allow() is False
+
+
+def test_tracer_observes_every_span_and_logs_a_sample(caplog):
+    tracer = Tracer("test_stage", sample_every=3)
+    with caplog.at_level(logging.INFO, logger="app.tracing"):
+        for seq in range(7):
+            with tracer.span(seq):
+                pass
+
+    assert tracer.histogram.count == 7
+    spans = [r for r in caplog.records if getattr(r, "span", None) == "test_stage"]
+    assert [r.seq for r in spans] == [2, 5]
+    assert spans[0].durationMs >= 0
+
+
+def test_queued_logging_keeps_the_calling_thread_cheap():
+    logger = logging.getLogger("sauti.test.overhead")
+    logger.propagate = False
+    handler = _NonBlockingQueueHandler(queue.Queue(maxsize=100000))
+    handler.addFilter(SessionFilter())
+    logger.addHandler(handler)
+    try:
+        started = time.perf_counter()
+        for i in range(5000):
+            logger.info("📝 Interim: %s (chunk %d)", "habari za asubuhi", i, extra={"event": "interim"})
+        per_record = (time.perf_counter() - started) / 5000
+    finally:
+        logger.removeHandler(handler)
+    # Generous bound for slow CI machines; typically a few microseconds
+    assert per_record < 100e-6
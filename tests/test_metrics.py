@@ -0,0 +1,66 @@
+import asyncio
+import time
+import pytest
+from app.metrics import Registry, monitor_event_loop_lag
+
+
+def test_counters_and_labelled_gauges_render_as_prometheus_text():
+    registry = Registry()
+    errors = registry.counter("errors_total", "Errors", ("kind",))
+    errors.inc(1, "stream")
+    errors.inc(2, "stream")
+    registry.gauge("queue", "Queued", ("session",), function=lambda: {("a",): 3, ("b\"c",): 1})
+    
+    text = registry.render()
+    
+    assert "# TYPE errors_total counter" in text
+    assert 'errors_total{kind="stream"} 3' in text
+    assert 'queue{session="a"} 3' in text
+    assert 'queue{session="b\\"c"} 1' in text
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry()
+    latency = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 0.5, 1.0))
+    for value in (0.05, 0.1, 0.3, 2.0):
+        latency.observe(value)
+    
+    lines = registry.render().splitlines()
+    
+    assert 'latency_seconds_bucket{le="0.1"} 2' in lines
+    assert 'latency_seconds_bucket{le="0.5"} 3' in lines
+    assert 'latency_seconds_bucket{le="1.0"} 3' in lines
+    assert 'latency_seconds_bucket{le="+Inf"} 4' in lines
+    assert "latency_seconds_count 4" in lines
+    assert "latency_seconds_sum 2.45" in lines
+
+
+def test_failing_callback_does_not_break_the_scrape():
+    registry = Registry()
+    registry.gauge("broken", "Broken", function=lambda: 1 / 0)
+    registry.counter("ok_total", "Fine").inc()
+    assert "ok_total 1" in registry.render()
+
+
+@pytest.mark.asyncio
+async def test_event_loop_lag_is_measured():
+    from app.metrics import event_loop_lag
+    before = event_loop_lag.count
+    monitor = asyncio.create_task(monitor_event_loop_lag(0.01))
+    await asyncio.sleep(0.02)
+    time.sleep(0.05)  # Block the loop
+    await asyncio.sleep(0.03)
+    monitor.cancel()
+    
+    assert event_loop_lag.count > before
+    assert event_loop_lag.sum >= 0.03
+
+
+def test_metrics_endpoint():
+    from fastapi.testclient import TestClient
+    from app.main import app
+    response = TestClient(app).get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    for name in ("sauti_active_streams", "sauti_final_latency_seconds_bucket", "sauti_firebase_write_seconds_count"):
+        assert name in response.text
@@ -0,0 +1,64 @@
+import pytest
+from app.opus_stream import (
+    CompressedReplayBuffer, OggOpusParser, WebmOpusParser, opus_packet_ms,
+)
+from tests.opus_fixtures import (
+    OPUS_PACKET, ogg_header, ogg_opus, split, webm_cluster, webm_header, webm_opus,
+)
+
+
+def test_opus_packet_duration_from_toc():
+    assert opus_packet_ms(OPUS_PACKET) == 20
+    assert opus_packet_ms(bytes([0x08 | 0x01])) == 40  # SILK NB 20 ms, two frames
+    assert opus_packet_ms(bytes([0xF8 | 0x03, 3])) == 60  # Three 20 ms frames
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 100, 4096])
+def test_webm_clusters_found_across_any_chunking(chunk_size):
+    data = webm_opus(3.5, cluster_ms=1000)
+    parser = WebmOpusParser()
+    units = [unit for chunk in split(data, chunk_size) for unit in parser.feed(chunk)]
+    
+    assert parser.header == webm_header()
+    assert [start for start, _ in units] == [0, 1000, 2000, 3000]
+    assert data[units[1][1]:].startswith(webm_cluster(1000, 1000)[:4])
+    assert parser.end_ms == 3500
+
+
+@pytest.mark.parametrize("chunk_size", [1, 13, 4096])
+def test_ogg_pages_found_across_any_chunking(chunk_size):
+    data = ogg_opus(1.0, page_ms=200)
+    parser = OggOpusParser()
+    units = [unit for chunk in split(data, chunk_size) for unit in parser.feed(chunk)]
+    
+    assert parser.header == ogg_header()
+    assert [start for start, _ in units] == [0, 200, 400, 600, 800]
+    assert data[units[2][1]:units[2][1] + 4] == b"OggS"
+    assert parser.end_ms == 1000
+
+
+def test_replay_restarts_at_a_cluster_with_the_header():
+    bytes_per_second = 32000
+    data = webm_opus(4.0, cluster_ms=1000)
+    buffer = CompressedReplayBuffer("webm-opus", capacity_bytes=1 << 20, bytes_per_second=bytes_per_second)
+    for chunk in split(data, 500):
+        buffer.append(chunk)
+    
+    assert buffer.end_offset == 4 * bytes_per_second
+    # Unfinalized audio from 2.5 s on: replay has to start with the 2 s cluster
+    point = buffer.resume_point(int(2.5 * bytes_per_second))
+    assert point == 2 * bytes_per_second
+    replay = b"".join(bytes(chunk) for chunk in buffer.chunks_since(point))
+    assert replay == webm_header() + webm_cluster(2000, 1000) + webm_cluster(3000, 1000)
+
+
+def test_replay_window_is_bounded():
+    data = ogg_opus(10.0, page_ms=200)
+    buffer = CompressedReplayBuffer("ogg-opus", capacity_bytes=2000, bytes_per_second=32000)
+    for chunk in split(data, 300):
+        buffer.append(chunk)
+    
+    assert len(buffer) < 3000
+    assert buffer.start_offset > 0
+    replay = b"".join(bytes(chunk) for chunk in buffer.chunks_since(0))
+    assert replay.startswith(ogg_header() + b"OggS")
@@ -0,0 +1,64 @@
+import json
+from app.protocol import CompactDecoder, CompactEncoder
+
+
+def hypotheses(sentence):
+    """Interim hypotheses growing a word at a time, then the final"""
+    words = sentence.split()
+    for i in range(1, len(words) + 1):
+        yield {"type": "transcription", "transcript": " ".join(words[:i]), "isFinal": False,
+               "confidence": 0.0, "sessionId": "lecture-42"}
+    yield {"type": "transcription", "transcript": sentence, "isFinal": True,
+           "confidence": 0.91, "sessionId": "lecture-42"}
+
+
+SENTENCE = (
+    "today we are going to look at photosynthesis and how plants turn sunlight "
+    "water and carbon dioxide into the sugars they need to grow"
+)
+
+
+def test_round_trip_reproduces_every_result():
+    encoder, decoder = CompactEncoder(resync_every=5), CompactDecoder()
+    for message in hypotheses(SENTENCE):
+        decoded = decoder.decode(encoder.encode(message))
+        assert decoded["transcript"] == message["transcript"]
+        assert decoded["isFinal"] == message["isFinal"]
+
+
+def test_interims_are_sent_as_deltas_with_periodic_resync():
+    encoder = CompactEncoder(resync_every=5)
+    json_bytes = compact_bytes = 0
+    for message in hypotheses(SENTENCE):
+        json_bytes += len(json.dumps(message).encode())
+        compact_bytes += len(encoder.encode(message))
+    assert json_bytes / compact_bytes > 3
+
+
+def test_revised_hypothesis_keeps_only_the_common_prefix():
+    encoder, decoder = CompactEncoder(), CompactDecoder()
+    decoder.decode(encoder.encode({"type": "transcription", "transcript": "the cat sat", "isFinal": False}))
+    decoded = decoder.decode(encoder.encode({"type": "transcription", "transcript": "the cap is", "isFinal": False}))
+    assert decoded["transcript"] == "the cap is"
+
+
+def test_decoder_waits_for_resync_after_a_lost_frame():
+    encoder, decoder = CompactEncoder(resync_every=3), CompactDecoder()
+    frames = [encoder.encode(message) for message in hypotheses(SENTENCE)]
+    
+    decoder.decode(frames[0])
+    results = [decoder.decode(frame) for frame in frames[2:]]  # frames[1] lost
+    
+    assert decoder.gaps == 1
+    assert results[0] is None  # Delta against an unknown base
+    recovered = [r for r in results if r is not None]
+    assert recovered and all(
+        r["transcript"] == m["transcript"]
+        for r, m in zip(recovered, list(hypotheses(SENTENCE))[-len(recovered):])
+    )
+
+
+def test_other_messages_pass_through():
+    encoder, decoder = CompactEncoder(), CompactDecoder()
+    message = {"type": "rollover", "gapMs": 12, "count": 1, "sessionId": "s"}
+    assert decoder.decode(encoder.encode(message)) == message
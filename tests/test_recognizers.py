@@ -0,0 +1,106 @@
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from app.recognizers import (
+    GoogleRecognizer, LocalRecognizer, RecognitionOptions, create_recognizer, fallback_backend, is_fallback_error,
+)
+from tests.local_asr_fixtures import FakeKaldiFactory
+
+RATE = 16000
+
+
+def chunk(text: str, seconds: float = 0.1) -> bytes:
+    return text.encode().ljust(int(seconds * RATE) * 2, b"\0")
+
+
+@pytest.fixture
+def local():
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="test-asr")
+    factory = FakeKaldiFactory()
+    yield LocalRecognizer(engine_factory=factory, executor=executor), factory
+    executor.shutdown()
+
+
+def test_local_streaming_yields_interims_and_finals(local):
+    recognizer, factory = local
+    options = RecognitionOptions(sample_rate=RATE, interim_results=True)
+    audio = [chunk("hello"), chunk("class."), chunk("today"), chunk("")]
+
+    responses = list(recognizer.streaming_recognize(options, iter(audio)))
+    results = [result for response in responses for result in response.results]
+
+    assert [(r.alternatives[0].transcript, r.is_final) for r in results] == [
+        ("hello", False), ("hello class", True), ("today", False), ("today", True),
+    ]
+    final = results[1]
+    assert final.alternatives[0].confidence == pytest.approx(0.8)
+    assert [w.start_offset for w in final.alternatives[0].words] == [
+        datetime.timedelta(0), datetime.timedelta(seconds=0.1),
+    ]
+    assert final.result_end_offset == datetime.timedelta(seconds=0.2)
+    # Decoding ran on the worker pool, not the caller's thread
+    assert factory.engines[0].threads == {"test-asr_0"}
+
+
+def test_local_streaming_without_interims(local):
+    recognizer, _ = local
+    options = RecognitionOptions(sample_rate=RATE)
+    responses = list(recognizer.streaming_recognize(options, iter([chunk("a"), chunk("b")])))
+    assert [r.results[0].alternatives[0].transcript for r in responses] == ["a b"]
+
+
+def test_local_batch_recognize(local):
+    recognizer, _ = local
+    audio = chunk("one.", 0.5) + chunk("two", 0.5)
+    results = recognizer.recognize(audio, RecognitionOptions(sample_rate=RATE))
+    assert [r.alternatives[0].transcript for r in results] == ["one", "two"]
+    assert results[-1].result_end_offset == datetime.timedelta(seconds=1.0)
+
+
+def test_local_rejects_compressed_audio(local):
+    recognizer, _ = local
+    with pytest.raises(ValueError):
+        recognizer.recognize(b"", RecognitionOptions(encoding="webm-opus"))
+
+
+def test_google_streaming_sends_config_then_audio():
+    class FakeClient:
+        def streaming_recognize(self, requests):
+            self.requests = list(requests)
+            return iter([])
+
+    client = FakeClient()
+    recognizer = GoogleRecognizer("us", client)
+    options = RecognitionOptions(sample_rate=RATE, language_codes=["en-US", "sw-KE"], model="chirp_3")
+    list(recognizer.streaming_recognize(options, iter([b"ab", b"cd"])))
+
+    config = client.requests[0].streaming_config.config
+    assert client.requests[0].recognizer.endswith("/locations/us/recognizers/_")
+    assert list(config.language_codes) == ["en-US", "sw-KE"]
+    assert config.explicit_decoding_config.sample_rate_hertz == RATE
+    assert [request.audio for request in client.requests[1:]] == [b"ab", b"cd"]
+    recognizer.close()  # Not leased from the pool: nothing to release
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        create_recognizer("whisper")
+
+
+def test_misconfigured_fallback_is_ignored(monkeypatch):
+    from app.config import settings
+
+    monkeypatch.setattr(settings, "RECOGNIZER_FALLBACK", "locl")
+    assert fallback_backend() is None
+    monkeypatch.setattr(settings, "RECOGNIZER_FALLBACK", "local")
+    assert fallback_backend() == "local"
+    monkeypatch.setattr(settings, "RECOGNIZER_FALLBACK", "")
+    assert fallback_backend() is None
+
+
+def test_fallback_errors():
+    class ResourceExhausted(Exception):
+        pass
+
+    assert is_fallback_error(ResourceExhausted("quota"))
+    assert not is_fallback_error(RuntimeError("bad config"))
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+from app.resampler import StreamingResampler
+
+
+def tone(freq: float, rate: int, seconds: float = 1.0, channels: int = 1) -> bytes:
+    t = np.arange(int(rate * seconds)) / rate
+    samples = (10000 * np.sin(2 * np.pi * freq * t)).astype(np.int16)
+    return np.repeat(samples, channels).tobytes()
+
+
+def rms_ratio(audio: bytes) -> float:
+    """RMS relative to the input tone, ignoring filter edges"""
+    samples = np.frombuffer(audio, dtype=np.int16).astype(np.float64)[500:-500]
+    return np.sqrt(np.mean(samples ** 2)) / (10000 / np.sqrt(2))
+
+
+def stream(resampler, audio: bytes, chunk_bytes: int) -> bytes:
+    return b"".join(resampler.process(audio[i:i + chunk_bytes]) for i in range(0, len(audio), chunk_bytes))
+
+
+@pytest.mark.parametrize("input_rate", [48000, 44100, 8000])
+def test_streaming_matches_one_shot(input_rate):
+    """Chunk boundaries (even odd-sized ones) don't change the output"""
+    audio = tone(440, input_rate)
+    chunked = stream(StreamingResampler(input_rate, 16000), audio, 3001)
+    whole = StreamingResampler(input_rate, 16000).process(audio)
+    
+    assert chunked == whole
+    assert abs(len(whole) // 2 - 16000) < 32
+
+
+def test_passband_preserved_and_aliases_rejected():
+    resampler = StreamingResampler(48000, 16000)
+    assert rms_ratio(resampler.process(tone(1000, 48000))) == pytest.approx(1.0, abs=0.01)
+    
+    # 10 kHz can't be represented at 16 kHz and must not fold back as 6 kHz
+    resampler = StreamingResampler(48000, 16000)
+    assert rms_ratio(resampler.process(tone(10000, 48000))) < 0.01  # > 40 dB down
+
+
+def test_stereo_is_downmixed():
+    resampler = StreamingResampler(48000, 16000, channels=2)
+    out = stream(resampler, tone(1000, 48000, channels=2), 4801)
+    
+    assert abs(len(out) // 2 - 16000) < 32
+    assert rms_ratio(out) == pytest.approx(1.0, abs=0.01)
+
+
+def test_same_rate_mono_is_passthrough():
+    resampler = StreamingResampler(16000, 16000)
+    chunk = tone(440, 16000, 0.1)
+    assert resampler.process(chunk) is chunk
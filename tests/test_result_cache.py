@@ -0,0 +1,98 @@
+import asyncio
+import pytest
+from app.result_cache import ResultCache, cache_key
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self):
+        return self.now
+
+
+def test_key_covers_audio_and_config():
+    audio = b"\x01\x02" * 100
+    assert cache_key(audio, language="en-US", sample_rate=16000) == cache_key(audio, sample_rate=16000, language="en-US")
+    assert cache_key(audio, language="en-US") != cache_key(audio, language="sw-KE")
+    assert cache_key(audio, language="en-US") != cache_key(audio + b"\0", language="en-US")
+
+
+@pytest.mark.asyncio
+async def test_repeated_chunk_is_served_from_cache():
+    cache = ResultCache()
+    calls = []
+    async def recognize():
+        calls.append(1)
+        return "habari"
+    
+    for _ in range(3):
+        assert await cache.get_or_compute("k", recognize) == "habari"
+    
+    assert len(calls) == 1
+    assert cache.stats()["hits"] == 2
+    assert cache.stats()["hitRate"] == pytest.approx(0.667, abs=0.001)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_requests_share_one_call():
+    cache = ResultCache()
+    calls = []
+    async def recognize():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "karibu"
+    
+    results = await asyncio.gather(*(cache.get_or_compute("k", recognize) for _ in range(5)))
+    
+    assert results == ["karibu"] * 5
+    assert len(calls) == 1
+    assert cache.shared == 4
+
+
+@pytest.mark.asyncio
+async def test_caller_giving_up_does_not_cancel_the_shared_call():
+    cache = ResultCache()
+    async def recognize():
+        await asyncio.sleep(0.05)
+        return "asante"
+    
+    first = asyncio.create_task(cache.get_or_compute("k", recognize))
+    second = asyncio.create_task(cache.get_or_compute("k", recognize))
+    await asyncio.sleep(0.01)
+    first.cancel()
+    
+    assert await second == "asante"
+    assert cache.get("k") == (True, "asante")
+
+
+@pytest.mark.asyncio
+async def test_failures_are_not_cached():
+    cache = ResultCache()
+    attempts = []
+    async def flaky():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise ConnectionError("503")
+        return "sawa"
+    
+    with pytest.raises(ConnectionError):
+        await cache.get_or_compute("k", flaky)
+    assert await cache.get_or_compute("k", flaky) == "sawa"
+
+
+@pytest.mark.asyncio
+async def test_entries_expire_and_least_recently_used_is_evicted():
+    clock = FakeClock()
+    cache = ResultCache(max_entries=2, ttl_seconds=10, clock=clock)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)  # Evicts b, the least recently used
+    
+    assert cache.get("b") == (False, None)
+    assert cache.get("a") == (True, 1)
+    clock.now = 11
+    assert cache.get("c") == (False, None)
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["expirations"] == 1
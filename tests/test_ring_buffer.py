@@ -0,0 +1,22 @@
+from app.ring_buffer import AudioRingBuffer
+
+
+def test_ring_buffer_evicts_old_chunks():
+    """Whole chunks are evicted once at least `capacity_bytes` remain"""
+    buffer = AudioRingBuffer(capacity_bytes=10)
+    for chunk in (b"aaaa", b"bbbb", b"cccc", b"dddd"):
+        buffer.append(chunk)
+    
+    assert buffer.end_offset == 16
+    assert buffer.start_offset == 4
+    assert b"".join(buffer.chunks_since(0)) == b"bbbbccccdddd"
+
+
+def test_ring_buffer_replays_from_offset():
+    buffer = AudioRingBuffer(capacity_bytes=100)
+    for chunk in (b"aaaa", b"bbbb", b"cccc"):
+        buffer.append(chunk)
+    
+    chunks = [bytes(c) for c in buffer.chunks_since(6)]
+    assert chunks == [b"bb", b"cccc"]
+    assert list(buffer.chunks_since(12)) == []
@@ -0,0 +1,66 @@
+import asyncio
+import pytest
+from app.sessions import SessionRegistry
+
+
+class FakeStream:
+    def __init__(self):
+        self.stopped = False
+    
+    async def stop(self):
+        self.stopped = True
+
+
+@pytest.mark.asyncio
+async def test_resume_needs_the_matching_token_and_session():
+    registry = SessionRegistry(grace_seconds=5.0)
+    stream = FakeStream()
+    token = registry.register("s1", stream)
+    
+    assert registry.resume("s1", "not-the-token") is None
+    assert registry.resume("s2", token) is None
+    assert registry.resume("s1", token) is stream
+    assert registry.stats()["resumed"] == 1
+
+
+@pytest.mark.asyncio
+async def test_detached_session_survives_the_grace_period_if_resumed():
+    registry = SessionRegistry(grace_seconds=0.1)
+    stream = FakeStream()
+    token = registry.register("s1", stream)
+    
+    registry.detach(token, stream.stop)
+    assert registry.detached == 1
+    assert registry.resume("s1", token) is stream
+    assert registry.detached == 0
+    await asyncio.sleep(0.2)
+    
+    assert not stream.stopped
+    assert len(registry) == 1
+
+
+@pytest.mark.asyncio
+async def test_detached_session_expires():
+    registry = SessionRegistry(grace_seconds=0.05)
+    stream = FakeStream()
+    token = registry.register("s1", stream)
+    
+    registry.detach(token, stream.stop)
+    await asyncio.sleep(0.15)
+    
+    assert stream.stopped
+    assert registry.resume("s1", token) is None
+    assert registry.stats() == {"sessions": 0, "detached": 0, "resumed": 0, "expired": 1}
+
+
+@pytest.mark.asyncio
+async def test_no_grace_stops_at_once():
+    registry = SessionRegistry(grace_seconds=0)
+    stream = FakeStream()
+    token = registry.register("s1", stream)
+    
+    registry.detach(token, stream.stop)
+    await asyncio.sleep(0)
+    
+    assert stream.stopped
+    assert len(registry) == 0
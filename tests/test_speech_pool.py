@@ -0,0 +1,121 @@
+import grpc
+import pytest
+from concurrent import futures
+from app.speech_pool import SpeechChannelPool, speech_endpoint
+
+
+@pytest.fixture
+def grpc_server():
+    """Local gRPC server the pool can connect to"""
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=1))
+    port = server.add_insecure_port("localhost:0")
+    server.start()
+    yield f"localhost:{port}"
+    server.stop(None)
+
+
+def make_pool(target, size=2):
+    created = []
+    def factory():
+        channel = grpc.insecure_channel(target)
+        created.append(channel)
+        return channel
+    return SpeechChannelPool("test-endpoint", size=size, channel_factory=factory), created
+
+
+def test_speech_endpoint():
+    assert speech_endpoint("us") == "us-speech.googleapis.com"
+    assert speech_endpoint("global") == "speech.googleapis.com"
+
+
+def test_pool_is_bounded_and_spreads_leases(grpc_server):
+    """Sessions share a fixed number of channels, least-loaded first"""
+    pool, created = make_pool(grpc_server, size=2)
+    clients = [pool.acquire() for _ in range(6)]
+    
+    assert len(created) == 2
+    assert len({id(c) for c in clients}) == 2
+    assert pool.active_leases == 6
+    
+    for client in clients:
+        pool.release(client)
+    assert pool.active_leases == 0
+
+
+@pytest.mark.asyncio
+async def test_start_preconnects_channels(grpc_server):
+    pool, created = make_pool(grpc_server)
+    await pool.start(timeout=5.0)
+    
+    assert len(created) == 2
+    for channel in created:
+        states = []
+        channel.subscribe(states.append, try_to_connect=False)
+        channel.unsubscribe(states.append)
+        assert states[0] == grpc.ChannelConnectivity.READY
+    await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_health_check_replaces_dead_channels(grpc_server):
+    """Channels that can't connect are swapped for fresh ones"""
+    targets = ["localhost:1", grpc_server, grpc_server]
+    def factory():
+        return grpc.insecure_channel(targets.pop(0))
+    pool = SpeechChannelPool("test-endpoint", size=2, channel_factory=factory)
+    pool.acquire()
+    
+    replaced = await pool.health_check(timeout=0.5)
+    
+    assert replaced == 1
+    assert targets == []
+    assert await pool.health_check(timeout=2.0) == 0
+
+
+@pytest.mark.asyncio
+async def test_unhealthy_channel_with_streams_closes_after_the_last_one(grpc_server):
+    """A replaced channel stays open for its running streams, then closes"""
+    targets = ["localhost:1", grpc_server, grpc_server]
+    channels = []
+    def factory():
+        channel = grpc.insecure_channel(targets.pop(0))
+        channels.append(channel)
+        return channel
+    pool = SpeechChannelPool("test-endpoint", size=2, channel_factory=factory)
+    first, second = pool.acquire(), pool.acquire()
+    dead = channels[0]
+    closed = []
+    dead.close = lambda: closed.append(dead)
+    
+    assert await pool.health_check(timeout=0.5) == 1
+    assert closed == []
+    assert pool.active_leases == 2
+    
+    for client in (first, second):
+        pool.release(client)
+    assert closed == [dead]
+    assert pool.active_leases == 0
+    await pool.close()
+
+
+def test_recognizer_leases_a_channel_on_first_use(monkeypatch):
+    """Building a stream's recognizer on the event loop never opens channels"""
+    import app.recognizers
+    from app.recognizers import GoogleRecognizer
+    
+    class CountingPool:
+        leases = 0
+        def acquire(self):
+            self.leases += 1
+            return object()
+        def release(self, client):
+            self.leases -= 1
+    
+    pool = CountingPool()
+    monkeypatch.setattr(app.recognizers, "get_speech_pool", lambda region: pool)
+    recognizer = GoogleRecognizer("us")
+    assert pool.leases == 0
+    assert recognizer.client is recognizer.client
+    assert pool.leases == 1
+    recognizer.close()
+    assert pool.leases == 0
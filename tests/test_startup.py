@@ -0,0 +1,117 @@
+import os
+import subprocess
+import sys
+from fastapi.testclient import TestClient
+import app.config
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules a cold start must not pay for before the server is listening
+DEFERRED_MODULES = ("google.cloud.speech_v2", "google.cloud.speech_v1", "grpc", "firebase_admin")
+
+# Self time of the app's own modules; generous so slow CI machines pass, tight
+# enough to catch a client being built or a network call made at import
+APP_IMPORT_BUDGET_MS = 250
+
+
+def import_profile():
+    """Run `python -X importtime -c "import app.main"` in a clean interpreter"""
+    env = {
+        **os.environ,
+        "GCP_PROJECT_ID": "test",
+        "FIREBASE_DATABASE_URL": "https://test.firebaseio.com",
+        "FIREBASE_PROJECT_ID": "test",
+        "ALLOWED_ORIGINS": "http://localhost",
+        "GOOGLE_APPLICATION_CREDENTIALS": "/nonexistent/key.json",
+    }
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import os, app.main; print(os.environ['GOOGLE_APPLICATION_CREDENTIALS'])"],
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True, timeout=60,
+    )
+    assert result.returncode == 0, result.stderr[-2000:]
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        if self_us.strip().isdigit():
+            modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return result.stdout, modules
+
+
+def test_import_defers_heavy_clients():
+    stdout, modules = import_profile()
+    loaded = [name for name in modules if name.startswith(DEFERRED_MODULES)]
+    assert loaded == []
+    # Nothing printed at import (only the script's own line)
+    assert stdout.strip() == "/nonexistent/key.json"
+
+
+def test_import_starts_no_threads():
+    env = {
+        **os.environ,
+        "GCP_PROJECT_ID": "test",
+        "FIREBASE_DATABASE_URL": "https://test.firebaseio.com",
+        "FIREBASE_PROJECT_ID": "test",
+        "ALLOWED_ORIGINS": "http://localhost",
+    }
+    result = subprocess.run(
+        [sys.executable, "-c", "import threading, app.main; print([t.name for t in threading.enumerate()])"],
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True, timeout=60,
+    )
+    assert result.returncode == 0, result.stderr[-2000:]
+    # The log writer starts with the app's lifespan, not at import
+    assert result.stdout.strip() == "['MainThread']"
+
+
+def test_app_import_time_budget():
+    _, modules = import_profile()
+    app_ms = sum(self_us for name, (self_us, _) in modules.items() if name.split(".")[0] == "app") / 1000
+    print(f"app.main: {modules['app.main'][1] / 1000:.0f} ms cumulative, app modules {app_ms:.0f} ms self")
+    assert app_ms < APP_IMPORT_BUDGET_MS
+
+
+def test_apply_credentials_exports_once(monkeypatch):
+    # Set, then unset: monkeypatch restores the original state (usually unset)
+    # afterwards, so the exported path doesn't leak into later tests
+    monkeypatch.setenv("GOOGLE_APPLICATION_CREDENTIALS", "")
+    monkeypatch.delenv("GOOGLE_APPLICATION_CREDENTIALS")
+    monkeypatch.setattr(app.config.settings, "GOOGLE_APPLICATION_CREDENTIALS", "/keys/sa.json")
+    monkeypatch.setattr(app.config, "_credentials_applied", False)
+    app.config.apply_credentials()
+    assert os.environ["GOOGLE_APPLICATION_CREDENTIALS"] == "/keys/sa.json"
+    monkeypatch.setattr(app.config.settings, "GOOGLE_APPLICATION_CREDENTIALS", "/keys/other.json")
+    app.config.apply_credentials()
+    assert os.environ["GOOGLE_APPLICATION_CREDENTIALS"] == "/keys/sa.json"
+
+
+def test_readiness_separate_from_liveness(monkeypatch):
+    import app.main
+    client = TestClient(app.main.app)
+    monkeypatch.setitem(app.main.readiness, "speech", "pending")
+    monkeypatch.setitem(app.main.readiness, "firebase", "ready")
+
+    live = client.get("/health")
+    assert live.status_code == 200
+    assert live.json()["ready"] is False
+    ready = client.get("/health/ready")
+    assert ready.status_code == 503
+    assert ready.json()["checks"] == {"speech": "pending", "firebase": "ready"}
+
+    monkeypatch.setitem(app.main.readiness, "speech", "ready")
+    assert client.get("/health/ready").status_code == 200
+    assert client.get("/health").json()["ready"] is True
+
+
+def test_not_ready_while_draining(monkeypatch):
+    import app.main
+    from app.admission import admission
+    client = TestClient(app.main.app)
+    for check in app.main.readiness:
+        monkeypatch.setitem(app.main.readiness, check, "ready")
+    monkeypatch.setattr(admission, "draining", True)
+    
+    ready = client.get("/health/ready")
+    assert ready.status_code == 503
+    assert ready.json()["status"] == "draining"
+    assert client.get("/health").json()["capacity"]["available"] == 0
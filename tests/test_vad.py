@@ -0,0 +1,77 @@
+import numpy as np
+from app.vad import VoiceActivityGate
+
+RATE = 16000
+
+
+def tone(seconds: float, amplitude: int) -> bytes:
+    t = np.arange(int(seconds * RATE)) / RATE
+    return (amplitude * np.sin(2 * np.pi * 220 * t)).astype(np.int16).tobytes()
+
+
+def noise(seconds: float, amplitude: int = 30) -> bytes:
+    rng = np.random.default_rng(0)
+    return rng.integers(-amplitude, amplitude, int(seconds * RATE), dtype=np.int16).tobytes()
+
+
+def feed(gate, audio: bytes, chunk_bytes: int = 3200):
+    results = [gate.process(audio[i:i + chunk_bytes]) for i in range(0, len(audio), chunk_bytes)]
+    return b"".join(r.audio for r in results), results
+
+
+def test_vad_keeps_speech_with_preroll_and_hangover():
+    gate = VoiceActivityGate(RATE, preroll_ms=200, hangover_ms=300, suspend_after_s=0)
+    speech = tone(1.0, 6000)
+    audio = noise(1.0) + speech + noise(1.0)
+    
+    out, _ = feed(gate, audio)
+    
+    # Speech plus ~200 ms before and ~300 ms after
+    assert speech in out
+    expected = len(speech) + int(0.2 * RATE) * 2 + int(0.3 * RATE) * 2
+    assert abs(len(out) - expected) <= gate.frame_bytes * 2
+    assert out.startswith(audio[len(noise(1.0)) - int(0.2 * RATE) * 2:][:gate.frame_bytes])
+
+
+def test_vad_reports_suppressed_share():
+    gate = VoiceActivityGate(RATE, preroll_ms=0, hangover_ms=0, suspend_after_s=0)
+    feed(gate, noise(3.0) + tone(1.0, 6000))
+    
+    assert 74.0 < gate.suppressed_percent < 76.0
+
+
+def test_vad_signals_suspend_once_per_silence():
+    gate = VoiceActivityGate(RATE, suspend_after_s=1.0)
+    _, results = feed(gate, tone(0.5, 6000) + noise(3.0) + tone(0.5, 6000) + noise(3.0))
+    
+    assert sum(r.suspend for r in results) == 2
+
+
+def test_vad_handles_odd_chunk_sizes():
+    """Partial frames are carried over to the next chunk"""
+    gate = VoiceActivityGate(RATE, preroll_ms=0, hangover_ms=0, suspend_after_s=0)
+    speech = tone(1.0, 6000)
+    out, _ = feed(gate, speech, chunk_bytes=1234)
+    
+    assert out == speech[:len(out)]
+    assert len(speech) - len(out) < gate.frame_bytes
+
+
+def test_vad_maps_forwarded_offsets_back_to_the_lecture():
+    """Positions in the gated audio map to where they were in the input"""
+    gate = VoiceActivityGate(RATE, preroll_ms=100, hangover_ms=100, suspend_after_s=0)
+    first, second = tone(0.5, 6000), tone(0.5, 7000)
+    audio = noise(1.0) + first + noise(2.0) + second
+    out, _ = feed(gate, audio, chunk_bytes=1000)
+    
+    for burst in (first, second):
+        in_offset = audio.index(burst)
+        out_offset = out.index(burst)
+        assert gate.input_offset(out_offset) == in_offset
+        assert gate.input_offset(out_offset + 1600) == in_offset + 1600
+    # A span ending where forwarding resumes ends before the pause
+    resume = gate._resume_out[-1]
+    assert gate.input_offset(resume, end=True) == gate.input_offset(resume - 2) + 2
+    # The 2 s pause is back in the lecture's timeline
+    gap = gate.input_offset(out.index(second)) - gate.input_offset(out.index(first) + len(first))
+    assert gap == len(noise(2.0))
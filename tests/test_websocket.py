@@ -0,0 +1,882 @@
+import asyncio
+import datetime
+import json
+import time
+import pytest
+from google.cloud.speech_v2.types import cloud_speech
+from app.config import settings
+from app.recognizers import LocalRecognizer
+from app.websocket import TranscriptionStream
+from tests.local_asr_fixtures import FakeKaldiFactory
+
+
+class FakeWebSocket:
+    """Collects messages the stream sends back to the client"""
+    def __init__(self):
+        self.messages = []
+    
+    async def send_json(self, data):
+        self.messages.append(data)
+    
+    async def send_bytes(self, data):
+        self.messages.append(data)
+
+
+class FakeStreamingRecognizer:
+    """
+    Blocking stand-in for SpeechClient.streaming_recognize.
+    Sleeps `delay` seconds per audio request, like a slow upstream would.
+    """
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+    
+    def streaming_recognize(self, requests):
+        for request in requests:
+            if not request.audio:
+                continue  # config request
+            time.sleep(self.delay)
+            yield cloud_speech.StreamingRecognizeResponse(results=[
+                cloud_speech.StreamingRecognitionResult(
+                    alternatives=[cloud_speech.SpeechRecognitionAlternative(
+                        transcript=request.audio.decode()
+                    )],
+                    is_final=False,
+                )
+            ])
+
+
+@pytest.fixture(autouse=True)
+def raw_audio(monkeypatch):
+    """Fake chunks below are labels, not speech: don't resample, gate or re-frame them"""
+    monkeypatch.setattr(settings, "SPEECH_TARGET_SAMPLE_RATE", settings.SPEECH_SAMPLE_RATE)
+    monkeypatch.setattr(settings, "VAD_ENABLED", False)
+    monkeypatch.setattr(settings, "AUDIO_FRAME_MS", 0)
+
+
+class RecordingPublisher:
+    """Stands in for the background Firebase writer"""
+    def __init__(self):
+        self.updates = []
+    
+    def enqueue(self, updates):
+        self.updates.append(dict(updates))
+
+
+@pytest.fixture(autouse=True)
+def firebase_writes(monkeypatch):
+    """Keep queued Realtime DB writes in memory"""
+    import app.firebase_client
+    recorder = RecordingPublisher()
+    monkeypatch.setattr(app.firebase_client, "publisher", recorder)
+    return recorder
+
+
+@pytest.fixture
+def published(monkeypatch):
+    """Record Firebase publishes instead of hitting the Realtime DB"""
+    import app.firebase_client
+    captions = []
+    async def fake_publish(session_id, caption_text, updates=None):
+        captions.append((session_id, caption_text))
+    monkeypatch.setattr(app.firebase_client, "publish_caption", fake_publish)
+    return captions
+
+
+def transcripts(websocket):
+    return [m["transcript"] for m in websocket.messages if m["type"] == "transcription"]
+
+
+@pytest.mark.asyncio
+async def test_stream_forwards_audio_and_results():
+    """Audio chunks reach the recognizer and results reach the WebSocket"""
+    websocket = FakeWebSocket()
+    stream = TranscriptionStream(websocket, "session-1", client=FakeStreamingRecognizer())
+    task = asyncio.create_task(stream.start())
+    
+    for i in range(3):
+        await stream.send_audio(f"chunk-{i}".encode())
+    await stream.stop()
+    await asyncio.wait_for(task, timeout=2.0)
+    
+    assert transcripts(websocket) == ["chunk-0", "chunk-1", "chunk-2"]
+
+
+@pytest.mark.asyncio
+async def test_compact_protocol_sends_binary_frames():
+    """?protocol=compact: MessagePack frames that decode to the same results"""
+    from app.protocol import CompactDecoder
+    websocket = FakeWebSocket()
+    stream = TranscriptionStream(websocket, "session-c", client=FakeStreamingRecognizer(), protocol="compact")
+    task = asyncio.create_task(stream.start())
+    
+    for i in range(3):
+        await stream.send_audio(f"chunk-{i}".encode())
+    await stream.stop()
+    await asyncio.wait_for(task, timeout=2.0)
+    
+    assert all(isinstance(frame, bytes) for frame in websocket.messages)
+    decoder = CompactDecoder()
+    decoded = [decoder.decode(frame) for frame in websocket.messages]
+    assert [m["transcript"] for m in decoded] == ["chunk-0", "chunk-1", "chunk-2"]
+    assert decoder.gaps == 0
+
+
+@pytest.mark.asyncio
+async def test_results_are_fanned_out_to_viewers():
+    """Students watching the session get the lecturer's results in-process"""
+    from app.caption_hub import hub
+    viewer = hub.subscribe("session-viewed")
+    stream = TranscriptionStream(FakeWebSocket(), "session-viewed", client=FakeStreamingRecognizer())
+    task = asyncio.create_task(stream.start())
+    
+    try:
+        await stream.send_audio(b"karibu")
+        message = json.loads(await asyncio.wait_for(viewer.get(), timeout=2.0))
+    finally:
+        hub.unsubscribe(viewer)
+        await stream.stop()
+        await asyncio.wait_for(task, timeout=2.0)
+    
+    assert message["transcript"] == "karibu"
+    assert message["sessionId"] == "session-viewed"
+
+
+@pytest.mark.asyncio
+async def test_slow_upstream_does_not_block_other_sessions():
+    """A recognizer blocking for seconds must not delay another classroom"""
+    slow_ws, fast_ws = FakeWebSocket(), FakeWebSocket()
+    slow = TranscriptionStream(slow_ws, "slow", client=FakeStreamingRecognizer(delay=1.0))
+    fast = TranscriptionStream(fast_ws, "fast", client=FakeStreamingRecognizer())
+    slow_task = asyncio.create_task(slow.start())
+    fast_task = asyncio.create_task(fast.start())
+    
+    await slow.send_audio(b"slow-0")
+    started = time.monotonic()
+    for i in range(5):
+        await fast.send_audio(f"fast-{i}".encode())
+    while len(transcripts(fast_ws)) < 5 and time.monotonic() - started < 2.0:
+        await asyncio.sleep(0.01)
+    elapsed = time.monotonic() - started
+    
+    assert transcripts(fast_ws) == [f"fast-{i}" for i in range(5)]
+    assert elapsed < 0.5
+    assert transcripts(slow_ws) == []  # still blocked upstream
+    
+    await fast.stop()
+    await slow.stop()
+    await asyncio.wait_for(asyncio.gather(fast_task, slow_task), timeout=3.0)
+    assert transcripts(slow_ws) == ["slow-0"]
+
+
+@pytest.mark.asyncio
+async def test_upstream_error_is_reported_to_client():
+    """Errors raised on the bridge thread surface as an error frame"""
+    class FailingRecognizer:
+        def streaming_recognize(self, requests):
+            next(iter(requests))
+            raise RuntimeError("quota exceeded")
+    
+    websocket = FakeWebSocket()
+    stream = TranscriptionStream(websocket, "session-err", client=FailingRecognizer())
+    await asyncio.wait_for(stream.start(), timeout=2.0)
+    
+    assert websocket.messages[-1] == {"type": "error", "message": "quota exceeded"}
+
+
+def finals(websocket):
+    return [m["transcript"] for m in websocket.messages if m["type"] == "transcription" and m["isFinal"]]
+
+
+@pytest.mark.asyncio
+async def test_stream_runs_offline_on_local_recognizer():
+    """The streaming path works end to end without Speech"""
+    websocket = FakeWebSocket()
+    recognizer = LocalRecognizer(engine_factory=FakeKaldiFactory())
+    stream = TranscriptionStream(websocket, "offline", recognizer=recognizer)
+    task = asyncio.create_task(stream.start())
+    
+    for label in (b"habari", b"yako.", b"asante"):
+        await stream.send_audio(label)
+    await stream.stop()
+    await asyncio.wait_for(task, timeout=2.0)
+    
+    assert finals(websocket) == ["habari yako", "asante"]
+    assert "habari" in transcripts(websocket)  # interim before the endpoint
+
+
+
+@pytest.mark.asyncio
+async def test_final_blanks_the_interim_in_the_same_write(firebase_writes):
+    websocket = FakeWebSocket()
+    recognizer = LocalRecognizer(engine_factory=FakeKaldiFactory())
+    stream = TranscriptionStream(websocket, "one-write", recognizer=recognizer)
+    task = asyncio.create_task(stream.start())
+    
+    await stream.send_audio(b"habari")
+    await asyncio.sleep(0.3)  # The interim is written after its debounce
+    await stream.send_audio(b"yako.")
+    await stream.stop()
+    await asyncio.wait_for(task, timeout=2.0)
+    
+    interims = [batch["captions/one-write/interim"]["text"] for batch in firebase_writes.updates
+                if "captions/one-write/interim" in batch]
+    assert interims == ["habari", ""]
+    final = next(batch for batch in firebase_writes.updates if "captions/one-write/latest" in batch)
+    assert final["captions/one-write/interim"]["text"] == ""
+
+def test_local_recognizer_refuses_opus_sessions():
+    with pytest.raises(ValueError):
+        TranscriptionStream(
+            FakeWebSocket(), "opus", recognizer=LocalRecognizer(engine_factory=FakeKaldiFactory()), encoding="webm-opus",
+        )
+
+
+class ResourceExhausted(Exception):
+    """Named like google.api_core's quota error"""
+
+
+@pytest.mark.asyncio
+async def test_session_falls_back_when_speech_quota_runs_out(monkeypatch):
+    import app.websocket
+    class ExhaustedRecognizer:
+        def streaming_recognize(self, requests):
+            requests = iter(requests)
+            next(requests)  # config
+            next(requests)  # first audio
+            raise ResourceExhausted("quota exceeded")
+    
+    monkeypatch.setattr(settings, "RECOGNIZER_FALLBACK", "local")
+    factory = FakeKaldiFactory()
+    monkeypatch.setattr(
+        app.websocket, "create_recognizer", lambda backend=None, region=None: LocalRecognizer(engine_factory=factory)
+    )
+    websocket = FakeWebSocket()
+    stream = TranscriptionStream(websocket, "fallback", client=ExhaustedRecognizer())
+    task = asyncio.create_task(stream.start())
+    
+    await stream.send_audio(b"good")
+    for _ in range(200):
+        if any(m["type"] == "recognizer" for m in websocket.messages):
+            break
+        await asyncio.sleep(0.01)
+    await stream.send_audio(b"morning.")
+    await stream.stop()
+    await asyncio.wait_for(task, timeout=2.0)
+    
+    assert {"type": "recognizer", "backend": "local", "reason": "ResourceExhausted", "sessionId": "fallback"} in websocket.messages
+    # Audio sent before the failure was replayed into the fallback engine
+    assert finals(websocket) == ["good morning"]
+    assert not any(m["type"] == "error" for m in websocket.messages)
+
+
+
+@pytest.mark.asyncio
+async def test_misconfigured_fallback_does_not_reject_sessions(monkeypatch):
+    monkeypatch.setattr(settings, "RECOGNIZER_FALLBACK", "locl")
+    websocket = FakeWebSocket()
+    stream = TranscriptionStream(websocket, "typo", client=FakeStreamingRecognizer())
+    task = asyncio.create_task(stream.start())
+
+    await stream.send_audio(b"chunk")
+    await stream.stop()
+    await asyncio.wait_for(task, timeout=2.0)
+
+    assert stream._fallback is None
+    assert transcripts(websocket) == ["chunk"]
+
+CHUNK_BYTES = 4800  # 50 ms of 48 kHz LINEAR16 audio
+
+
+def labelled_chunk(i: int) -> bytes:
+    return f"w{i:03d}".encode().ljust(CHUNK_BYTES, b"\0")
+
+
+class FakeFinalizingRecognizer:
+    """
+    Emits a final with word offsets every `final_every` chunks, and flushes
+    the unfinalized remainder when the request stream is half-closed.
+    """
+    def __init__(self, final_every: int = 3):
+        self.final_every = final_every
+        self.streams = []  # Labels received by each upstream stream
+    
+    def streaming_recognize(self, requests):
+        received = []
+        self.streams.append(received)
+        pending = []
+        offset = 0.0
+        chunk_seconds = CHUNK_BYTES / (settings.SPEECH_SAMPLE_RATE * 2)
+        
+        def final():
+            words = [
+                cloud_speech.WordInfo(
+                    word=label,
+                    start_offset=datetime.timedelta(seconds=start),
+                    end_offset=datetime.timedelta(seconds=start + chunk_seconds),
+                )
+                for label, start in pending
+            ]
+            pending.clear()
+            return cloud_speech.StreamingRecognizeResponse(results=[
+                cloud_speech.StreamingRecognitionResult(
+                    alternatives=[cloud_speech.SpeechRecognitionAlternative(
+                        transcript=" ".join(w.word for w in words), words=words,
+                    )],
+                    is_final=True,
+                    result_end_offset=datetime.timedelta(seconds=offset),
+                )
+            ])
+        
+        for request in requests:
+            if not request.audio:
+                continue
+            label = request.audio.rstrip(b"\0").decode()
+            received.append(label)
+            pending.append((label, offset))
+            offset += chunk_seconds
+            if len(pending) >= self.final_every:
+                yield final()
+        if pending:
+            yield final()
+
+
+@pytest.mark.asyncio
+async def test_rollover_replays_tail_without_duplicate_finals(monkeypatch, published, firebase_writes):
+    """Long sessions move to a new upstream stream with no lost or repeated words"""
+    from app.metrics import final_latency
+    finals_measured = final_latency.count
+    monkeypatch.setattr(settings, "FIREBASE_SEGMENT_SIZE", 2)
+    monkeypatch.setattr(settings, "STREAM_ROLLOVER_SECONDS", 0.3)
+    monkeypatch.setattr(settings, "STREAM_ROLLOVER_OVERLAP_SECONDS", 0.1)
+    recognizer = FakeFinalizingRecognizer(final_every=4)
+    websocket = FakeWebSocket()
+    stream = TranscriptionStream(websocket, "long-lecture", client=recognizer)
+    task = asyncio.create_task(stream.start())
+    
+    for i in range(20):
+        await stream.send_audio(labelled_chunk(i))
+        await asyncio.sleep(0.025)
+    await stream.stop()
+    await asyncio.wait_for(task, timeout=3.0)
+    
+    expected = [f"w{i:03d}" for i in range(20)]
+    finals = [m["transcript"] for m in websocket.messages if m["type"] == "transcription" and m["isFinal"]]
+    assert " ".join(finals).split() == expected
+    assert " ".join(text for _, text in published).split() == expected
+    
+    # The durable transcript holds every word once, with session-relative timings
+    entries = {
+        path: value
+        for batch in firebase_writes.updates
+        for path, value in batch.items()
+        if "/segments/" in path
+    }
+    ordered = [entries[path] for path in sorted(entries)]
+    assert [entry["seq"] for entry in ordered] == list(range(len(finals)))
+    assert all(path.split("/")[3] == f"seg{entry['seq'] // 2:06d}" for path, entry in entries.items())
+    words = [word for entry in ordered for word in entry["words"]]
+    assert [word["w"] for word in words] == expected
+    starts = [word["s"] for word in words]
+    assert starts == sorted(starts) and len(set(starts)) == len(starts)
+    
+    # Caption cues cover every word once, in order, without overlapping
+    from app.caption_cues import cue_tracks
+    cues = cue_tracks.get("long-lecture").cues
+    assert " ".join(cue.text for cue in cues).split() == expected
+    assert all(a.end_ms <= b.start_ms for a, b in zip(cues, cues[1:]))
+    
+    assert len(recognizer.streams) >= 2
+    # The second stream starts with audio the first had not finalized yet
+    second = recognizer.streams[1]
+    assert second[0] in recognizer.streams[0]
+    assert second[-1] == "w019"
+    
+    # Every final's latency from audio arrival was measured
+    assert final_latency.count - finals_measured >= len(finals)
+    
+    rollovers = [m for m in websocket.messages if m["type"] == "rollover"]
+    assert rollovers and all(m["gapMs"] < 300 for m in rollovers)
+    assert len(stream.rollover_gaps_ms) == len(rollovers)
+
+
+def pcm(seconds: float, amplitude: int) -> bytes:
+    """Mono int16 tone at the session sample rate (amplitude 0 = silence)"""
+    import numpy as np
+    rate = settings.SPEECH_SAMPLE_RATE
+    t = np.arange(int(seconds * rate)) / rate
+    return (amplitude * np.sin(2 * np.pi * 220 * t)).astype(np.int16).tobytes()
+
+
+class RecordingRecognizer:
+    """Counts audio bytes received per upstream stream"""
+    def __init__(self):
+        self.streams = []
+    
+    def streaming_recognize(self, requests):
+        self.streams.append(0)
+        index = len(self.streams) - 1
+        for request in requests:
+            self.streams[index] += len(request.audio)
+        return iter(())
+
+
+@pytest.mark.asyncio
+async def test_vad_drops_silence_and_suspends_upstream(monkeypatch):
+    """Only speech reaches Speech; a long silence closes the stream until speech resumes"""
+    monkeypatch.setattr(settings, "VAD_ENABLED", True)
+    monkeypatch.setattr(settings, "VAD_SUSPEND_AFTER_SECONDS", 1.0)
+    recognizer = RecordingRecognizer()
+    websocket = FakeWebSocket()
+    stream = TranscriptionStream(websocket, "quiet-class", client=recognizer)
+    task = asyncio.create_task(stream.start())
+    
+    speech, silence = pcm(0.1, 8000), pcm(0.1, 0)
+    for chunk in [silence] * 5 + [speech] * 5 + [silence] * 20 + [speech] * 5:
+        await stream.send_audio(chunk)
+    await asyncio.sleep(0.05)
+    await stream.stop()
+    await asyncio.wait_for(task, timeout=2.0)
+    
+    # Upstream reopened for the second burst of speech
+    # Speech plus pre-roll, and the hangover after the first burst
+    bytes_per_ms = settings.SPEECH_SAMPLE_RATE * 2 // 1000
+    preroll = settings.VAD_PREROLL_MS * bytes_per_ms
+    hangover = settings.VAD_HANGOVER_MS * bytes_per_ms
+    assert recognizer.streams == [
+        len(speech) * 5 + preroll + hangover,
+        len(speech) * 5 + preroll,
+    ]
+    assert stream.vad.suppressed_percent == pytest.approx(40.0)
+    stats = websocket.messages[-1]
+    assert stats["type"] == "stats"
+    assert stats["audioSuppressedPercent"] == round(stream.vad.suppressed_percent, 1)
+
+
+class WordPerRequestRecognizer:
+    """Finalizes one word per audio request, timed within the stream it heard"""
+    def streaming_recognize(self, requests):
+        bytes_per_second = settings.SPEECH_TARGET_SAMPLE_RATE * 2
+        heard = 0
+        for request in requests:
+            if not request.audio:
+                continue
+            start, heard = heard, heard + len(request.audio)
+            word = cloud_speech.WordInfo(
+                word="na",
+                start_offset=datetime.timedelta(seconds=start / bytes_per_second),
+                end_offset=datetime.timedelta(seconds=heard / bytes_per_second),
+            )
+            yield cloud_speech.StreamingRecognizeResponse(results=[
+                cloud_speech.StreamingRecognitionResult(
+                    alternatives=[cloud_speech.SpeechRecognitionAlternative(transcript=word.word, words=[word])],
+                    is_final=True,
+                    result_end_offset=word.end_offset,
+                )
+            ])
+
+
+@pytest.mark.asyncio
+async def test_caption_cues_keep_the_silence_the_vad_dropped(monkeypatch, firebase_writes):
+    """Cue times are positions in the lecture, and a long pause starts a new cue"""
+    from app.caption_cues import cue_tracks
+    monkeypatch.setattr(settings, "VAD_ENABLED", True)
+    stream = TranscriptionStream(FakeWebSocket(), "paused-lecture", client=WordPerRequestRecognizer())
+    task = asyncio.create_task(stream.start())
+    
+    speech, silence = pcm(0.1, 8000), pcm(0.1, 0)
+    for chunk in [silence] * 10 + [speech] * 10 + [silence] * 30 + [speech] * 10:
+        await stream.send_audio(chunk)
+    await asyncio.sleep(0.05)
+    await stream.stop()
+    await asyncio.wait_for(task, timeout=2.0)
+    
+    cues = cue_tracks.get("paused-lecture").cues
+    # Each burst starts its own cue, pre-roll before the speech
+    preroll = settings.VAD_PREROLL_MS
+    assert [cue.start_ms for cue in cues] == [1000 - preroll, 5000 - preroll]
+    assert cues[0].end_ms <= 2000 + settings.VAD_HANGOVER_MS + 1000
+    
+    # The durable transcript uses the same lecture clock
+    entries = [
+        value
+        for batch in firebase_writes.updates
+        for path, value in batch.items()
+        if "/segments/" in path
+    ]
+    starts = sorted(word["s"] for entry in entries for word in entry["words"])
+    assert starts[0] == 1000 - preroll
+    assert 5000 - preroll in starts
+    assert not [s for s in starts if 2000 + settings.VAD_HANGOVER_MS < s < 5000 - preroll]
+
+
+@pytest.mark.asyncio
+async def test_incoming_audio_is_resampled_for_speech(monkeypatch):
+    """48 kHz client audio reaches Speech as 16 kHz LINEAR16"""
+    monkeypatch.setattr(settings, "SPEECH_TARGET_SAMPLE_RATE", 16000)
+    recognizer = RecordingRecognizer()
+    stream = TranscriptionStream(FakeWebSocket(), "resampled", client=recognizer)
+    task = asyncio.create_task(stream.start())
+    
+    for _ in range(10):
+        await stream.send_audio(pcm(0.1, 8000))
+    await stream.stop()
+    await asyncio.wait_for(task, timeout=2.0)
+    
+    sent = recognizer.streams[0]
+    assert abs(sent - 16000 * 2) < 64
+    config = stream.recognizer.streaming_config_request(stream.options).streaming_config.config.explicit_decoding_config
+    assert config.sample_rate_hertz == 16000
+
+
+@pytest.mark.asyncio
+async def test_worklet_chunks_are_framed_for_speech(monkeypatch):
+    """128-sample worklet chunks reach Speech as 100 ms frames; a stalled tail waits at most max-hold"""
+    monkeypatch.setattr(settings, "AUDIO_FRAME_MS", 100)
+    monkeypatch.setattr(settings, "AUDIO_FRAME_MAX_HOLD_MS", 30)
+    
+    class FrameRecorder:
+        def __init__(self):
+            self.frames = []
+        
+        def streaming_recognize(self, requests):
+            for request in requests:
+                if request.audio:
+                    self.frames.append(len(request.audio))
+            return iter(())
+    
+    recognizer = FrameRecorder()
+    websocket = FakeWebSocket()
+    stream = TranscriptionStream(websocket, "worklet", client=recognizer)
+    task = asyncio.create_task(stream.start())
+    
+    frame = settings.SPEECH_SAMPLE_RATE * 2 // 10
+    worklet_chunk = pcm(128 / settings.SPEECH_SAMPLE_RATE, 8000)
+    chunks = 2 * frame // len(worklet_chunk) + 1
+    for _ in range(chunks):
+        await stream.send_audio(worklet_chunk)
+    await asyncio.sleep(0.1)
+    # The tail went out after max-hold, before the session ended
+    assert recognizer.frames == [frame, frame, chunks * len(worklet_chunk) - 2 * frame]
+    await stream.stop()
+    await asyncio.wait_for(task, timeout=2.0)
+    
+    assert stream.framer.chunks_in == chunks
+    stats = websocket.messages[-1]
+    assert stats["type"] == "stats"
+    assert stats["messagesPerSecondIn"] > stats["messagesPerSecondUpstream"] > 0
+
+
+class StalledRecognizer:
+    """Takes the config request, then stops reading audio until released"""
+    def __init__(self):
+        import threading
+        self.release = threading.Event()
+    
+    def streaming_recognize(self, requests):
+        requests = iter(requests)
+        next(requests)
+        self.release.wait(timeout=5.0)
+        for _ in requests:
+            pass
+        return iter(())
+
+
+@pytest.mark.asyncio
+async def test_drop_oldest_policy_bounds_memory_and_signals_client(monkeypatch):
+    monkeypatch.setattr(settings, "AUDIO_OVERLOAD_POLICY", "drop_oldest")
+    monkeypatch.setattr(settings, "AUDIO_QUEUE_MAX_SECONDS", 0.5)
+    monkeypatch.setattr(settings, "UPSTREAM_MAX_PENDING_SECONDS", 0.2)
+    recognizer = StalledRecognizer()
+    websocket = FakeWebSocket()
+    stream = TranscriptionStream(websocket, "overloaded", client=recognizer)
+    task = asyncio.create_task(stream.start())
+    
+    chunk = pcm(0.1, 8000)
+    for _ in range(30):
+        await asyncio.wait_for(stream.send_audio(chunk), timeout=0.5)  # never blocks
+    
+    assert stream.audio_queue.pending_bytes <= 0.5 * stream.bytes_per_second
+    overload = [m for m in websocket.messages if m["type"] == "overload"]
+    assert overload and overload[0]["policy"] == "drop_oldest"
+    assert overload[0]["droppedMs"] > 0
+    
+    recognizer.release.set()
+    await stream.stop()
+    await asyncio.wait_for(task, timeout=3.0)
+
+
+@pytest.mark.asyncio
+async def test_block_policy_pauses_the_sender(monkeypatch):
+    monkeypatch.setattr(settings, "AUDIO_OVERLOAD_POLICY", "block")
+    monkeypatch.setattr(settings, "AUDIO_QUEUE_MAX_SECONDS", 0.5)
+    monkeypatch.setattr(settings, "UPSTREAM_MAX_PENDING_SECONDS", 0.2)
+    recognizer = StalledRecognizer()
+    stream = TranscriptionStream(FakeWebSocket(), "backpressure", client=recognizer)
+    task = asyncio.create_task(stream.start())
+    
+    chunk = pcm(0.1, 8000)
+    with pytest.raises(asyncio.TimeoutError):
+        for _ in range(30):
+            await asyncio.wait_for(stream.send_audio(chunk), timeout=0.5)
+    assert stream.audio_queue.pending_bytes <= 0.5 * stream.bytes_per_second
+    
+    recognizer.release.set()
+    await stream.stop()
+    await asyncio.wait_for(task, timeout=3.0)
+
+
+
+@pytest.mark.asyncio
+async def test_block_policy_keeps_the_held_frame_at_stop(monkeypatch):
+    """The partial frame at the end of a lecture is queued even if the queue is full"""
+    monkeypatch.setattr(settings, "AUDIO_OVERLOAD_POLICY", "block")
+    monkeypatch.setattr(settings, "AUDIO_QUEUE_MAX_SECONDS", 0.2)
+    monkeypatch.setattr(settings, "AUDIO_FRAME_MS", 100)
+    stream = TranscriptionStream(FakeWebSocket(), "full-at-stop", client=FakeStreamingRecognizer())
+    while stream.audio_queue.has_room(stream.framer.frame_bytes):
+        stream.audio_queue.put_nowait(pcm(0.1, 8000))
+    tail = pcm(0.02, 8000)
+    assert stream.framer.push(tail) == []
+
+    await stream.stop()
+
+    queued = [stream.audio_queue._items[i] for i in range(stream.audio_queue.qsize())]
+    assert queued[-2:] == [tail, None]
+
+class ClientWebSocket(FakeWebSocket):
+    """Drives websocket_transcribe like a lecturer's browser would"""
+    def __init__(self):
+        super().__init__()
+        self.incoming = asyncio.Queue()
+        self.closed = False
+    
+    async def accept(self):
+        pass
+    
+    async def receive(self):
+        return await self.incoming.get()
+    
+    async def close(self, code=1000):
+        self.closed = True
+    
+    def send_audio(self, audio: bytes):
+        self.incoming.put_nowait({"type": "websocket.receive", "bytes": audio})
+    
+    def send_stop(self):
+        self.incoming.put_nowait({"type": "websocket.receive", "text": json.dumps({"command": "stop"})})
+    
+    def drop(self):
+        self.incoming.put_nowait({"type": "websocket.disconnect", "code": 1006})
+    
+    def of_type(self, kind):
+        return [m for m in self.messages if m["type"] == kind]
+
+
+class CountingRecognizer(FakeStreamingRecognizer):
+    def __init__(self):
+        super().__init__()
+        self.streams_opened = 0
+    
+    def streaming_recognize(self, requests):
+        self.streams_opened += 1
+        return super().streaming_recognize(requests)
+
+
+@pytest.fixture
+def speech_client(monkeypatch):
+    """Every session gets the same fake recognizer from the pool"""
+    import app.recognizers
+    recognizer = CountingRecognizer()
+    
+    class FakePool:
+        def acquire(self):
+            return recognizer
+        
+        def release(self, client):
+            pass
+    
+    monkeypatch.setattr(app.recognizers, "get_speech_pool", lambda region: FakePool())
+    return recognizer
+
+
+async def wait_for_transcripts(websocket, count):
+    for _ in range(200):
+        if len(transcripts(websocket)) >= count:
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"Expected {count} transcripts, got {transcripts(websocket)}")
+
+
+@pytest.mark.asyncio
+async def test_session_resumes_on_the_same_upstream_stream(monkeypatch, speech_client):
+    """A dropped lecturer reconnects by token and only resends unacknowledged audio"""
+    from app.sessions import sessions
+    from app.websocket import websocket_transcribe
+    monkeypatch.setattr(settings, "SESSION_ACK_EVERY_CHUNKS", 2)
+    monkeypatch.setattr(sessions, "grace_seconds", 5.0)
+    
+    first = ClientWebSocket()
+    handler = asyncio.create_task(websocket_transcribe(first, "resumable", resume=None))
+    for i in range(3):
+        first.send_audio(f"chunk-{i}".encode())
+    await wait_for_transcripts(first, 3)
+    first.drop()
+    await asyncio.wait_for(handler, timeout=2.0)
+    
+    session = first.of_type("session")[0]
+    assert session["resumed"] is False and session["nextSeq"] == 0
+    assert first.of_type("ack") == [{"type": "ack", "nextSeq": 2}]
+    assert sessions.detached == 1
+    
+    # Chunk 2 was received but never acknowledged: the server says so
+    second = ClientWebSocket()
+    handler = asyncio.create_task(websocket_transcribe(second, "resumable", resume=session["resumeToken"]))
+    await asyncio.sleep(0.05)
+    resumed = second.of_type("session")[0]
+    assert resumed["resumed"] is True
+    assert resumed["nextSeq"] == 3
+    
+    second.send_audio(b"chunk-3")
+    await wait_for_transcripts(second, 1)
+    second.send_stop()
+    await asyncio.wait_for(handler, timeout=2.0)
+    
+    assert transcripts(second) == ["chunk-3"]
+    assert speech_client.streams_opened == 1
+    assert len(sessions) == 0
+
+
+@pytest.mark.asyncio
+async def test_expired_resume_token_starts_a_new_session(monkeypatch, speech_client):
+    from app.sessions import sessions
+    from app.websocket import websocket_transcribe
+    monkeypatch.setattr(sessions, "grace_seconds", 0.05)
+    
+    first = ClientWebSocket()
+    handler = asyncio.create_task(websocket_transcribe(first, "expiring", resume=None))
+    first.send_audio(b"chunk-0")
+    await wait_for_transcripts(first, 1)
+    first.drop()
+    await asyncio.wait_for(handler, timeout=2.0)
+    await asyncio.sleep(0.2)
+    token = first.of_type("session")[0]["resumeToken"]
+    
+    second = ClientWebSocket()
+    handler = asyncio.create_task(websocket_transcribe(second, "expiring", resume=token))
+    second.send_stop()
+    await asyncio.wait_for(handler, timeout=2.0)
+    
+    session = second.of_type("session")[0]
+    assert session["resumed"] is False
+    assert session["resumeToken"] != token
+    assert speech_client.streams_opened == 2
+
+
+@pytest.mark.asyncio
+async def test_finals_are_held_while_disconnected():
+    stream = TranscriptionStream(FakeWebSocket(), "held", client=FakeStreamingRecognizer())
+    stream.detach()
+    await stream._send({"type": "transcription", "transcript": "lost interim", "isFinal": False})
+    await stream._send({"type": "transcription", "transcript": "kept final", "isFinal": True})
+    
+    websocket = FakeWebSocket()
+    await stream.attach(websocket)
+    
+    assert websocket.messages[0]["type"] == "session"
+    assert transcripts(websocket) == ["kept final"]
+
+
+class ContainerRecognizer:
+    """Keeps the config and raw bytes each upstream stream receives"""
+    def __init__(self):
+        self.configs = []
+        self.streams = []
+    
+    def streaming_recognize(self, requests):
+        received = bytearray()
+        self.streams.append(received)
+        for request in requests:
+            if request.audio:
+                received += request.audio
+            else:
+                self.configs.append(request.streaming_config.config)
+        return iter(())
+
+
+@pytest.mark.asyncio
+async def test_webm_opus_is_passed_through_and_replayed_from_a_cluster(monkeypatch):
+    """Opus sessions skip the PCM stages; rollover restarts with header + whole clusters"""
+    from tests.opus_fixtures import split, webm_header, webm_opus
+    monkeypatch.setattr(settings, "VAD_ENABLED", True)
+    monkeypatch.setattr(settings, "STREAM_ROLLOVER_SECONDS", 0.3)
+    monkeypatch.setattr(settings, "STREAM_ROLLOVER_OVERLAP_SECONDS", 0.1)
+    recognizer = ContainerRecognizer()
+    stream = TranscriptionStream(FakeWebSocket(), "opus-lecture", client=recognizer, encoding="webm-opus")
+    assert stream.resampler is None and stream.vad is None
+    task = asyncio.create_task(stream.start())
+    
+    data = webm_opus(2.0, cluster_ms=500)
+    for chunk in split(data, 400):
+        await stream.send_audio(chunk)
+        await asyncio.sleep(0.02)
+    await stream.stop()
+    await asyncio.wait_for(task, timeout=3.0)
+    
+    config = recognizer.configs[0]
+    assert "auto_decoding_config" in config and "explicit_decoding_config" not in config
+    assert bytes(recognizer.streams[0]) == data[:len(recognizer.streams[0])]
+    assert stream.bytes_upstream == stream.bytes_received == len(data)
+    assert len(recognizer.streams) >= 2
+    second = bytes(recognizer.streams[1])
+    assert second.startswith(webm_header() + b"\x1f\x43\xb6\x75")
+    assert data.endswith(second[len(webm_header()):])
+
+
+@pytest.mark.asyncio
+async def test_sessions_beyond_capacity_are_turned_away(monkeypatch, speech_client):
+    from app.admission import admission
+    from app.websocket import websocket_transcribe
+    monkeypatch.setattr(admission, "max_streams", 1)
+    monkeypatch.setattr(settings, "ADMISSION_REDIRECT_URL", "wss://overflow.example")
+    
+    first = ClientWebSocket()
+    handler = asyncio.create_task(websocket_transcribe(first, "admitted", resume=None))
+    first.send_audio(b"chunk-0")
+    await wait_for_transcripts(first, 1)
+    
+    second = ClientWebSocket()
+    await asyncio.wait_for(websocket_transcribe(second, "turned-away", resume=None), timeout=1.0)
+    assert second.closed
+    assert second.messages == [{
+        "type": "rejected",
+        "reason": "capacity",
+        "retryAfterMs": settings.ADMISSION_RETRY_AFTER_MS,
+        "sessionId": "turned-away",
+        "redirect": "wss://overflow.example/ws/transcribe/turned-away",
+    }]
+    
+    first.send_stop()
+    await asyncio.wait_for(handler, timeout=2.0)
+    await asyncio.sleep(0)
+    assert admission.active == 0
+
+
+@pytest.mark.asyncio
+async def test_drain_finalizes_live_streams(speech_client):
+    from app.websocket import drain_streams, websocket_transcribe
+    clients = [ClientWebSocket() for _ in range(2)]
+    handlers = [
+        asyncio.create_task(websocket_transcribe(client, f"draining-{i}", resume=None))
+        for i, client in enumerate(clients)
+    ]
+    for client in clients:
+        client.send_audio(b"chunk-0")
+        await wait_for_transcripts(client, 1)
+    
+    assert await drain_streams(timeout=2.0) == 0
+    
+    for client in clients:
+        assert client.of_type("draining")
+    for client, handler in zip(clients, handlers):
+        client.drop()
+        await asyncio.wait_for(handler, timeout=2.0)